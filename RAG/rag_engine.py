@@ -1,76 +1,231 @@
+import hashlib
+import json
 import os
-import chromadb
-from chromadb.utils import embedding_functions
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import embedding_service
+from model_registry import get_model
 
 CHROMA_PATH = "chroma_db"
-DATA_PATH = "/Users/rusalisaha/Documents/Fall 2025/Programming with LLMs/ReflectAI/RAG/knowledge_base"
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge_base")
+MANIFEST_PATH = os.path.join(CHROMA_PATH, "kb_manifest.json")
+COLLECTION_NAME = "cbt_library"
+EMBED_BATCH_SIZE = 64
+QUERY_CACHE_SIZE = 2048
+
+# LRU of query text -> embedding, so repeated queries skip the embedding model
+_query_cache = OrderedDict()
+_query_cache_lock = threading.Lock()
+
+
+def _load_client():
+    import chromadb
+    return chromadb.PersistentClient(path=CHROMA_PATH)
+
+
+def get_client():
+    return get_model(f"chroma-client:{os.path.abspath(CHROMA_PATH)}", _load_client)
+
+
+def get_collection():
+    """
+    The cbt_library handle, fetched once and reused by every query.
+    No Chroma embedding function: documents and queries are embedded by the shared
+    embedding_service model and passed in as vectors, so the process holds one MiniLM copy.
+    """
+    return get_model(
+        f"chroma-collection:{os.path.abspath(CHROMA_PATH)}:{COLLECTION_NAME}",
+        lambda: get_client().get_or_create_collection(
+            name=COLLECTION_NAME,
+            embedding_function=None
+        )
+    )
+
+
+def _content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
-emb_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
-    model_name="all-MiniLM-L6-v2"
-)
 
-client = chromadb.PersistentClient(path=CHROMA_PATH)
+def _chunk(text):
+    # CHUNKING: Split by double newlines to keep strategies separate
+    return [chunk for chunk in text.split("\n\n") if chunk.strip()]
+
+
+def _chunk_id(filename, chunk):
+    # Content-addressed: an unchanged strategy keeps its id (and embedding) across edits
+    return f"{filename}::{_content_hash(chunk)[:16]}"
+
+
+def _load_manifest():
+    if os.path.exists(MANIFEST_PATH):
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"files": {}}
+
+
+def _save_manifest(manifest):
+    os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def _read_chunks(filename):
+    """Returns {chunk_id: (document, metadata)} for one knowledge base file."""
+    with open(os.path.join(DATA_PATH, filename), "r", encoding="utf-8") as f:
+        text = f.read()
+    chunks = {}
+    for chunk in _chunk(text):
+        chunk_id = _chunk_id(filename, chunk)
+        chunks[chunk_id] = (chunk, {"source": filename})
+    return _content_hash(text), chunks
+
 
 def initialize_knowledge_base():
     """
-    Reads .txt files, chunks them, and builds the Vector Index.
+    Incrementally syncs the Vector Index with the .txt files in DATA_PATH.
+    Unchanged files are skipped by file hash; within changed files only new chunks
+    (by chunk hash) are embedded, and chunks that no longer exist are deleted.
+    Returns a dict with counts and timing.
     """
     print("[RAG] Checking Knowledge Base...")
+    start = time.perf_counter()
     
-    collection = client.get_or_create_collection(
-        name="cbt_library", 
-        embedding_function=emb_fn
-    )
-    
-    if collection.count() > 0:
-        print(f"[RAG] Library loaded ({collection.count()} items ready).")
-        return
-
-    print("[RAG] Indexing new data...")
-    documents = []
-    ids = []
+    collection = get_collection()
     
     if not os.path.exists(DATA_PATH):
         os.makedirs(DATA_PATH)
         print(f"[ERROR] '{DATA_PATH}' folder missing.")
-        return
-
-    # Loop through all files in the knowledge_base folder
-    for filename in os.listdir(DATA_PATH):
-        if filename.endswith(".txt"):
-            file_path = os.path.join(DATA_PATH, filename)
-            with open(file_path, "r", encoding="utf-8") as f:
-                text = f.read()
-            
-            # CHUNKING: Split by double newlines to keep strategies separate
-            chunks = text.split("\n\n")
-            
-            for i, chunk in enumerate(chunks):
-                if chunk.strip():
-                    documents.append(chunk)
-                    ids.append(f"{filename}_{i}")
-
-    if documents:
-        collection.add(documents=documents, ids=ids)
-        print(f"[RAG] Successfully indexed {len(documents)} strategies.")
-    else:
-        print("[RAG] No documents found to index.")
+        return None
+
+    manifest = _load_manifest()
+    new_manifest = {"files": {}}
+    pending = {}
+    changed_files = 0
+
+    # 1. Hash every file; only re-chunk the ones whose content changed
+    for filename in sorted(os.listdir(DATA_PATH)):
+        if not filename.endswith(".txt"):
+            continue
+        with open(os.path.join(DATA_PATH, filename), "r", encoding="utf-8") as f:
+            file_hash = _content_hash(f.read())
+
+        known = manifest["files"].get(filename)
+        if known and known["hash"] == file_hash:
+            new_manifest["files"][filename] = known
+            continue
+
+        changed_files += 1
+        file_hash, chunks = _read_chunks(filename)
+        pending.update(chunks)
+        new_manifest["files"][filename] = {"hash": file_hash, "chunks": list(chunks)}
+
+    # 2. Diff against what the collection actually holds
+    wanted_ids = {cid for entry in new_manifest["files"].values() for cid in entry["chunks"]}
+    existing_ids = set(collection.get(include=[])["ids"])
+
+    # Files the manifest thinks are indexed but whose chunks went missing get re-read
+    missing = wanted_ids - existing_ids - set(pending)
+    for filename, entry in new_manifest["files"].items():
+        if missing.intersection(entry["chunks"]):
+            pending.update(_read_chunks(filename)[1])
+
+    to_add = [cid for cid in pending if cid not in existing_ids]
+    stale = sorted(existing_ids - wanted_ids)
+
+    # 3. Apply: delete stale ids, embed + add new chunks in batches
+    for i in range(0, len(stale), EMBED_BATCH_SIZE):
+        collection.delete(ids=stale[i:i + EMBED_BATCH_SIZE])
+
+    embed_time = 0.0
+    for i in range(0, len(to_add), EMBED_BATCH_SIZE):
+        batch_ids = to_add[i:i + EMBED_BATCH_SIZE]
+        documents = [pending[cid][0] for cid in batch_ids]
+        metadatas = [pending[cid][1] for cid in batch_ids]
+        embed_start = time.perf_counter()
+        # Knowledge base text (not user data), so it goes through the on-disk cache too
+        embeddings = embedding_service.encode(documents).tolist()
+        embed_time += time.perf_counter() - embed_start
+        collection.add(ids=batch_ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
+    _save_manifest(new_manifest)
+
+    stats = {
+        "files": len(new_manifest["files"]),
+        "changed_files": changed_files,
+        "added": len(to_add),
+        "deleted": len(stale),
+        "total": collection.count(),
+        "embed_seconds": embed_time,
+        "seconds": time.perf_counter() - start,
+    }
+    if to_add or stale:
+        print(f"[RAG] Indexed {stats['added']} new chunks, removed {stats['deleted']} stale "
+              f"({stats['changed_files']}/{stats['files']} files changed) in {stats['seconds']:.2f}s "
+              f"(embedding {stats['embed_seconds']:.2f}s).")
+    print(f"[RAG] Library loaded ({stats['total']} items ready).")
+    return stats
+
+
+def embed_queries(queries):
+    """
+    Embeds queries through the LRU cache; all misses go to the model in one batch.
+    """
+    vectors = [None] * len(queries)
+    misses = {}
+    with _query_cache_lock:
+        for i, query in enumerate(queries):
+            if query in _query_cache:
+                _query_cache.move_to_end(query)
+                vectors[i] = _query_cache[query]
+            else:
+                misses.setdefault(query, []).append(i)
+
+    if misses:
+        # Queries are built from journal entries: kept in memory only
+        new_vectors = embedding_service.encode(list(misses), use_cache=False)
+        with _query_cache_lock:
+            for query, vector in zip(misses, new_vectors):
+                vector = [float(x) for x in vector]
+                _query_cache[query] = vector
+                for i in misses[query]:
+                    vectors[i] = vector
+            while len(_query_cache) > QUERY_CACHE_SIZE:
+                _query_cache.popitem(last=False)
+
+    return vectors
+
+
+def retrieve_context_batch(queries, n_results=1):
+    """
+    Batched search: one embedding pass and one Chroma query for all queries.
+    Returns one list of documents per query.
+    """
+    if not queries:
+        return []
+    results = get_collection().query(
+        query_embeddings=embed_queries(list(queries)),
+        n_results=n_results
+    )
+    return results['documents']
+
+
 def retrieve_context(query, n_results=1):
     """
     The Search Function.
     Input: "I feel anxious"
     Output: "The 5-4-3-2-1 Grounding Technique..."
     """
-    collection = client.get_collection(name="cbt_library", embedding_function=emb_fn)
-    
-    results = collection.query(
-        query_texts=[query],
-        n_results=n_results
-    )
-    
-    return results['documents'][0]
+    return retrieve_context_batch([query], n_results=n_results)[0]
+
 
 if __name__ == "__main__":
     initialize_knowledge_base()
     print("\n--- TEST SEARCH: 'I can't sleep' ---")
-    print(retrieve_context("I can't sleep"))
\ No newline at end of file
+    print(retrieve_context("I can't sleep"))
@@ -1,33 +1,149 @@
+import json
 import os
-from openai import OpenAI
+import time
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
-from transformers import pipeline
+from agents.llm_cache import cached_completion, acached_completion
+from model_registry import get_model
+from emotion_backend import (
+    EMOTION_BACKEND, EMOTION_SERVER_URL, ONNX_THREADS,
+    EmotionServerClient, OnnxEmotionClassifier, connect_emotion_server, load_onnx_classifier, score_batch,
+)
 
 load_dotenv()
 
+ALLOWED_LABELS = [
+    "Admiration", "Amusement", "Anger", "Annoyance", "Approval", "Caring", 
+    "Confusion", "Curiosity", "Desire", "Disappointment", "Disapproval", 
+    "Disgust", "Embarrassment", "Excitement", "Fear", "Gratitude", "Grief", 
+    "Joy", "Love", "Nervousness", "Optimism", "Pride", "Realization", 
+    "Relief", "Remorse", "Sadness", "Surprise", "Neutral"
+]
+
+# While the emotion server is unreachable, emotions use the local model and the server is retried
+# this often (per URL, process-wide)
+SERVER_RETRY_SECONDS = 60.0
+_server_retry_at = {}
+
+# Emotions + triggers in one call on the LLM path. Same model as the GPT emotion path,
+# so merging does not trade emotion accuracy for the saved round-trip.
+ANALYSIS_MODEL = "gpt-4o"
+
+# Structured output: the API itself rejects labels outside ALLOWED_LABELS
+ANALYSIS_SCHEMA = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "entry_analysis",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "emotions": {"type": "array", "items": {"type": "string", "enum": ALLOWED_LABELS}},
+                "triggers": {"type": "array", "items": {"type": "string"}},
+            },
+            "required": ["emotions", "triggers"],
+            "additionalProperties": False,
+        },
+    },
+}
+
 class AnalystAgent:
-    def __init__(self, use_local_model=True):
+    def __init__(self, use_local_model=True, raise_errors=False, backend=None, onnx_threads=None, server_url=None):
         self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.use_local = use_local_model
+        # Evaluation runs set this so GPT errors are retried instead of scored as "Neutral"
+        self.raise_errors = raise_errors
         
         self.model_path = "./roberta/roberta_mixed_model_final"
+        # "torch" (transformers pipeline) or "onnx" (int8 ONNX Runtime, falls back to torch)
+        self.backend = backend or EMOTION_BACKEND
+        self.onnx_threads = ONNX_THREADS if onnx_threads is None else onnx_threads
+        # Client mode: emotions come from a shared emotion_server.py, which holds the model
+        self.server_url = EMOTION_SERVER_URL if server_url is None else server_url
         
+        if self.use_local and not self.server_url and not os.path.exists(self.model_path):
+            print(f"[ANALYST] ⚠️ Model '{self.model_path}' not found. Falling back to GPT-4o-mini.")
+            self.use_local = False
+
+    @property
+    def version(self):
+        """
+        Stored with each entry's results, so a model upgrade can re-analyze older rows.
+        Named after the classifier that actually loaded (an ONNX request that fell back to torch
+        is a torch result, and so is a server client that fell back to the local model), so on
+        the local path this loads the model if it is not loaded yet.
+        """
+        if not self.use_local:
+            return f"{ANALYSIS_MODEL}:merged"
+        classifier = self.classifier
+        if isinstance(classifier, EmotionServerClient):
+            model = classifier.model_version
+        elif isinstance(classifier, OnnxEmotionClassifier):
+            model = f"roberta:{os.path.basename(self.model_path)}-onnx-int8"
+        else:
+            model = f"roberta:{os.path.basename(self.model_path)}"
+        return f"{model}+triggers:gpt-4o-mini"
+
+    def _load_classifier(self):
+        # Imported here so the GPT-only path works without torch/transformers
+        from transformers import pipeline
+        print(f"[ANALYST] Loading Mixed RoBERTa Model from {self.model_path}...")
+        return pipeline(
+            "text-classification", 
+            model=self.model_path, 
+            top_k=None,
+            device=-1 
+        )
+
+    def _load_onnx_classifier(self):
+        try:
+            return load_onnx_classifier(self.model_path, self.onnx_threads)
+        except Exception as e:
+            # e.g. onnxruntime not installed or the export failed: keep working on PyTorch
+            print(f"[ANALYST] ⚠️ ONNX backend unavailable ({e}). Falling back to the PyTorch pipeline.")
+            return get_model(f"roberta:{os.path.abspath(self.model_path)}", self._load_classifier)
+
+    def _server_classifier(self):
+        """
+        The shared server client, or the local model while the server is down. Only a connected
+        client is cached under the server key, so the server is retried every SERVER_RETRY_SECONDS
+        instead of the process keeping its own copy of the model for good.
+        """
+        if time.monotonic() >= _server_retry_at.get(self.server_url, 0.0):
+            try:
+                client = get_model(f"emotion-server:{self.server_url}", lambda: connect_emotion_server(self.server_url))
+                _server_retry_at.pop(self.server_url, None)
+                return client
+            except Exception as e:
+                _server_retry_at[self.server_url] = time.monotonic() + SERVER_RETRY_SECONDS
+                print(f"[ANALYST] ⚠️ Emotion server {self.server_url} unreachable ({e}). "
+                      f"This process now holds its own copy of the model; retrying the server in {SERVER_RETRY_SECONDS:g}s.")
+        return self._local_classifier()
+
+    def _local_classifier(self):
+        if self.backend == "onnx":
+            return get_model(f"roberta-onnx:{os.path.abspath(self.model_path)}", self._load_onnx_classifier)
+        return get_model(f"roberta:{os.path.abspath(self.model_path)}", self._load_classifier)
+
+    @property
+    def classifier(self):
+        """
+        The RoBERTa classifier, loaded on first use and shared by every AnalystAgent in the process
+        (or a client for the shared emotion server, when one is configured; see version for which).
+        """
+        if self.server_url:
+            return self._server_classifier()
+        return self._local_classifier()
+
+    def warm_up(self):
         if self.use_local:
-            if os.path.exists(self.model_path):
-                print(f"[ANALYST] Loading Mixed RoBERTa Model from {self.model_path}...")
-                self.classifier = pipeline(
-                    "text-classification", 
-                    model=self.model_path, 
-                    top_k=None,
-                    device=-1 
-                )
-            else:
-                print(f"[ANALYST] ⚠️ Model '{self.model_path}' not found. Falling back to GPT-4o-mini.")
-                self.use_local = False
+            self.classifier
 
-    def analyze_emotions(self, text):
+    def analyze_emotions(self, text, use_cache=True):
         """
         Returns: A string of emotions (e.g. "Joy, Gratitude")
+        use_cache only applies to the GPT path.
         """
         if self.use_local:
             # --- PATH A: Mixed RoBERTa ---
@@ -41,20 +157,17 @@ class AnalystAgent:
                 
                 return ", ".join(detected)
             except Exception as e:
+                # e.g. the emotion server is down: let the queue retry instead of storing "Neutral"
+                if self.raise_errors:
+                    raise
                 print(f"[ANALYST ERROR] RoBERTa failed: {e}")
                 return "Neutral"
 
         else:
-            ALLOWED_LABELS = [
-                "Admiration", "Amusement", "Anger", "Annoyance", "Approval", "Caring", 
-                "Confusion", "Curiosity", "Desire", "Disappointment", "Disapproval", 
-                "Disgust", "Embarrassment", "Excitement", "Fear", "Gratitude", "Grief", 
-                "Joy", "Love", "Nervousness", "Optimism", "Pride", "Realization", 
-                "Relief", "Remorse", "Sadness", "Surprise", "Neutral"
-            ]
-            
             try:
-                response = self.client.chat.completions.create(
+                content = cached_completion(
+                    self.client,
+                    use_cache=use_cache,
                     model="gpt-4o",
                     response_format={"type": "json_object"}, 
                     messages=[
@@ -69,19 +182,125 @@ class AnalystAgent:
                     ],
                     temperature=0.0
                 )
-                import json
-                data = json.loads(response.choices[0].message.content)
+                data = json.loads(content)
                 valid = [e for e in data.get("emotions", []) if e in ALLOWED_LABELS]
                 return ", ".join(valid) if valid else "Neutral"
             except Exception as e:
+                if self.raise_errors:
+                    raise
                 print(f"[ANALYST ERROR] GPT failed: {e}")
                 return "Neutral"
 
-    def extract_triggers(self, text):
+    def _analysis_messages(self, text):
+        system_prompt = (
+            "You analyze one journal entry for a mental health app. Return JSON with two fields.\n"
+            f"emotions: the 1-3 emotions the writer expresses, chosen from: {ALLOWED_LABELS}.\n"
+            "triggers: 2-4 specific CAUSES, NOUNS, or ENTITIES that caused the emotion. "
+            "Include BOTH the broad category AND specific details mentioned in the text, e.g.\n"
+            "- 'My boss keeps emailing me.' -> ['Work', 'Boss', 'Emails']\n"
+            "- 'I miss my mom.' -> ['Family', 'Mom']\n"
+            "- 'Traffic was horrible.' -> ['Commute', 'Traffic']"
+        )
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": text}
+        ]
+
+    def _parse_analysis(self, content):
+        data = json.loads(content)
+        # Validate even with the schema: cached or non-strict responses may not honour it
+        emotions = [e for e in dict.fromkeys(data.get("emotions", [])) if e in ALLOWED_LABELS][:3]
+        triggers = [" ".join(str(t).split()) for t in data.get("triggers", [])]
+        triggers = [t for t in dict.fromkeys(triggers) if t][:4]
+        return {
+            "emotions": ", ".join(emotions) if emotions else "Neutral",
+            "triggers": ", ".join(triggers) if triggers else "General",
+        }
+
+    def analyze(self, text, use_cache=True):
         """
-        Identifies the 'Why' behind the emotion.
-        Returns a comma-separated string of specific nouns/entities.
+        Emotions and triggers for one entry.
+        Returns: {"emotions": "Joy, Pride", "triggers": "Work, Boss"}
+        Local path: RoBERTa emotions + one trigger call. LLM path: a single structured call
+        (one round-trip and one copy of the entry instead of two).
+        """
+        if self.use_local:
+            return {
+                "emotions": self.analyze_emotions(text),
+                "triggers": self.extract_triggers(text, use_cache=use_cache),
+            }
+
+        try:
+            content = cached_completion(
+                self.client,
+                use_cache=use_cache,
+                model=ANALYSIS_MODEL,
+                response_format=ANALYSIS_SCHEMA,
+                messages=self._analysis_messages(text),
+                temperature=0.0
+            )
+            return self._parse_analysis(content)
+        except Exception as e:
+            if self.raise_errors:
+                raise
+            print(f"[ANALYST ERROR] GPT analysis failed: {e}")
+            return {"emotions": "Neutral", "triggers": "General"}
+
+    def _select_labels(self, scored):
+        """
+        scored: list of (label, score) pairs sorted by score, highest first.
+        Keeps every label above 0.5, or the single best one if none pass.
+        """
+        detected = [label for label, score in scored if score > 0.5]
+        return detected if detected else [scored[0][0]]
+
+    def _score_batch(self, texts, batch_size):
+        """
+        Batched RoBERTa forward passes with dynamic padding (emotion_backend.score_batch).
+        Returns a list (aligned with `texts`) of (label, score) lists sorted by score.
         """
+        if isinstance(self.classifier, (OnnxEmotionClassifier, EmotionServerClient)):
+            return self.classifier.score_batch(texts, batch_size)
+
+        import torch
+
+        tokenizer = self.classifier.tokenizer
+        model = self.classifier.model
+        id2label = model.config.id2label
+        # Mirror the pipeline's default post-processing for this head
+        multi_label = model.config.problem_type == "multi_label_classification" or model.config.num_labels == 1
+
+        def probs(batch):
+            encoded = tokenizer(batch, padding=True, truncation=True, return_tensors="pt")
+            logits = model(**encoded).logits
+            return (torch.sigmoid(logits) if multi_label else torch.softmax(logits, dim=-1)).tolist()
+
+        with torch.inference_mode():
+            return score_batch(probs, texts, id2label, batch_size)
+
+    def analyze_emotions_batch(self, texts, batch_size=16):
+        """
+        Batch version of analyze_emotions for evaluation runs and backfills.
+        Returns: one list of emotion labels per input text (e.g. [["Joy", "Gratitude"], ["Sadness"]])
+        """
+        texts = [str(t) for t in texts]
+        if not texts:
+            return []
+
+        if self.use_local:
+            try:
+                return [self._select_labels(pairs) for pairs in self._score_batch(texts, batch_size)]
+            except Exception as e:
+                # Evaluation runs must see the failure so the row is retried, not scored as "Neutral"
+                if self.raise_errors:
+                    raise
+                print(f"[ANALYST ERROR] RoBERTa batch failed: {e}")
+                return [["Neutral"] for _ in texts]
+
+        # GPT path has no batched endpoint; fall back to one request per entry
+        return [self.analyze_emotions(t).split(", ") for t in texts]
+
+    def _trigger_messages(self, text):
         system_prompt = (
             "You are an expert Analyst extracting keywords from a journal. "
             "Identify 2-4 specific CAUSES, NOUNS, or ENTITIES that caused the emotion. "
@@ -92,16 +311,44 @@ class AnalystAgent:
             "- Input: 'Traffic was horrible.' -> Output: 'Commute, Traffic'\n"
             "Return ONLY the words separated by commas. No preamble."
         )
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": text}
+        ]
+
+    def extract_triggers(self, text, use_cache=True):
+        """
+        Identifies the 'Why' behind the emotion.
+        Returns a comma-separated string of specific nouns/entities.
+        """
+        try:
+            content = cached_completion(
+                self.client,
+                use_cache=use_cache,
+                model="gpt-4o-mini",
+                messages=self._trigger_messages(text),
+                temperature=0.0
+            )
+            return content.strip()
+        except Exception:
+            if self.raise_errors:
+                raise
+            return "General"
 
+    async def extract_triggers_async(self, text, use_cache=True):
+        """
+        Same as extract_triggers, on the async client (used by EntryPipeline).
+        """
         try:
-            response = self.client.chat.completions.create(
+            content = await acached_completion(
+                self.async_client,
+                use_cache=use_cache,
                 model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": text}
-                ],
+                messages=self._trigger_messages(text),
                 temperature=0.0
             )
-            return response.choices[0].message.content.strip()
-        except:
-            return "General"
\ No newline at end of file
+            return content.strip()
+        except Exception:
+            if self.raise_errors:
+                raise
+            return "General"
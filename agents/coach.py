@@ -1,5 +1,9 @@
 import os
+import re
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
@@ -7,37 +11,79 @@ sys.path.append(parent_dir)
 
 from openai import OpenAI
 from dotenv import load_dotenv
-from RAG.rag_engine import retrieve_context, initialize_knowledge_base
+from RAG.rag_engine import retrieve_context_batch, initialize_knowledge_base
+from agents.llm_cache import cached_completion
+from agents.keyword_matcher import KeywordMatcher
 
 load_dotenv()
 
+# Upper bound (approx. tokens) for the journal part of the final report prompt
+REPORT_TOKEN_BUDGET = 6000
+# Distinct library strategies passed to the Coach
+STRATEGY_LIMIT = 3
+MAP_WORKERS = 8
+# Streaming: re-audit the released text every N sentences
+STREAM_AUDIT_SENTENCES = 4
+
+# End of a sentence (plus closing quotes/brackets/markdown emphasis and whitespace) or a line break
+SENTENCE_BOUNDARY = re.compile(r'[.!?]+["\')\]*_]*\s+|\n+')
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+def split_sentences(buffer):
+    """
+    Splits streamed text into complete sentences and the unfinished remainder.
+    Whitespace is kept, so "".join(sentences) + remainder == buffer.
+    """
+    sentences = []
+    last = 0
+    for match in SENTENCE_BOUNDARY.finditer(buffer):
+        sentences.append(buffer[last:match.end()])
+        last = match.end()
+    return sentences, buffer[last:]
+
+
 class CoachAgent:
     def __init__(self):
         self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        # Ensure the knowledge base is ready when the Coach starts
-        initialize_knowledge_base()
+        self.banned_phrases = [
+            "kill yourself", "suicide is the answer", "stop taking medication",
+            "don't call a doctor", "hurt yourself", "end it all", "give up"
+        ]
+        # Plain substring semantics (no word boundaries), same as the original scan
+        self.banned_matcher = KeywordMatcher(self.banned_phrases, word_boundary=False)
+        # The knowledge base (Chroma + embedding model) is prepared on first use, not here,
+        # so constructing the Coach does not block the first page render
+        self._kb_ready = False
+        self._kb_lock = threading.Lock()
+        self.last_report_stats = {}
+
+    def warm_up(self):
+        """Prepares the knowledge base ahead of the first report (safe to call from a thread)."""
+        with self._kb_lock:
+            if not self._kb_ready:
+                initialize_knowledge_base()
+                self._kb_ready = True
 
     def _basic_safety_check(self, text):
         """
         Fallback Layer: Fast keyword scan if the LLM fails.
         """
-        banned_phrases = [
-            "kill yourself", "suicide is the answer", "stop taking medication",
-            "don't call a doctor", "hurt yourself", "end it all", "give up"
-        ]
-        text_lower = text.lower()
-        for phrase in banned_phrases:
-            if phrase in text_lower:
-                return True # Unsafe
-        return False # Safe
+        return self.banned_matcher.matches(text) # True = Unsafe
 
-    def _intelligent_safety_check(self, response_text):
+    def _intelligent_safety_check(self, response_text, use_cache=True):
         """
         Primary Layer: LLM-based Safety Auditor.
         Reads context to distinguish between "Don't stop meds" (Safe) and "Stop meds" (Unsafe).
         """
         try:
-            check_response = self.client.chat.completions.create(
+            verdict = cached_completion(
+                self.client,
+                use_cache=use_cache,
                 model="gpt-4o-mini",
                 messages=[
                     {
@@ -56,7 +102,7 @@ class CoachAgent:
                 ],
                 temperature=0.0
             )
-            verdict = check_response.choices[0].message.content.strip().upper()
+            verdict = verdict.strip().upper()
             
             if "UNSAFE" in verdict:
                 return False, "⚠️ **SAFETY ALERT**\n\nThe generated response was blocked by our Safety Monitor because it may contain unsafe medical or crisis-related advice. Please consult a professional."
@@ -70,18 +116,34 @@ class CoachAgent:
                 return False, "⚠️ **SAFETY ALERT** (Fallback)\n\nContent blocked due to safety keywords."
             return True, response_text
 
-    def generate_weekly_report(self, entries_df):
-        if entries_df.empty:
-            return "No entries found for this week."
+    def _format_entry(self, row):
+        return (
+            f"- {row['date']}:\n"
+            f"  Text: {row['content']}\n"
+            f"  Mood: {row['emotions']}\n"
+            f"  Triggers: {row['triggers']}\n"
+            f"  Stats: Sleep {row['sleep_hours']}h, Stress {row['stress_level']}/10\n"
+            "----------------\n"
+        )
 
-        # 1. RAG Setup
-        combined_text = " ".join(entries_df['content'].tolist())
-        retrieved_tips = retrieve_context(combined_text, n_results=2)
-        knowledge_block = "\n\n".join(retrieved_tips)
+    def _retrieve_strategies(self, entries_df):
+        """
+        One retrieval query per entry (a single batched embedding + Chroma call),
+        so late entries are not cut off by MiniLM's token limit like one joined query would be.
+        Strategies are de-duplicated and ranked by how many entries retrieved them.
+        """
+        results = retrieve_context_batch(entries_df['content'].astype(str).tolist(), n_results=2)
+        counts = {}
+        for documents in results:
+            for doc in documents:
+                counts[doc] = counts.get(doc, 0) + 1
+        ranked = sorted(counts, key=lambda doc: counts[doc], reverse=True)
+        return ranked[:STRATEGY_LIMIT]
 
-        # 2. The "Deep Insight" Prompt
+    def _system_prompt(self, knowledge_block):
+        # The "Deep Insight" Prompt
         # We explicitly tell it to look for masking and contradictions.
-        system_prompt = (
+        return (
             "You are a highly empathetic, clinical-grade Mental Health Coach. "
             "Review the user's journal and provide deep, personalized insights.\n\n"
             
@@ -99,31 +161,261 @@ class CoachAgent:
             "Acknowledge how hard the week was, even if it ended well."
         )
 
+    def _summarize_day(self, day, day_context):
+        """
+        Map step: compresses one day's entries into a short clinical note.
+        Deterministic (temperature=0), so the LLM cache reuses a day's summary in every
+        later report that covers the same, unchanged day. Privacy trade-off: the summary is a
+        paraphrase of the day's entries and is kept in plain text in llm_cache.db until it expires.
+        """
+        return cached_completion(
+            self.client,
+            model="gpt-4o-mini",
+            messages=[
+                {
+                    "role": "system",
+                    "content": (
+                        "You condense one day of a user's journal for a Mental Health Coach. "
+                        "In at most 80 words, keep: the emotional arc, any contradictions or 'masking', "
+                        "the main triggers, and the sleep/stress numbers. "
+                        "Do not give advice. Do not invent details."
+                    )
+                },
+                {"role": "user", "content": f"Day {day}:\n{day_context}"}
+            ],
+            temperature=0.0,
+            max_tokens=160
+        ).strip()
+
+    def _hierarchical_context(self, entries_df):
+        """
+        Map-reduce context: per-day summaries (in parallel), oldest days dropped first
+        if the summaries still exceed REPORT_TOKEN_BUDGET.
+        """
+        days = {}
+        for _, row in entries_df.iterrows():
+            days.setdefault(str(row['date'])[:10], []).append(self._format_entry(row))
+
+        ordered_days = sorted(days)
+        with ThreadPoolExecutor(max_workers=MAP_WORKERS) as pool:
+            summaries = list(pool.map(
+                lambda day: self._summarize_day(day, "".join(days[day])),
+                ordered_days
+            ))
+
+        lines = [f"- {day} ({len(days[day])} entries): {summary}\n" for day, summary in zip(ordered_days, summaries)]
+        kept = []
+        used = 0
+        for line in reversed(lines):
+            cost = estimate_tokens(line)
+            if used + cost > REPORT_TOKEN_BUDGET and kept:
+                break
+            kept.append(line)
+            used += cost
+        kept.reverse()
+
+        context = ""
+        if len(kept) < len(lines):
+            context += f"(Summaries for {len(lines) - len(kept)} earlier days omitted to fit the budget.)\n"
+        return context + "".join(kept)
+
+    def _format_patterns(self, patterns):
+        """
+        patterns: rows of (tag_a, tag_b, count) from database.fetch_tag_cooccurrence.
+        """
+        lines = [f"- {a} + {b}: together in {count} entries\n" for a, b, count in patterns]
+        if not lines:
+            return ""
+        return "\nRecurring trigger combinations (from the journal database):\n" + "".join(lines)
+
+    def _prepare_report(self, entries_df, mode, patterns=None):
+        """
+        RAG + journal context shared by the blocking and streaming reports.
+        Returns (messages, mode_used, map_seconds).
+        """
+        # 1. RAG Setup
+        self.warm_up()
+        retrieved_tips = self._retrieve_strategies(entries_df)
+        knowledge_block = "\n\n".join(retrieved_tips)
+        system_prompt = self._system_prompt(knowledge_block)
+
+        # 2. Build the journal context within the token budget
+        map_start = time.perf_counter()
+        user_context = "".join(self._format_entry(row) for _, row in entries_df.iterrows())
+        if mode == "hierarchical" or (mode == "auto" and estimate_tokens(user_context) > REPORT_TOKEN_BUDGET):
+            mode = "hierarchical"
+            user_context = self._hierarchical_context(entries_df)
+        else:
+            mode = "flat"
+        map_seconds = time.perf_counter() - map_start
+
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"User Entries:\n{user_context}{self._format_patterns(patterns or [])}"}
+        ]
+        return messages, mode, map_seconds
+
+    def _log_stats(self, stats):
+        print(
+            f"[COACH] {stats['mode']} report: {stats['entries']} entries, "
+            f"{stats['prompt_tokens']} prompt tokens, "
+            f"map {stats['map_seconds']:.1f}s + reduce {stats['reduce_seconds']:.1f}s, "
+            f"total {stats['total_seconds']:.1f}s"
+            + (f", first token {stats['first_token_seconds']:.2f}s" if "first_token_seconds" in stats else "")
+        )
+
+    def generate_weekly_report(self, entries_df, mode="auto", patterns=None):
+        """
+        mode:
+          "flat"         - every entry verbatim in one prompt (original behaviour)
+          "hierarchical" - per-day summaries (map) feeding one final report (reduce)
+          "auto"         - flat while the entries fit REPORT_TOKEN_BUDGET, hierarchical otherwise
+        patterns: optional (tag_a, tag_b, count) co-occurrence rows appended to the journal context.
+        Prompt size and latency of the last call are kept in self.last_report_stats.
+        """
+        if entries_df.empty:
+            return "No entries found for this week."
+
+        start = time.perf_counter()
+
         try:
-            user_context = ""
-            for index, row in entries_df.iterrows():
-                user_context += (
-                    f"- {row['date']}:\n"
-                    f"  Text: {row['content']}\n"
-                    f"  Mood: {row['emotions']}\n"
-                    f"  Triggers: {row['triggers']}\n"
-                    f"  Stats: Sleep {row['sleep_hours']}h, Stress {row['stress_level']}/10\n"
-                    "----------------\n"
-                )
+            messages, mode, map_seconds = self._prepare_report(entries_df, mode, patterns)
 
+            reduce_start = time.perf_counter()
             response = self.client.chat.completions.create(
                 model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"User Entries:\n{user_context}"}
-                ],
+                messages=messages,
             )
             raw_output = response.choices[0].message.content
+            reduce_seconds = time.perf_counter() - reduce_start
             
             # 3. Guardrail
             is_safe, final_output = self._intelligent_safety_check(raw_output)
+
+            usage = getattr(response, "usage", None)
+            self.last_report_stats = {
+                "mode": mode,
+                "entries": len(entries_df),
+                "prompt_tokens": usage.prompt_tokens if usage else estimate_tokens(messages[0]["content"] + messages[1]["content"]),
+                "map_seconds": map_seconds,
+                "reduce_seconds": reduce_seconds,
+                "total_seconds": time.perf_counter() - start,
+            }
+            self._log_stats(self.last_report_stats)
             
             return final_output
 
         except Exception as e:
-            return f"Error generating insight: {e}"
\ No newline at end of file
+            return f"Error generating insight: {e}"
+
+    def stream_weekly_report(self, entries_df, mode="auto", patterns=None, outcome=None):
+        """
+        Streaming version of generate_weekly_report for st.write_stream.
+
+        Yields the report sentence by sentence while it is generated. A sentence with a banned
+        phrase is held back and audited by the LLM before it is released (blocked only if the
+        audit flags it or fails, as in _intelligent_safety_check); the LLM auditor also re-checks
+        the text so far every STREAM_AUDIT_SENTENCES sentences in the background and once more
+        on the full report.
+
+        outcome: optional dict the caller reads once the stream is exhausted. Filled with
+          "block" - the alert to show in place of the partial report (None when it passed)
+          "stats" - prompt size and latency, as in last_report_stats ({} if the report failed)
+        The agent is shared by every session, so the outcome lives with the caller, not on self.
+        """
+        outcome = {} if outcome is None else outcome
+        outcome.update(block=None, stats={})
+        if entries_df.empty:
+            yield "No entries found for this week."
+            return
+
+        start = time.perf_counter()
+        try:
+            messages, mode, map_seconds = self._prepare_report(entries_df, mode, patterns)
+            reduce_start = time.perf_counter()
+            stream = self.client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=messages,
+                stream=True,
+            )
+        except Exception as e:
+            yield f"Error generating insight: {e}"
+            return
+
+        released = ""
+        buffer = ""
+        unaudited = 0
+        audits = []
+        first_token_seconds = None
+        auditor = ThreadPoolExecutor(max_workers=2)
+
+        def held_back(text):
+            """Keyword hit: ask the auditor before releasing (it falls back to blocking on errors)."""
+            if not self._basic_safety_check(text):
+                return None
+            is_safe, message = self._intelligent_safety_check(text)
+            return None if is_safe else message
+
+        def blocked_by_audit(wait=False):
+            for future in list(audits):
+                if wait or future.done():
+                    audits.remove(future)
+                    is_safe, message = future.result()
+                    if not is_safe:
+                        return message
+            return None
+
+        try:
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                if first_token_seconds is None:
+                    first_token_seconds = time.perf_counter() - start
+                buffer += delta
+
+                sentences, buffer = split_sentences(buffer)
+                for sentence in sentences:
+                    # Fast layer: a sentence with a banned phrase waits for the auditor's verdict
+                    outcome["block"] = held_back(sentence)
+                    if outcome["block"]:
+                        return
+                    released += sentence
+                    yield sentence
+
+                    unaudited += 1
+                    if unaudited >= STREAM_AUDIT_SENTENCES:
+                        audits.append(auditor.submit(self._intelligent_safety_check, released))
+                        unaudited = 0
+
+                # Slow layer: act on any audit that has come back
+                outcome["block"] = blocked_by_audit()
+                if outcome["block"]:
+                    return
+
+            # Flush the last partial sentence, then audit the complete report
+            if buffer:
+                outcome["block"] = held_back(buffer)
+                if outcome["block"]:
+                    return
+                released += buffer
+                yield buffer
+
+            audits.append(auditor.submit(self._intelligent_safety_check, released))
+            outcome["block"] = blocked_by_audit(wait=True)
+
+            outcome["stats"] = {
+                "mode": mode,
+                "entries": len(entries_df),
+                "prompt_tokens": estimate_tokens(messages[0]["content"] + messages[1]["content"]),
+                "map_seconds": map_seconds,
+                "reduce_seconds": time.perf_counter() - reduce_start,
+                "total_seconds": time.perf_counter() - start,
+                "first_token_seconds": first_token_seconds or 0.0,
+            }
+            self._log_stats(outcome["stats"])
+        except Exception as e:
+            yield f"\n\nError generating insight: {e}"
+        finally:
+            stream.close()
+            auditor.shutdown(wait=False, cancel_futures=True)
@@ -1,78 +1,395 @@
 import os
-import re
-from openai import OpenAI
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
+import json
+from agents.llm_cache import cached_completion, acached_completion
+from agents.analyst import ALLOWED_LABELS
+from agents.keyword_matcher import KeywordMatcher
+from agents.safety_classifier import LocalSafetyClassifier, MODEL_PATH as SAFETY_MODEL_PATH, embed
 
 load_dotenv()
 
+SAFETY_RULES = (
+    "RULES:"
+    "1. Flag ANY expression of hopelessness, trapped feelings, or desire to disappear as RISK."
+    "2. Flag subtle metaphors like 'I want to sleep forever' or 'The fog is swallowing me' as RISK."
+    "3. If you are even 1% unsure, choose RISK. Better to be safe than sorry."
+    "4. Ignore clearly positive metaphors (e.g., 'killing it at work' is SAFE)."
+)
+
+# First-pass mode: safety verdict + the Analyst's fields in one structured call.
+# "risk" comes first so the verdict is decided before the model writes anything else.
+FIRST_PASS_MODEL = "gpt-4o"
+FIRST_PASS_SCHEMA = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "first_pass",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "risk": {"type": "string", "enum": ["RISK", "SAFE"]},
+                "emotions": {"type": "array", "items": {"type": "string", "enum": ALLOWED_LABELS}},
+                "triggers": {"type": "array", "items": {"type": "string"}},
+            },
+            "required": ["risk", "emotions", "triggers"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# Batched LLM check (GuardianBatcher, mode="structured"): one verdict per entry id
+BATCH_SCHEMA = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "safety_verdicts",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "verdicts": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "id": {"type": "integer"},
+                            "risk": {"type": "string", "enum": ["RISK", "SAFE"]},
+                        },
+                        "required": ["id", "risk"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["verdicts"],
+            "additionalProperties": False,
+        },
+    },
+}
+
 class GuardianAgent:
-    def __init__(self):
+    def __init__(self, keywords_path=None, use_local_tier=False, local_model_path=SAFETY_MODEL_PATH, raise_errors=False):
         # 1. Deterministic Rule-Based Fallback (Fast & Explicit)
         self.risk_keywords = [
             "suicide", "kill myself", "end my life", "hurt myself", 
             "die", "death", "overdose", "cutting myself", "hang myself"
         ]
-        # 2. LLM Client
+        if keywords_path:
+            # Extra phrases (one per line) extend the built-in list
+            self.risk_keywords += KeywordMatcher.from_file(keywords_path).phrases
+        self.matcher = KeywordMatcher(self.risk_keywords)
+        # 2. Optional Local Tier (clears/flags confident entries without an LLM call)
+        self.local_classifier = None
+        if use_local_tier:
+            if os.path.exists(local_model_path):
+                self.local_classifier = LocalSafetyClassifier(local_model_path)
+            else:
+                print(f"[GUARDIAN] ⚠️ Local safety model '{local_model_path}' not found. Every entry goes to the LLM.")
+        # 3. LLM Client
         self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        # Evaluation runs set this so API errors are retried instead of scored as the fail-safe RISK
+        self.raise_errors = raise_errors
+
+        # Optional GuardianBatcher: when set, analyze() sends its LLM checks through it
+        self.batcher = None
+
+        # Which tier made the final call, for escalation-rate reporting
+        self.tier_counts = {"rules": 0, "local": 0, "llm": 0}
+        self._stats_lock = threading.Lock()
+
+    def warm_up(self):
+        # Loads the shared MiniLM model behind the local tier
+        if self.local_classifier is not None:
+            embed(["warm up"])
+
+    def record_tier(self, tier):
+        with self._stats_lock:
+            self.tier_counts[tier] += 1
+
+    def escalation_rate(self):
+        """
+        Share of entries that passed the rules and still needed the LLM.
+        """
+        with self._stats_lock:
+            past_rules = self.tier_counts["local"] + self.tier_counts["llm"]
+            return self.tier_counts["llm"] / past_rules if past_rules else 0.0
 
     def check_safety_rules(self, text):
         """
         Level 1: Basic keyword scan.
         """
-        text_lower = text.lower()
-        for keyword in self.risk_keywords:
-            if re.search(r'\b' + re.escape(keyword) + r'\b', text_lower):
-                return True, f"Detected high-risk keyword: {keyword}"
+        keyword = self.matcher.search(text)
+        if keyword:
+            return True, f"Detected high-risk keyword: {keyword}"
         return False, "Safe"
 
-    def check_safety_llm(self, text):
+    def check_safety_local(self, text):
+        """
+        Level 1.5: Local embedding classifier.
+        Returns (is_risky, reason) when confident, or None to escalate to the LLM.
+        """
+        if self.local_classifier is None:
+            return None
+        try:
+            verdict, p_risk = self.local_classifier.decide(text)
+        except Exception as e:
+            print(f"Guardian Local Tier Error: {e}")
+            return None
+
+        return self._local_result(verdict, p_risk)
+
+    def _llm_messages(self, text):
+        return [
+            {
+                "role": "system", 
+                "content": (
+                    "You are a Zero-Tolerance Safety Guardian for a mental health app. "
+                    "Your ONLY job is to detect potential self-harm or suicide risk. "
+                    "\n\n"
+                    + SAFETY_RULES +
+                    "\n\n"
+                    "Return ONLY the word 'RISK' or 'SAFE'."
+                )
+            },
+            {"role": "user", "content": f"Entry: \"{text}\""}
+        ]
+
+    def _first_pass_messages(self, text):
+        return [
+            {
+                "role": "system",
+                "content": (
+                    "You are a Zero-Tolerance Safety Guardian and journal analyst for a mental health app. "
+                    "FIRST decide whether the entry shows potential self-harm or suicide risk.\n\n"
+                    + SAFETY_RULES +
+                    "\n\n"
+                    "Return JSON with: risk ('RISK' or 'SAFE'); "
+                    f"emotions: the 1-3 emotions expressed, from {ALLOWED_LABELS}; "
+                    "triggers: 2-4 specific CAUSES, NOUNS, or ENTITIES behind the emotion, "
+                    "broad category AND specific details (e.g. ['Work', 'Boss', 'Emails'])."
+                )
+            },
+            {"role": "user", "content": f"Entry: \"{text}\""}
+        ]
+
+    def _parse_first_pass(self, content):
+        data = json.loads(content)
+        # Anything but an explicit SAFE is treated as RISK
+        if str(data.get("risk", "")).strip().upper() != "SAFE":
+            return True, "LLM Detected Contextual Risk", None, None
+        emotions = [e for e in dict.fromkeys(data.get("emotions", [])) if e in ALLOWED_LABELS][:3]
+        triggers = [t for t in dict.fromkeys(" ".join(str(t).split()) for t in data.get("triggers", [])) if t][:4]
+        return False, "Safe", ", ".join(emotions) or "Neutral", ", ".join(triggers) or "General"
+
+    async def check_safety_and_analyze_async(self, text, use_cache=True):
+        """
+        First-pass mode: one call for the LLM safety check AND emotions/triggers.
+        Returns (is_risky, reason, emotions, triggers); emotions/triggers are None when risky.
+        Errors and unparseable replies fail safe to RISK.
+        """
+        try:
+            content = await acached_completion(
+                self.async_client,
+                use_cache=use_cache,
+                model=FIRST_PASS_MODEL,
+                response_format=FIRST_PASS_SCHEMA,
+                messages=self._first_pass_messages(text),
+                temperature=0.0
+            )
+            return self._parse_first_pass(content)
+        except Exception as e:
+            if self.raise_errors:
+                raise
+            print(f"Guardian First-Pass Error: {e}")
+            return True, "Error Fallback", None, None
+
+    def _parse_llm_verdict(self, content):
+        result = content.strip().upper()
+        if "RISK" in result:
+            return True, "LLM Detected Contextual Risk"
+        return False, "Safe"
+
+    def check_safety_llm(self, text, use_cache=True):
         """
         Level 2: LLM Semantic Analysis (High Sensitivity Mode)
         """
         try:
-            response = self.client.chat.completions.create(
+            content = cached_completion(
+                self.client,
+                use_cache=use_cache,
                 model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": (
-                            "You are a Zero-Tolerance Safety Guardian for a mental health app. "
-                            "Your ONLY job is to detect potential self-harm or suicide risk. "
-                            "\n\n"
-                            "RULES:"
-                            "1. Flag ANY expression of hopelessness, trapped feelings, or desire to disappear as RISK."
-                            "2. Flag subtle metaphors like 'I want to sleep forever' or 'The fog is swallowing me' as RISK."
-                            "3. If you are even 1% unsure, choose RISK. Better to be safe than sorry."
-                            "4. Ignore clearly positive metaphors (e.g., 'killing it at work' is SAFE)."
-                            "\n\n"
-                            "Return ONLY the word 'RISK' or 'SAFE'."
-                        )
-                    },
-                    {"role": "user", "content": f"Entry: \"{text}\""}
-                ],
+                messages=self._llm_messages(text),
                 temperature=0.0,
                 max_tokens=5
             )
-            result = response.choices[0].message.content.strip().upper()
+            return self._parse_llm_verdict(content)
             
-            if "RISK" in result:
-                return True, "LLM Detected Contextual Risk"
-            return False, "Safe"
+        except Exception as e:
+            if self.raise_errors:
+                raise
+            print(f"Guardian LLM Error: {e}")
+            # FAIL SAFE: If the LLM crashes, assume Risk to be safe
+            return True, "Error Fallback"
+
+    def _batch_messages(self, texts):
+        entries = [{"id": i, "entry": text} for i, text in enumerate(texts)]
+        return [
+            {
+                "role": "system",
+                "content": (
+                    "You are a Zero-Tolerance Safety Guardian for a mental health app, reviewing several "
+                    "journal entries at once. Your ONLY job is to detect potential self-harm or suicide risk. "
+                    "Judge EACH entry on its own; never let one entry influence another."
+                    "\n\n"
+                    + SAFETY_RULES +
+                    "\n\n"
+                    "Return JSON with exactly one verdict ('RISK' or 'SAFE') per entry id."
+                )
+            },
+            {"role": "user", "content": json.dumps(entries, ensure_ascii=False)}
+        ]
+
+    def _parse_batch_verdicts(self, content, count):
+        verdicts = {}
+        for item in json.loads(content).get("verdicts", []):
+            if isinstance(item, dict):
+                verdicts[item.get("id")] = str(item.get("risk", "")).strip().upper()
+        results = []
+        for i in range(count):
+            if verdicts.get(i) == "SAFE":
+                results.append((False, "Safe"))
+            elif verdicts.get(i) == "RISK":
+                results.append((True, "LLM Detected Contextual Risk"))
+            else:
+                # FAIL SAFE: an entry the model skipped or garbled is treated as Risk
+                results.append((True, "Error Fallback"))
+        return results
+
+    def check_safety_llm_batch(self, texts, use_cache=True):
+        """
+        Level 2 for several entries in one structured request.
+        Returns one (is_risky, reason) per text; a failed call or a missing verdict means RISK.
+        """
+        try:
+            content = cached_completion(
+                self.client,
+                use_cache=use_cache,
+                model="gpt-4o-mini",
+                response_format=BATCH_SCHEMA,
+                messages=self._batch_messages(texts),
+                temperature=0.0
+            )
+            return self._parse_batch_verdicts(content, len(texts))
+        except Exception as e:
+            if self.raise_errors:
+                raise
+            print(f"Guardian Batch LLM Error: {e}")
+            return [(True, "Error Fallback") for _ in texts]
+
+    async def check_safety_llm_async(self, text, use_cache=True):
+        """
+        Same as check_safety_llm, on the async client (used by EntryPipeline).
+        """
+        try:
+            content = await acached_completion(
+                self.async_client,
+                use_cache=use_cache,
+                model="gpt-4o-mini",
+                messages=self._llm_messages(text),
+                temperature=0.0,
+                max_tokens=5
+            )
+            return self._parse_llm_verdict(content)
             
         except Exception as e:
+            if self.raise_errors:
+                raise
             print(f"Guardian LLM Error: {e}")
             # FAIL SAFE: If the LLM crashes, assume Risk to be safe
             return True, "Error Fallback"
 
+    def _local_result(self, verdict, p_risk):
+        if verdict == "SAFE":
+            return False, f"Local classifier cleared (p_risk={p_risk:.2f})"
+        if verdict == "RISK":
+            return True, f"Local classifier flagged (p_risk={p_risk:.2f})"
+        return None
+
+    def analyze_batch(self, texts, workers=8):
+        """
+        analyze() for many entries (bulk import): rules for all, one batched local-tier pass for
+        the rest, then concurrent LLM calls for whatever is still undecided.
+        Returns one analyze()-style dict per text. With raise_errors=True, an entry whose LLM check
+        failed comes back as None instead of the fail-safe RISK, so the caller can retry it.
+        """
+        results = [None] * len(texts)
+        undecided = []
+        for i, text in enumerate(texts):
+            is_risky, reason = self.check_safety_rules(text)
+            if is_risky:
+                results[i] = {"is_risk": True, "reason": reason, "tier": "rules"}
+            else:
+                undecided.append(i)
+
+        if self.local_classifier is not None and undecided:
+            try:
+                probs = self.local_classifier.predict_proba([texts[i] for i in undecided])
+            except Exception as e:
+                print(f"Guardian Local Tier Error: {e}")
+                probs = []
+            escalate = []
+            for i, p_risk in zip(undecided, probs):
+                local = self._local_result(self.local_classifier.verdict(p_risk), p_risk)
+                if local is None:
+                    escalate.append(i)
+                else:
+                    results[i] = {"is_risk": local[0], "reason": local[1], "tier": "local"}
+            undecided = escalate if probs else undecided
+
+        def check(i):
+            try:
+                return self.check_safety_llm(texts[i])
+            except Exception as e:
+                # Only reached with raise_errors=True: no verdict for this entry
+                print(f"Guardian LLM Error: {e}")
+                return None
+
+        if undecided:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                verdicts = list(pool.map(check, undecided))
+            for i, verdict in zip(undecided, verdicts):
+                if verdict is not None:
+                    results[i] = {"is_risk": verdict[0], "reason": verdict[1], "tier": "llm"}
+
+        for result in results:
+            if result is not None:
+                self.record_tier(result["tier"])
+        return results
+
     def analyze(self, text):
         # Step 1: Fast Rule Check
         is_risky, reason = self.check_safety_rules(text)
+        tier = "rules"
         
-        # Step 2: If Rule Check passed as Safe, Double Check with LLM
+        # Step 2: If Rule Check passed as Safe, try the Local Tier
         if not is_risky:
-            is_risky, reason = self.check_safety_llm(text)
+            local = self.check_safety_local(text)
+            if local is not None:
+                is_risky, reason = local
+                tier = "local"
+            else:
+                # Step 3: Uncertain (or no local tier): Double Check with LLM
+                if self.batcher is not None:
+                    is_risky, reason = self.batcher.check(text)
+                else:
+                    is_risky, reason = self.check_safety_llm(text)
+                tier = "llm"
         
+        self.record_tier(tier)
         return {
             "is_risk": is_risky,
-            "reason": reason
+            "reason": reason,
+            "tier": tier
         }
\ No newline at end of file
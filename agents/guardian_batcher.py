@@ -0,0 +1,144 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+MODES = ("concurrent", "structured")
+MAX_BATCH = 8
+WAIT_MS = 10.0
+WORKERS = 16
+TIMEOUT_SECONDS = 30.0
+
+
+class GuardianBatcher:
+    """
+    Micro-batching for the Guardian's LLM check when many entries are saved at once.
+
+    Entries submitted within `wait_ms` of each other (up to `max_batch`) form one batch; identical
+    texts in a batch share one verdict. Then, depending on `mode`:
+      - "concurrent": one check_safety_llm call per entry, run on a bounded pool over the agent's
+        keep-alive HTTP client (same prompt as today, so cached verdicts still hit)
+      - "structured": one check_safety_llm_batch request classifies the whole batch
+
+    Fail-safe semantics are per entry and match check_safety_llm: an API error, a missing verdict
+    or a timeout means RISK for that entry.
+    """
+
+    def __init__(self, guardian, mode="structured", max_batch=MAX_BATCH, wait_ms=WAIT_MS,
+                 workers=WORKERS, timeout=TIMEOUT_SECONDS):
+        if mode not in MODES:
+            raise ValueError(f"Unknown batching mode '{mode}'. Use one of {MODES}.")
+        self.guardian = guardian
+        self.mode = mode
+        self.max_batch = max_batch
+        self.wait_s = wait_ms / 1000
+        self.timeout = timeout
+        self.entries = 0
+        self.batches = 0
+        self.requests = 0
+        self._stats_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="guardian-batch")
+        self._thread = threading.Thread(target=self._run, name="guardian-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text):
+        """Queues one entry; the Future resolves to (is_risky, reason)."""
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def check(self, text):
+        """Drop-in for guardian.check_safety_llm(text), blocking until the entry's batch is done."""
+        future = self.submit(text)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            print(f"Guardian Batch Timeout after {self.timeout}s")
+            return True, "Timeout Fallback"
+        except Exception as e:
+            if self.guardian.raise_errors:
+                raise
+            print(f"Guardian Batch Error: {e}")
+            # FAIL SAFE: If the batch crashes, assume Risk to be safe
+            return True, "Error Fallback"
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "mode": self.mode,
+                "entries": self.entries,
+                "batches": self.batches,
+                "llm_requests": self.requests,
+                "avg_batch": self.entries / self.batches if self.batches else 0.0,
+            }
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._pool.shutdown(wait=True)
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.wait_s
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Finish this batch, then stop
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            groups = {}
+            for text, future in batch:
+                groups.setdefault(text, []).append(future)
+
+            single = self.mode == "concurrent" or len(groups) == 1
+            with self._stats_lock:
+                self.entries += len(batch)
+                self.batches += 1
+                self.requests += len(groups) if single else 1
+
+            if single:
+                for text, futures in groups.items():
+                    self._pool.submit(self._check_one, text, futures)
+            else:
+                self._pool.submit(self._check_many, groups)
+
+    def _check_one(self, text, futures):
+        try:
+            result = self.guardian.check_safety_llm(text)
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        for future in futures:
+            future.set_result(result)
+
+    def _check_many(self, groups):
+        texts = list(groups)
+        try:
+            results = self.guardian.check_safety_llm_batch(texts)
+        except Exception as e:
+            for futures in groups.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+        for text, result in zip(texts, results):
+            for future in groups[text]:
+                future.set_result(result)
@@ -0,0 +1,80 @@
+import re
+
+
+def _trie_pattern(phrases):
+    """
+    Compiles phrases into one regex shaped like a character trie, e.g.
+    ["hurt myself", "hang myself"] -> "h(?:ang myself|urt myself)".
+    Shared prefixes are only tested once, so cost grows with text length rather than
+    with (text length x number of phrases). Longer phrases are preferred at each position.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            # A phrase ends here but longer ones continue: try the longer match first
+            return "(?:" + body + ")?"
+        return body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """
+    Precompiled, case-insensitive phrase matcher shared by the Guardian and Coach safety layers.
+    Built once at construction; each scan is a single pass over the text.
+    """
+
+    def __init__(self, phrases, word_boundary=True):
+        # Keep caller order: it decides which phrase is reported first by search()
+        self.phrases = list(dict.fromkeys(p.strip().lower() for p in phrases if p.strip()))
+        self.word_boundary = word_boundary
+        self._rank = {p: i for i, p in enumerate(self.phrases)}
+
+        if self.phrases:
+            pattern = _trie_pattern(self.phrases)
+            if word_boundary:
+                pattern = r"\b(?:" + pattern + r")\b"
+            self._regex = re.compile(pattern, re.IGNORECASE)
+        else:
+            self._regex = None
+
+    @classmethod
+    def from_file(cls, path, word_boundary=True):
+        """
+        Loads one phrase per line. Blank lines and lines starting with '#' are ignored.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            phrases = [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+        return cls(phrases, word_boundary=word_boundary)
+
+    def find_all(self, text):
+        """
+        Returns every (non-overlapping) match as (phrase, start, end), in text order.
+        Spans index into the original text.
+        """
+        if self._regex is None:
+            return []
+        return [(m.group(0).lower(), m.start(), m.end()) for m in self._regex.finditer(text)]
+
+    def search(self, text):
+        """
+        Returns the matched phrase that comes first in the phrase list, or None.
+        """
+        matches = self.find_all(text)
+        if not matches:
+            return None
+        return min((phrase for phrase, _, _ in matches), key=lambda p: self._rank.get(p, len(self._rank)))
+
+    def matches(self, text):
+        """True if any phrase occurs in the text (stops at the first hit)."""
+        return self._regex is not None and self._regex.search(text) is not None
@@ -0,0 +1,219 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = os.getenv("REFLECTAI_LLM_CACHE", "llm_cache.db")
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 20000
+
+
+class LLMCache:
+    """
+    Persistent, content-addressed cache for deterministic (temperature=0) chat completions.
+
+    Keys are a SHA-256 of model + messages + request params, so prompts (and the journal entries
+    inside them) are only stored as hashes. Responses are stored in plain text, and some are
+    derived from journal content: extracted triggers, and the Coach's per-day summaries, which
+    paraphrase a whole day of entries. Treat llm_cache.db as sensitive as journal.db (same
+    machine, same permissions), or pass use_cache=False for calls whose output must not persist.
+    Entries expire after `ttl_seconds` and the least recently used rows are evicted once the
+    cache grows past `max_entries`.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                content TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model, messages, params):
+        payload = json.dumps(
+            {"model": model, "messages": messages, "params": params},
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, model, content):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, content, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, model, content, now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # LRU: drop the oldest-accessed rows beyond max_entries (and anything expired)
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        overflow = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": size,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide cache shared by every agent."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
+
+
+_usage = {}
+_usage_lock = threading.Lock()
+
+
+def _record_usage(model, response):
+    usage = getattr(response, "usage", None)
+    with _usage_lock:
+        tally = _usage.setdefault(model, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+        tally["calls"] += 1
+        if usage is not None:
+            tally["prompt_tokens"] += usage.prompt_tokens or 0
+            tally["completion_tokens"] += usage.completion_tokens or 0
+
+
+def usage_stats():
+    """
+    API calls and tokens per model actually sent by cached_completion/acached_completion
+    in this process (cache hits cost nothing and are not counted).
+    """
+    with _usage_lock:
+        return {model: dict(tally) for model, tally in _usage.items()}
+
+
+def reset_usage():
+    with _usage_lock:
+        _usage.clear()
+
+
+def _cache_key(kwargs, use_cache):
+    """
+    Returns the cache key for a create() call, or None if the call must not be cached.
+    Only deterministic, non-streaming requests are cacheable.
+    """
+    if not use_cache or kwargs.get("stream") or kwargs.get("temperature") != 0.0:
+        return None
+    params = {k: v for k, v in kwargs.items() if k not in ("model", "messages")}
+    return LLMCache.make_key(kwargs.get("model"), kwargs.get("messages"), params)
+
+
+def cached_completion(client, use_cache=True, **kwargs):
+    """
+    Drop-in for client.chat.completions.create(**kwargs) that returns the message content.
+    Pass use_cache=False to always hit the API for this call.
+    """
+    key = _cache_key(kwargs, use_cache)
+    if key is not None:
+        content = get_cache().get(key)
+        if content is not None:
+            return content
+
+    response = client.chat.completions.create(**kwargs)
+    _record_usage(kwargs.get("model"), response)
+    content = response.choices[0].message.content
+
+    if key is not None and content is not None:
+        get_cache().set(key, kwargs.get("model"), content)
+    return content
+
+
+async def acached_completion(async_client, use_cache=True, **kwargs):
+    """
+    Async counterpart of cached_completion for AsyncOpenAI clients.
+    Cache reads and writes are blocking SQLite calls (a lock and a commit each), so they run in a
+    worker thread instead of stalling every other entry on the event loop.
+    """
+    key = _cache_key(kwargs, use_cache)
+    if key is not None:
+        content = await asyncio.to_thread(lambda: get_cache().get(key))
+        if content is not None:
+            return content
+
+    response = await async_client.chat.completions.create(**kwargs)
+    _record_usage(kwargs.get("model"), response)
+    content = response.choices[0].message.content
+
+    if key is not None and content is not None:
+        await asyncio.to_thread(lambda: get_cache().set(key, kwargs.get("model"), content))
+    return content
+
+
+if __name__ == "__main__":
+    import sys
+
+    cache = get_cache()
+    if len(sys.argv) > 1 and sys.argv[1] == "clear":
+        cache.clear()
+        print(f"[LLM CACHE] Cleared {cache.path}.")
+    else:
+        print(f"[LLM CACHE] {cache.path}: {cache.stats()['size']} cached responses.")
@@ -0,0 +1,160 @@
+import asyncio
+import threading
+import time
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop():
+    """
+    One long-lived event loop per process, running in a daemon thread.
+    The agents' async OpenAI clients keep their connection pools bound to the loop
+    they first ran on, so every pipeline (and every Streamlit rerun) shares this one
+    instead of calling asyncio.run() each time.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, daemon=True)
+            thread.start()
+        return _loop
+
+
+class EntryPipeline:
+    """
+    Concurrent version of the Save Entry flow (Guardian -> Analyst).
+
+    The deterministic keyword check still runs first. After that, the Guardian LLM check,
+    emotion classification and trigger extraction are started together, so the latency of a
+    safe entry is roughly the slowest stage instead of the sum of all three. If the Guardian
+    flags the entry, the Analyst results are discarded.
+
+    mode="first_pass" replaces those three calls with one structured call that returns the
+    risk verdict, emotions and triggers together (keyword rules still run first, and a local
+    tier RISK still short-circuits). A RISK verdict, an error or a timeout all count as RISK.
+    """
+
+    DEFAULT_TIMEOUTS = {
+        "guardian": 10.0,
+        "emotions": 15.0,
+        "triggers": 10.0,
+        "first_pass": 15.0,
+    }
+
+    def __init__(self, guardian, analyst, timeouts=None, speculative=True, mode="parallel"):
+        if mode not in ("parallel", "first_pass"):
+            raise ValueError(f"Unknown pipeline mode: {mode}")
+        self.guardian = guardian
+        self.analyst = analyst
+        self.timeouts = {**self.DEFAULT_TIMEOUTS, **(timeouts or {})}
+        # When False, the Analyst stages only start after the Guardian clears the entry
+        self.speculative = speculative
+        self.mode = mode
+        self.last_timings = {}
+
+    async def _run_stage(self, name, awaitable, fallback):
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(awaitable, timeout=self.timeouts[name])
+        except asyncio.TimeoutError:
+            print(f"[PIPELINE] Stage '{name}' timed out after {self.timeouts[name]:g}s. Using fallback.")
+            return fallback
+        except Exception as e:
+            print(f"[PIPELINE] Stage '{name}' failed: {e}. Using fallback.")
+            return fallback
+        finally:
+            self.last_timings[name] = time.perf_counter() - start
+
+    async def process_async(self, text):
+        """
+        Returns: {"is_risk", "reason", "emotions", "triggers", "timings"}
+        emotions/triggers are None when the entry is flagged.
+        """
+        self.last_timings = {}
+        start = time.perf_counter()
+
+        # Step 1: Fast Rule Check (no network)
+        is_risky, reason = self.guardian.check_safety_rules(text)
+        if is_risky:
+            self.guardian.record_tier("rules")
+            return self._result(True, reason, None, None, start)
+
+        # Step 2: Local Tier, if configured (confident verdicts skip the Guardian LLM)
+        local = None
+        if self.guardian.local_classifier is not None:
+            local = await asyncio.to_thread(self.guardian.check_safety_local, text)
+        if self.mode == "first_pass":
+            if local is not None and local[0]:
+                self.guardian.record_tier("local")
+                return self._result(True, local[1], None, None, start)
+            # A local SAFE does not skip the call: it is needed for emotions/triggers anyway,
+            # and its RISK verdict still wins
+            self.guardian.record_tier("llm")
+            is_risky, reason, emotions, triggers = await self._run_stage(
+                "first_pass",
+                self.guardian.check_safety_and_analyze_async(text),
+                (True, "Timeout Fallback", None, None)
+            )
+            return self._result(is_risky, reason, emotions, triggers, start)
+
+        if local is not None:
+            self.guardian.record_tier("local")
+            if local[0]:
+                return self._result(True, local[1], None, None, start)
+            guardian_task = asyncio.ensure_future(self._resolved(local))
+        else:
+            # Step 3: Guardian LLM + Analyst stages
+            self.guardian.record_tier("llm")
+            guardian_task = asyncio.ensure_future(self._run_stage(
+                "guardian",
+                self.guardian.check_safety_llm_async(text),
+                # FAIL SAFE: a slow or broken Guardian counts as Risk, same as check_safety_llm
+                (True, "Timeout Fallback")
+            ))
+
+        if not self.speculative:
+            is_risky, reason = await guardian_task
+            if is_risky:
+                return self._result(True, reason, None, None, start)
+
+        emotions_task = asyncio.ensure_future(self._run_stage(
+            "emotions",
+            asyncio.to_thread(self.analyst.analyze_emotions, text),
+            "Neutral"
+        ))
+        triggers_task = asyncio.ensure_future(self._run_stage(
+            "triggers",
+            self.analyst.extract_triggers_async(text),
+            "General"
+        ))
+
+        is_risky, reason = await guardian_task
+        if is_risky:
+            emotions_task.cancel()
+            triggers_task.cancel()
+            return self._result(True, reason, None, None, start)
+
+        emotions, triggers = await asyncio.gather(emotions_task, triggers_task)
+        return self._result(False, reason, emotions, triggers, start)
+
+    async def _resolved(self, value):
+        return value
+
+    def _result(self, is_risk, reason, emotions, triggers, start):
+        self.last_timings["total"] = time.perf_counter() - start
+        return {
+            "is_risk": is_risk,
+            "reason": reason,
+            "emotions": emotions,
+            "triggers": triggers,
+            "timings": dict(self.last_timings),
+        }
+
+    def process(self, text):
+        """
+        Blocking entry point for Streamlit and scripts.
+        """
+        future = asyncio.run_coroutine_threadsafe(self.process_async(text), get_event_loop())
+        return future.result()
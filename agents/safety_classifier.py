@@ -0,0 +1,159 @@
+import argparse
+import hashlib
+import os
+import pickle
+
+import embedding_service
+
+MODEL_PATH = os.path.join("models", "safety_classifier.pkl")
+DATA_PATH = os.path.join("data", "synthetic_data", "synthetic_safety.csv")
+# Rows kept out of training so the local tier's recall is measured on text it has not seen
+HOLDOUT_FRACTION = 0.2
+SPLIT_SEED = 42
+
+
+def split_paths(data_path):
+    """<name>_train.csv and <name>_holdout.csv next to the labelled file."""
+    stem, ext = os.path.splitext(data_path)
+    return f"{stem}_train{ext}", f"{stem}_holdout{ext}"
+
+
+HOLDOUT_PATH = split_paths(DATA_PATH)[1]
+
+
+def embed(texts, use_cache=False):
+    # Journal entries are not written to the on-disk embedding cache unless asked (training data is)
+    return embedding_service.encode(texts, use_cache=use_cache)
+
+
+class LocalSafetyClassifier:
+    """
+    Tier between the keyword rules and the Guardian LLM.
+
+    A logistic regression over MiniLM sentence embeddings scores each entry with p(risk):
+      - p < clear_below  -> SAFE, no LLM call
+      - p >= flag_above  -> RISK, no LLM call
+      - anything else    -> ESCALATE to the LLM
+    Thresholds are tuned on held-out predictions so the local tier does not lower crisis recall.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, clear_below=None, flag_above=None):
+        with open(model_path, "rb") as f:
+            raw = f.read()
+        bundle = pickle.loads(raw)
+        # Changes whenever the classifier is retrained, so checkpoints of an older fit are not reused
+        self.version = f"{os.path.basename(model_path)}@{hashlib.sha256(raw).hexdigest()[:12]}"
+        self.model = bundle["model"]
+        self.clear_below = bundle["clear_below"] if clear_below is None else clear_below
+        self.flag_above = bundle["flag_above"] if flag_above is None else flag_above
+
+    def predict_proba(self, texts):
+        return self.model.predict_proba(embed(texts))[:, 1].tolist()
+
+    def verdict(self, p_risk):
+        if p_risk < self.clear_below:
+            return "SAFE"
+        if p_risk >= self.flag_above:
+            return "RISK"
+        return "ESCALATE"
+
+    def decide(self, text):
+        """
+        Returns: (verdict, p_risk) where verdict is "SAFE", "RISK" or "ESCALATE".
+        """
+        p_risk = self.predict_proba([text])[0]
+        return self.verdict(p_risk), p_risk
+
+
+def tune_thresholds(probs, labels, target_recall=1.0, min_precision=0.95, margin=0.5):
+    """
+    clear_below: the largest cut-off that still keeps `target_recall` of the risky entries
+    above it, shrunk by `margin` for headroom on unseen text.
+    flag_above: the smallest cut-off whose local RISK calls are at least `min_precision` precise.
+    """
+    risky = sorted(p for p, y in zip(probs, labels) if y)
+    if not risky:
+        raise ValueError("Need at least one risky example to tune thresholds.")
+
+    # Number of risky entries we can afford to clear locally (0 when target_recall is 1.0)
+    allowed_misses = int(len(risky) * (1 - target_recall))
+    clear_below = risky[allowed_misses] * margin
+
+    flag_above = 1.01  # never flag locally unless some cut-off is precise enough
+    for cutoff in sorted(set(probs)):
+        flagged = [y for p, y in zip(probs, labels) if p >= cutoff]
+        if flagged and sum(flagged) / len(flagged) >= min_precision:
+            flag_above = cutoff
+            break
+
+    return clear_below, max(flag_above, clear_below)
+
+
+def split_dataset(data_path, holdout_fraction=HOLDOUT_FRACTION, seed=SPLIT_SEED):
+    """
+    Stratified train/held-out split with a fixed seed, written next to `data_path` so
+    evaluate.py --local-tier scores the same held-out rows. Returns (train_df, holdout_df).
+    """
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+
+    df = pd.read_csv(data_path)
+    labels = df["label"].astype(str).str.lower() == "true"
+    train_df, holdout_df = train_test_split(df, test_size=holdout_fraction, stratify=labels, random_state=seed)
+    train_path, holdout_path = split_paths(data_path)
+    train_df.to_csv(train_path, index=False)
+    holdout_df.to_csv(holdout_path, index=False)
+    print(f"[SAFETY CLASSIFIER] Split {len(df)} entries: {len(train_df)} -> {train_path}, {len(holdout_df)} -> {holdout_path}")
+    return train_df, holdout_df
+
+
+def report_holdout(classifier, holdout_df):
+    """Local-tier numbers on the held-out rows: a risky entry is only lost if it is cleared as SAFE."""
+    labels = (holdout_df["label"].astype(str).str.lower() == "true").tolist()
+    verdicts = [classifier.verdict(p) for p in classifier.predict_proba(holdout_df["text"].astype(str).tolist())]
+    risky = [v for v, y in zip(verdicts, labels) if y]
+    flagged = [y for v, y in zip(verdicts, labels) if v == "RISK"]
+    recall = sum(v != "SAFE" for v in risky) / len(risky) if risky else 1.0
+    print(f"[SAFETY CLASSIFIER] Held-out ({len(labels)} entries, {len(risky)} risky):")
+    print(f"   - Recall (risky entries not cleared locally): {recall:.1%}")
+    print(f"   - Escalated to the LLM: {verdicts.count('ESCALATE') / len(verdicts):.1%}")
+    if flagged:
+        print(f"   - Local RISK precision: {sum(flagged) / len(flagged):.1%}")
+    return recall
+
+
+def train(data_path, model_path=MODEL_PATH, target_recall=1.0, min_precision=0.95):
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import cross_val_predict
+
+    # Only the train portion is used for fitting and thresholds; recall is reported on the rest
+    df, holdout_df = split_dataset(data_path)
+    labels = (df["label"].astype(str).str.lower() == "true").astype(int).tolist()
+    print(f"[SAFETY CLASSIFIER] Embedding {len(df)} entries...")
+    X = embed(df["text"].astype(str).tolist(), use_cache=True)
+
+    model = LogisticRegression(class_weight="balanced", max_iter=1000)
+    # Thresholds come from out-of-fold predictions, not from the training fit
+    held_out = cross_val_predict(model, X, labels, cv=5, method="predict_proba")[:, 1]
+    clear_below, flag_above = tune_thresholds(held_out, labels, target_recall, min_precision)
+    model.fit(X, labels)
+
+    escalated = sum(1 for p in held_out if clear_below <= p < flag_above)
+    print(f"[SAFETY CLASSIFIER] clear_below={clear_below:.3f} flag_above={flag_above:.3f}")
+    print(f"[SAFETY CLASSIFIER] Out-of-fold escalation rate: {escalated / len(held_out):.1%}")
+
+    os.makedirs(os.path.dirname(model_path) or ".", exist_ok=True)
+    with open(model_path, "wb") as f:
+        pickle.dump({"model": model, "clear_below": clear_below, "flag_above": flag_above}, f)
+    print(f"[SAFETY CLASSIFIER] Saved to {model_path}")
+    report_holdout(LocalSafetyClassifier(model_path), holdout_df)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the local Guardian safety tier.")
+    parser.add_argument("--data", default=DATA_PATH, help="Labelled CSV; a stratified held-out split is written next to it.")
+    parser.add_argument("--out", default=MODEL_PATH)
+    parser.add_argument("--target-recall", type=float, default=1.0)
+    parser.add_argument("--min-precision", type=float, default=0.95)
+    args = parser.parse_args()
+    train(args.data, args.out, args.target_recall, args.min_precision)
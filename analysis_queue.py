@@ -0,0 +1,118 @@
+"""
+Background emotion/trigger analysis for entries saved with save_entry(..., pending=True).
+
+Jobs live in journal.db (analysis_jobs), so any number of worker threads, in the Streamlit
+process or in separate `python analysis_queue.py` processes, can share one queue:
+  - claim_job() hands each job to exactly one worker (expired leases are re-claimed)
+  - failures are retried with backoff, then the entry is marked "failed"
+  - complete_analysis() applies results once, even if two workers finish the same entry
+
+Usage: python analysis_queue.py --workers 4 [--db journal.db] [--once]
+"""
+import argparse
+import os
+import socket
+import threading
+import time
+
+from database import claim_job, complete_analysis, fail_job, init_db
+
+POLL_SECONDS = 1.0
+
+
+class AnalysisWorkers:
+    """
+    Worker threads that drain the analysis queue with one AnalystAgent.
+    Build the agent with raise_errors=True so API failures are retried instead of
+    stored as the "Neutral"/"General" fallbacks.
+    """
+
+    def __init__(self, analyst, workers=2, db_name=None, poll_seconds=POLL_SECONDS):
+        self.analyst = analyst
+        self.workers = workers
+        self.db_name = db_name
+        self.poll_seconds = poll_seconds
+        self.processed = 0
+        self.failed = 0
+        self._stats_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._threads = []
+
+    def start(self):
+        init_db(self.db_name)
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._run, args=(f"{prefix}:{i}",), name=f"analysis-worker-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def notify(self):
+        """Wakes idle workers right away (call after queuing an entry)."""
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def run_once(self, worker_id="inline"):
+        """Processes one job in the calling thread. Returns False when the queue is empty."""
+        job = claim_job(worker_id, self.db_name)
+        if job is None:
+            return False
+        job_id, entry_id, content, attempts = job
+        try:
+            result = self.analyst.analyze(content)
+        except Exception as e:
+            print(f"[QUEUE] Entry {entry_id} attempt {attempts} failed: {e}")
+            fail_job(job_id, entry_id, attempts, e, self.db_name)
+            with self._stats_lock:
+                self.failed += 1
+            return True
+
+        complete_analysis(job_id, entry_id, result["emotions"], result["triggers"], self.db_name, self.analyst.version)
+        with self._stats_lock:
+            self.processed += 1
+        return True
+
+    def _run(self, worker_id):
+        while not self._stop.is_set():
+            try:
+                if self.run_once(worker_id):
+                    continue
+            except Exception as e:
+                # e.g. database locked past busy_timeout: back off and keep the thread alive
+                print(f"[QUEUE] {worker_id} error: {e}")
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+
+if __name__ == "__main__":
+    from agents.analyst import AnalystAgent
+
+    parser = argparse.ArgumentParser(description="Run background analysis workers for journal.db.")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--db", default=None, help="Database file (defaults to journal.db).")
+    parser.add_argument("--once", action="store_true", help="Drain the queue and exit.")
+    args = parser.parse_args()
+
+    workers = AnalysisWorkers(AnalystAgent(use_local_model=True, raise_errors=True), args.workers, args.db)
+    if args.once:
+        start = time.perf_counter()
+        while workers.run_once():
+            pass
+        print(f"[QUEUE] Drained: {workers.processed} done, {workers.failed} failed attempts "
+              f"in {time.perf_counter() - start:.1f}s.")
+    else:
+        workers.start()
+        print(f"[QUEUE] {args.workers} workers polling every {POLL_SECONDS}s. Ctrl+C to stop.")
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            workers.stop()
@@ -1,23 +1,70 @@
+import os
 import streamlit as st
-import pandas as pd
 import altair as alt
-from datetime import datetime, timedelta
 
-from database import init_db, save_entry, fetch_history
-from agents.guardian import GuardianAgent
+from database import (
+    init_db, save_entry, fetch_latest, fetch_recent, fetch_daily_stats, fetch_tag_counts,
+    fetch_tag_timeline, fetch_tag_cooccurrence, count_entries_by_status, retry_failed_jobs,
+)
+from agents.guardian import GuardianAgent, FIRST_PASS_MODEL
+from agents.guardian_batcher import GuardianBatcher
 from agents.analyst import AnalystAgent
 from agents.coach import CoachAgent
+from agents.pipeline import EntryPipeline
+from analysis_queue import AnalysisWorkers
+from model_registry import warm_up
 
 st.set_page_config(page_title="ReflectAI", layout="centered")
 
+# Optional: one structured LLM call returns the safety verdict, emotions and triggers together
+# (keyword rules still run first). Check recall with check_first_pass_recall.py before enabling.
+FIRST_PASS = os.getenv("REFLECTAI_FIRST_PASS") == "1"
+# Optional: "concurrent" or "structured" micro-batching of Guardian LLM checks across sessions
+GUARDIAN_BATCHING = os.getenv("REFLECTAI_GUARDIAN_BATCHING", "")
+
+@st.cache_resource
+def load_agents():
+    """
+    Built once per process and shared by every session. Agent construction is cheap:
+    RoBERTa, MiniLM and the RAG knowledge base load lazily, warmed in a background thread
+    (or up front when REFLECTAI_EAGER_LOAD=1).
+    """
+    # Local tier clears/flags confident entries; uncertain ones still go to the LLM
+    guardian = GuardianAgent(use_local_tier=True)
+    if GUARDIAN_BATCHING:
+        # The Guardian is shared by every session, so entries from different users batch together
+        guardian.batcher = GuardianBatcher(guardian, mode=GUARDIAN_BATCHING)
+    # Analyst uses the Mixed RoBERTa model + Simple GPT prompt
+    analyst = AnalystAgent(use_local_model=True)
+    coach = CoachAgent()
+
+    if os.getenv("REFLECTAI_EAGER_LOAD") == "1":
+        guardian.warm_up()
+        analyst.warm_up()
+        coach.warm_up()
+    else:
+        warm_up(guardian.warm_up, analyst.warm_up, coach.warm_up)
+    return guardian, analyst, coach
+
+@st.cache_resource
+def start_analysis_workers():
+    """
+    Emotion/trigger extraction runs off the request path: Save Entry queues a job and these
+    threads (shared by all sessions) fill the results in. More workers can run as separate
+    processes with `python analysis_queue.py`.
+    """
+    init_db()
+    # Same shared RoBERTa model as the session Analyst; errors are retried by the queue
+    analyst = AnalystAgent(use_local_model=True, raise_errors=True)
+    workers = int(os.getenv("REFLECTAI_ANALYSIS_WORKERS", "2"))
+    return AnalysisWorkers(analyst, workers=workers).start()
+
 # Initialize Agents
 if 'guardian' not in st.session_state:
-    st.session_state.guardian = GuardianAgent()
-if 'analyst' not in st.session_state:
-    # Analyst uses the Mixed RoBERTa model + Simple GPT prompt
-    st.session_state.analyst = AnalystAgent(use_local_model=True)
-if 'coach' not in st.session_state:
-    st.session_state.coach = CoachAgent()
+    st.session_state.guardian, st.session_state.analyst, st.session_state.coach = load_agents()
+analysis_workers = start_analysis_workers()
+if FIRST_PASS and 'pipeline' not in st.session_state:
+    st.session_state.pipeline = EntryPipeline(st.session_state.guardian, st.session_state.analyst, mode="first_pass")
 
 init_db()
 
@@ -58,11 +105,15 @@ if page == "New Entry":
         if not journal_text.strip():
             st.error("Please write something before saving.")
         else:
-            with st.spinner("Analyzing..."):
-                # STEP A: Safety Check
-                safety_result = st.session_state.guardian.analyze(journal_text)
+            with st.spinner("Checking..."):
+                if FIRST_PASS:
+                    # STEP A: rules, then one call for safety + emotions + triggers
+                    result = st.session_state.pipeline.process(journal_text)
+                else:
+                    # STEP A: Safety Check stays synchronous (rules -> local tier -> LLM)
+                    result = st.session_state.guardian.analyze(journal_text)
                 
-                if safety_result["is_risk"]:
+                if result["is_risk"]:
                     st.error("**You are not alone.**")
                     st.markdown("""
                         I hear how much difficulty you are in right now, and you should know that you're not alone in this. 
@@ -78,70 +129,93 @@ if page == "New Entry":
                     """)
                     save_entry(journal_text, sleep, stress, "High Risk", "Crisis", True)
                 
-                else:
-                    # STEP B: Emotion Extraction
-                    emotions = st.session_state.analyst.analyze_emotions(journal_text)
-                    
-                    # STEP C: Trigger Extraction 
-                    triggers = st.session_state.analyst.extract_triggers(journal_text)
-                    
-                    # STEP D: Save to Database
-                    save_entry(journal_text, sleep, stress, emotions, triggers, False)
+                elif FIRST_PASS:
+                    # STEP B: The first pass already returned the analysis
+                    save_entry(journal_text, sleep, stress, result["emotions"], result["triggers"], False,
+                               analysis_version=f"{FIRST_PASS_MODEL}:first-pass")
                     
                     st.success("Entry saved successfully!")
-                    
-                    # Display Results
                     c1, c2 = st.columns(2)
-                    c1.info(f"**Emotions:** {emotions}")
-                    c2.info(f"**Topics:** {triggers}")
+                    c1.info(f"**Emotions:** {result['emotions']}")
+                    c2.info(f"**Topics:** {result['triggers']}")
+                
+                else:
+                    # STEP B: Save now; emotions + triggers are extracted by the background workers
+                    save_entry(journal_text, sleep, stress, None, None, False, pending=True)
+                    analysis_workers.notify()
+                    
+                    st.success("Entry saved successfully!")
+                    st.caption("Emotions and topics are being analyzed and will appear in My Insights shortly.")
 
 # PAGE 2: INSIGHTS (The Weekly Loop)
 elif page == "My Insights":
     st.header("Your Wellbeing Dashboard")
     
-    df = fetch_history()
+    recent_df = fetch_latest(5, columns=['date', 'emotions', 'triggers', 'sleep_hours', 'stress_level', 'status'])
+    status_counts = count_entries_by_status()
     
-    if df.empty:
+    if status_counts["pending"]:
+        c1, c2 = st.columns([4, 1])
+        c1.info(f"⏳ {status_counts['pending']} recent entries are still being analyzed.")
+        c2.button("Refresh", key="btn_refresh_pending")
+    if status_counts["failed"]:
+        c1, c2 = st.columns([4, 1])
+        c1.warning(f"{status_counts['failed']} entries could not be analyzed.")
+        if c2.button("Retry", key="btn_retry_failed"):
+            retry_failed_jobs()
+            analysis_workers.notify()
+            st.rerun()
+    
+    if recent_df.empty:
         st.info("No entries yet. Go to 'New Entry' to start journaling!")
     else:
         # Recent History Table
         st.subheader("Recent Entries")
-        st.dataframe(df[['date', 'emotions', 'triggers', 'sleep_hours', 'stress_level']].head(5), use_container_width=True)
+        st.dataframe(recent_df, use_container_width=True)
         
-        # Stress Chart
+        # Stress Chart (one point per day from the daily_stats aggregate)
         st.subheader("Stress Trends")
-        chart = alt.Chart(df).mark_line(point=True).encode(
-            x='date:T',
-            y='stress_level:Q',
-            tooltip=['date', 'emotions', 'stress_level']
+        daily_df = fetch_daily_stats()
+        chart = alt.Chart(daily_df).mark_line(point=True).encode(
+            x=alt.X('day:T', title='date'),
+            y=alt.Y('avg_stress:Q', title='stress_level'),
+            tooltip=['day', 'entry_count', alt.Tooltip('avg_stress:Q', format='.1f'), 'stress_min', 'stress_max']
         ).interactive()
         st.altair_chart(chart, use_container_width=True)
         
-        # Trigger Frequency Chart 
+        # Trigger Frequency Chart (pre-counted per day in daily_tag_counts)
         st.subheader("What affects you the most?")
         
-        if 'triggers' in df.columns and not df['triggers'].dropna().empty:
-            all_triggers = [
-                t.strip() 
-                for sublist in df['triggers'].dropna().str.split(',') 
-                for t in sublist 
-                if t.strip()
-            ]
+        trigger_counts = fetch_tag_counts("trigger")
+        
+        if not trigger_counts.empty:
+            trigger_counts.columns = ['Trigger', 'Count']
             
-            if all_triggers:
-                trigger_counts = pd.Series(all_triggers).value_counts().reset_index()
-                trigger_counts.columns = ['Trigger', 'Count']
-                
-                bar_chart = alt.Chart(trigger_counts).mark_bar().encode(
-                    x=alt.X('Count', title='Frequency', axis=alt.Axis(tickMinStep=1)),
-                    y=alt.Y('Trigger', sort='-x', title='Topic'),
-                    color=alt.Color('Count', legend=None),
-                    tooltip=['Trigger', 'Count']
-                ).properties(height=300)
-                
-                st.altair_chart(bar_chart, use_container_width=True)
-            else:
-                st.info("Not enough trigger data to show trends yet.")
+            bar_chart = alt.Chart(trigger_counts).mark_bar().encode(
+                x=alt.X('Count', title='Frequency', axis=alt.Axis(tickMinStep=1)),
+                y=alt.Y('Trigger', sort='-x', title='Topic'),
+                color=alt.Color('Count', legend=None),
+                tooltip=['Trigger', 'Count']
+            ).properties(height=300)
+            
+            st.altair_chart(bar_chart, use_container_width=True)
+            
+            # Topic Timeline (indexed lookup through entry_tags)
+            st.subheader("Topic Timeline")
+            topic = st.selectbox("Show a trigger over time", trigger_counts['Trigger'].tolist())
+            timeline_df = fetch_tag_timeline(topic)
+            timeline_chart = alt.Chart(timeline_df).mark_bar().encode(
+                x=alt.X('day:T', title='date'),
+                y=alt.Y('count:Q', title='Entries', axis=alt.Axis(tickMinStep=1)),
+                tooltip=['day', 'count']
+            )
+            st.altair_chart(timeline_chart, use_container_width=True)
+            
+            pairs_df = fetch_tag_cooccurrence("trigger", limit=5)
+            if not pairs_df.empty:
+                st.caption("Often appear together")
+                pairs_df.columns = ['Trigger', 'With', 'Entries']
+                st.dataframe(pairs_df, hide_index=True, use_container_width=True)
         else:
             st.info("Start journaling to see what triggers your emotions.")
         
@@ -159,17 +233,31 @@ elif page == "My Insights":
         )
         
         if st.button(f"Generate Insight for Last {days_back} Days", key="btn_weekly_review"):
-            with st.spinner("The Coach is reading your journal..."):
+            analysis_df = fetch_recent(days_back)
+            
+            if analysis_df.empty:
+                st.warning(f"No entries found in the last {days_back} days. Try writing a new entry first!")
+            else:
+                coach = st.session_state.coach
+                st.markdown("### Your Personal Insights")
+                st.markdown(f"**Analyzing {len(analysis_df)} entries from the past {days_back} days...**")
                 
-                df['date'] = pd.to_datetime(df['date'])
-                cutoff_date = datetime.now() - timedelta(days=days_back)
-                analysis_df = df[df['date'] >= cutoff_date]
+                # Stream the report as it is written; the guardrail can cut it mid-stream
+                # The Coach is shared across sessions, so this stream's outcome comes back in its own dict
+                report_area = st.empty()
+                outcome = {}
+                with report_area.container():
+                    patterns = fetch_tag_cooccurrence("trigger", days=days_back, limit=5)
+                    st.write_stream(coach.stream_weekly_report(
+                        analysis_df, patterns=list(patterns.itertuples(index=False)), outcome=outcome
+                    ))
                 
-                if analysis_df.empty:
-                    st.warning(f"No entries found in the last {days_back} days. Try writing a new entry first!")
+                if outcome.get("block"):
+                    report_area.error(outcome["block"])
                 else:
-                    summary = st.session_state.coach.generate_weekly_report(analysis_df)
-                    
-                    st.markdown("### Your Personal Insights")
-                    st.markdown(f"**Analyzing {len(analysis_df)} entries from the past {days_back} days...**")
-                    st.markdown(summary)
\ No newline at end of file
+                    stats = outcome.get("stats")
+                    if stats:
+                        st.caption(
+                            f"{stats['mode'].title()} report · ~{stats['prompt_tokens']} prompt tokens · "
+                            f"first words after {stats.get('first_token_seconds', 0):.1f}s · {stats['total_seconds']:.1f}s total"
+                        )
@@ -0,0 +1,72 @@
+import argparse
+import os
+import time
+os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+import pandas as pd
+
+from agents.analyst import AnalystAgent
+
+DATA_PATHS = [
+    "data/real_data/real_goemotions.csv",
+    "data/real_data/real_vent.csv",
+    "data/real_data/real_isear.csv",
+    "data/synthetic_data/synthetic_emotions.csv",
+]
+
+FALLBACK_TEXTS = [
+    "I finally finished the project and my manager thanked me in front of everyone.",
+    "Couldn't sleep again. Kept thinking about the argument with my sister.",
+    "Traffic was horrible and I was late for the interview.",
+    "Had a quiet evening reading. Felt calm for the first time this week.",
+]
+
+
+def load_texts(limit):
+    texts = []
+    for path in DATA_PATHS:
+        if os.path.exists(path):
+            texts.extend(pd.read_csv(path)["text"].astype(str).tolist())
+    if not texts:
+        print("[WARN] No datasets found, using built-in sample entries.")
+        texts = FALLBACK_TEXTS
+    # Repeat to reach the requested sample size
+    while len(texts) < limit:
+        texts = texts + texts
+    return texts[:limit]
+
+
+def run_benchmark(limit, batch_sizes):
+    print("   ANALYST BATCH THROUGHPUT (CPU)       ")
+
+    agent = AnalystAgent(use_local_model=True)
+    if not agent.use_local:
+        print("[ERROR] Local RoBERTa model not available; nothing to benchmark.")
+        return
+
+    texts = load_texts(limit)
+    print(f"   Entries: {len(texts)}\n")
+
+    # Warm-up so lazy initialisation does not skew the first row
+    agent.analyze_emotions_batch(texts[:4], batch_size=4)
+
+    start = time.perf_counter()
+    for text in texts:
+        agent.analyze_emotions(text)
+    baseline = len(texts) / (time.perf_counter() - start)
+    print(f"   {'Mode':<26}{'Entries/s':>12}{'Speedup':>10}")
+    print(f"   {'per-call pipeline':<26}{baseline:>12.1f}{1.0:>9.2f}x")
+
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        agent.analyze_emotions_batch(texts, batch_size=batch_size)
+        rate = len(texts) / (time.perf_counter() - start)
+        print(f"   {f'batch_size={batch_size}':<26}{rate:>12.1f}{rate / baseline:>9.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Entries/sec vs batch size for AnalystAgent on CPU.")
+    parser.add_argument("--limit", type=int, default=256)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+    run_benchmark(args.limit, args.batch_sizes)
@@ -0,0 +1,77 @@
+import argparse
+import os
+import time
+
+ENTRIES = [
+    "My boss moved the deadline up again and I snapped at my roommate over nothing.",
+    "Had coffee with my sister for the first time in months. I didn't realize how much I missed her.",
+    "Traffic was horrible, I was late to the interview and I think I blew it.",
+    "Finally finished the marathon training plan. Sore, but honestly proud of myself.",
+    "Couldn't sleep again. Kept replaying the argument with Sam about money.",
+    "The new medication makes me foggy and I'm frustrated that nobody at work notices how hard I'm trying.",
+]
+
+
+def run(label, fn, texts):
+    from agents.llm_cache import usage_stats, reset_usage
+
+    reset_usage()
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        fn(text)
+        latencies.append(time.perf_counter() - start)
+    usage = usage_stats()
+    calls = sum(u["calls"] for u in usage.values())
+    prompt = sum(u["prompt_tokens"] for u in usage.values())
+    completion = sum(u["completion_tokens"] for u in usage.values())
+    n = len(texts)
+    print(f"   {label:<28}{sum(latencies) / n * 1000:>10.0f}{calls / n:>8.1f}{prompt / n:>10.0f}{completion / n:>10.0f}")
+    return sum(latencies) / n, prompt / n
+
+
+def run_benchmark(repeats):
+    from agents.analyst import AnalystAgent
+
+    analyst = AnalystAgent(use_local_model=False)
+    texts = ENTRIES * repeats
+
+    def separate(text):
+        # What the LLM path did before: two calls, the entry sent twice
+        return analyst.analyze_emotions(text, use_cache=False), analyst.extract_triggers(text, use_cache=False)
+
+    def merged(text):
+        return analyst.analyze(text, use_cache=False)
+
+    print("   ANALYST: SEPARATE vs MERGED CALL    ")
+    print(f"   {len(texts)} entries, response cache off\n")
+    print(f"   {'Mode':<28}{'ms/entry':>10}{'calls':>8}{'prompt':>10}{'output':>10}")
+    sep_latency, sep_prompt = run("emotions + triggers (2)", separate, texts)
+    merged_latency, merged_prompt = run("analyze() (1 structured)", merged, texts)
+    print(f"\n   Latency: {sep_latency / merged_latency:.2f}x faster | "
+          f"Prompt tokens: {1 - merged_prompt / sep_prompt:.0%} fewer")
+
+    # Same entries through both paths: how often do the answers agree?
+    same = sum(
+        set(analyst.analyze_emotions(t).split(", ")) == set(analyst.analyze(t)["emotions"].split(", "))
+        for t in ENTRIES
+    )
+    print(f"   Emotion sets identical on {same}/{len(ENTRIES)} entries")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyst LLM path: two calls per entry vs one merged structured call.")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--fake", action="store_true", help="Run against the local fake OpenAI server.")
+    parser.add_argument("--latency", type=float, default=0.4, help="Fake server latency per request (s).")
+    args = parser.parse_args()
+
+    if args.fake:
+        from fake_openai_server import FakeOpenAIServer
+
+        with FakeOpenAIServer(latency=args.latency) as server:
+            os.environ["OPENAI_BASE_URL"] = server.base_url
+            os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+            run_benchmark(args.repeats)
+    else:
+        run_benchmark(args.repeats)
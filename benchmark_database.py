@@ -0,0 +1,114 @@
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import database
+
+ENTRY_TEXT = "Work was stressful today, but dinner with friends helped me unwind."
+
+
+def legacy_save(db_name):
+    """The original pattern: fresh connection + rollback journal per insert."""
+    conn = sqlite3.connect(db_name, timeout=30)
+    c = conn.cursor()
+    date_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    c.execute('''
+        INSERT INTO entries (date, content, sleep_hours, stress_level, emotions, triggers, risk_flag)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (date_str, ENTRY_TEXT, 7, 5, "Joy", "Work, Friends", 0))
+    conn.commit()
+    conn.close()
+
+
+def legacy_read(db_name):
+    conn = sqlite3.connect(db_name, timeout=30)
+    conn.execute("SELECT * FROM entries ORDER BY date DESC LIMIT 5").fetchall()
+    conn.close()
+
+
+def pooled_save(db_name):
+    with database.get_pool(db_name).connection() as conn:
+        date_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        conn.execute('''
+            INSERT INTO entries (date, content, sleep_hours, stress_level, emotions, triggers, risk_flag)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (date_str, ENTRY_TEXT, 7, 5, "Joy", "Work, Friends", 0))
+
+
+def pooled_read(db_name):
+    with database.get_pool(db_name).connection() as conn:
+        conn.execute("SELECT * FROM entries ORDER BY date DESC LIMIT 5").fetchall()
+
+
+def run_workload(fn, db_name, threads, ops_per_thread):
+    errors = []
+
+    def worker():
+        for _ in range(ops_per_thread):
+            try:
+                fn(db_name)
+            except sqlite3.OperationalError as e:
+                errors.append(e)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    return (threads * ops_per_thread) / elapsed, len(errors)
+
+
+def run_benchmark(threads, ops):
+    print("   ReflectAI STORAGE BENCHMARK           ")
+    print(f"   Writers: {threads} threads x {ops} ops\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_db = os.path.join(tmp, "legacy.db")
+        pooled_db = os.path.join(tmp, "pooled.db")
+
+        # Legacy baseline keeps the default rollback journal
+        conn = sqlite3.connect(legacy_db)
+        conn.execute('''
+            CREATE TABLE entries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                date TEXT NOT NULL,
+                content TEXT NOT NULL,
+                sleep_hours INTEGER,
+                stress_level INTEGER,
+                emotions TEXT,
+                triggers TEXT,
+                risk_flag INTEGER
+            )
+        ''')
+        conn.commit()
+        conn.close()
+        database.init_db(pooled_db)
+
+        rows = []
+        for label, write_fn, read_fn, db_name in [
+            ("connect-per-call (rollback journal)", legacy_save, legacy_read, legacy_db),
+            ("connection pool (WAL)", pooled_save, pooled_read, pooled_db),
+        ]:
+            write_rate, write_err = run_workload(write_fn, db_name, threads, ops)
+            read_rate, read_err = run_workload(read_fn, db_name, threads, ops)
+            rows.append((label, write_rate, read_rate, write_err + read_err))
+
+        database.close_pools()
+
+    print(f"   {'Mode':<38}{'Inserts/s':>12}{'Reads/s':>12}{'Errors':>8}")
+    for label, write_rate, read_rate, errors in rows:
+        print(f"   {label:<38}{write_rate:>12.0f}{read_rate:>12.0f}{errors:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Insert/read throughput with concurrent writers.")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=200)
+    args = parser.parse_args()
+    run_benchmark(args.threads, args.ops)
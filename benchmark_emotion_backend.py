@@ -0,0 +1,159 @@
+"""
+PyTorch pipeline vs int8 ONNX Runtime for the local RoBERTa emotion model.
+
+  python benchmark_emotion_backend.py              # latency, throughput, load time and peak RSS
+  python benchmark_emotion_backend.py --parity     # accuracy on the ablation datasets, both backends
+
+Each backend is benchmarked in its own subprocess so peak RSS is not shared between them.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+import numpy as np
+
+from benchmark_analyst_batch import load_texts
+from emotion_backend import BACKENDS, OnnxEmotionClassifier
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def measure(backend, limit, threads, batch_size):
+    from agents.analyst import AnalystAgent
+
+    agent = AnalystAgent(use_local_model=True, backend=backend, onnx_threads=threads)
+    if not agent.use_local:
+        return {"error": "local RoBERTa model not available"}
+
+    start = time.perf_counter()
+    agent.warm_up()
+    load_s = time.perf_counter() - start
+    texts = load_texts(limit)
+
+    # Warm-up so lazy initialisation does not skew the first call
+    agent.analyze_emotions(texts[0])
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        agent.analyze_emotions(text)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    agent.analyze_emotions_batch(texts, batch_size=batch_size)
+    rate = len(texts) / (time.perf_counter() - start)
+
+    return {
+        "onnx_loaded": isinstance(agent.classifier, OnnxEmotionClassifier),
+        "load_s": load_s,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "batch_rate": rate,
+        "rss_mb": peak_rss_mb(),
+    }
+
+
+def run_benchmark(limit, threads, batch_size):
+    print("   EMOTION BACKEND: TORCH vs ONNX INT8 ")
+    print(f"   {limit} entries, batch_size={batch_size}, onnx threads={threads or 'default'}\n")
+    print(f"   {'Backend':<10}{'Load s':>8}{'p50 ms':>9}{'p95 ms':>9}{'Batch/s':>10}{'Peak RSS MB':>13}")
+
+    results = {}
+    for backend in BACKENDS:
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", backend, "--limit", str(limit),
+             "--threads", str(threads), "--batch-size", str(batch_size)],
+            capture_output=True, text=True
+        )
+        lines = [l for l in proc.stdout.splitlines() if l.startswith("{")]
+        if proc.returncode != 0 or not lines:
+            print(f"   {backend:<10} failed:\n{proc.stderr[-800:]}")
+            continue
+        r = json.loads(lines[-1])
+        if "error" in r:
+            print(f"   {backend:<10} {r['error']}")
+            continue
+        results[backend] = r
+        label = f"{backend}*" if backend == "onnx" and not r["onnx_loaded"] else backend
+        print(f"   {label:<10}{r['load_s']:>8.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+              f"{r['batch_rate']:>10.1f}{r['rss_mb']:>13.0f}")
+
+    if "onnx" in results and not results["onnx"]["onnx_loaded"]:
+        print("\n   * ONNX backend fell back to PyTorch (is onnxruntime installed?)")
+    elif len(results) == 2:
+        t, o = results["torch"], results["onnx"]
+        print(f"\n   ONNX int8: {t['p50_ms'] / o['p50_ms']:.2f}x faster per entry (p50), "
+              f"{o['batch_rate'] / t['batch_rate']:.2f}x batch throughput, "
+              f"{1 - o['rss_mb'] / t['rss_mb']:.0%} less peak RSS")
+
+
+def run_parity(threads, batch_size, max_drop):
+    """
+    Accuracy of both backends on the ablation datasets (same scorer as run_grand_ablation.py),
+    plus how often the two return exactly the same label set.
+    Returns False if ONNX accuracy drops more than `max_drop` points on any dataset.
+    """
+    import pandas as pd
+    from agents.analyst import AnalystAgent
+    from run_grand_ablation import DATASETS
+    from scoring import LabelScorer
+
+    torch_agent = AnalystAgent(use_local_model=True, backend="torch", raise_errors=True)
+    onnx_agent = AnalystAgent(use_local_model=True, backend="onnx", onnx_threads=threads, raise_errors=True)
+    if not torch_agent.use_local:
+        print("[ERROR] Local RoBERTa model not available; nothing to compare.")
+        return False
+    if not isinstance(onnx_agent.classifier, OnnxEmotionClassifier):
+        print("[ERROR] ONNX backend did not load; parity check is meaningless.")
+        return False
+    scorer = LabelScorer(threshold=0.55)
+
+    print("   EMOTION BACKEND PARITY (ablation datasets)")
+    print(f"\n   {'Dataset':<22}{'Rows':>6}{'Torch':>9}{'ONNX':>9}{'Drop':>8}{'Same labels':>13}")
+    ok = True
+    for ds in DATASETS:
+        if not os.path.exists(ds["path"]):
+            print(f"   {ds['name']:<22} file not found: {ds['path']}")
+            continue
+        df = pd.read_csv(ds["path"])
+        texts = df["text"].astype(str).tolist()
+        expected = df["expected"].astype(str).tolist()
+
+        torch_labels = torch_agent.analyze_emotions_batch(texts, batch_size=batch_size)
+        onnx_labels = onnx_agent.analyze_emotions_batch(texts, batch_size=batch_size)
+        acc_torch = np.mean(scorer.matches(expected, [", ".join(l) for l in torch_labels])) * 100
+        acc_onnx = np.mean(scorer.matches(expected, [", ".join(l) for l in onnx_labels])) * 100
+        same = np.mean([set(a) == set(b) for a, b in zip(torch_labels, onnx_labels)])
+
+        drop = acc_torch - acc_onnx
+        ok = ok and drop <= max_drop
+        print(f"   {ds['name']:<22}{len(texts):>6}{acc_torch:>8.1f}%{acc_onnx:>8.1f}%{drop:>7.1f}%{same:>13.1%}")
+
+    print(f"\n   RESULT: {'PASS' if ok else 'FAIL'} (ONNX accuracy may drop at most {max_drop:.1f} points)")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency, memory and accuracy: PyTorch vs int8 ONNX emotion model.")
+    parser.add_argument("--limit", type=int, default=128)
+    parser.add_argument("--threads", type=int, default=0, help="ONNX intra-op threads (0 = onnxruntime default).")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--parity", action="store_true", help="Compare accuracy on the ablation datasets instead.")
+    parser.add_argument("--max-drop", type=float, default=1.0, help="Allowed accuracy drop (points) for --parity.")
+    parser.add_argument("--child", choices=BACKENDS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.limit, args.threads, args.batch_size)))
+    elif args.parity:
+        sys.exit(0 if run_parity(args.threads, args.batch_size, args.max_drop) else 1)
+    else:
+        run_benchmark(args.limit, args.threads, args.batch_size)
@@ -0,0 +1,135 @@
+"""
+Load test for emotion_server.py: N concurrent sessions, each sending one entry at a time.
+
+Starts the server in a subprocess (once without batching, once with the batching window) and
+reports p50/p99 latency, throughput, average batch size and the server's resident memory.
+Without the server, each Streamlit process would hold its own copy of the model.
+
+  python benchmark_emotion_server.py --sessions 1 4 16 --requests 20 [--backend onnx]
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+import numpy as np
+
+from benchmark_analyst_batch import load_texts
+from emotion_backend import EmotionServerClient
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_mb(pid):
+    """Current resident memory of `pid` (Linux /proc only)."""
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def start_server(port, backend, wait_ms, max_batch):
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "emotion_server.py")
+    cmd = [sys.executable, script, "--port", str(port),
+           "--wait-ms", str(wait_ms), "--max-batch", str(max_batch)]
+    if backend:
+        cmd += ["--backend", backend]
+    proc = subprocess.Popen(cmd)
+    client = EmotionServerClient(f"http://127.0.0.1:{port}", timeout=5)
+    deadline = time.time() + 300
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"emotion_server.py exited with code {proc.returncode}")
+        try:
+            client.health()
+            return proc
+        except OSError:
+            time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError("emotion_server.py did not come up in time")
+
+
+def run_sessions(url, sessions, requests, texts):
+    """Each session is a thread with its own AnalystAgent in client mode, like a Streamlit session."""
+    from agents.analyst import AnalystAgent
+
+    latencies = []
+    lock = threading.Lock()
+    errors = []
+
+    def session(n):
+        agent = AnalystAgent(use_local_model=True, server_url=url)
+        local = []
+        for i in range(requests):
+            text = texts[(n * requests + i) % len(texts)]
+            start = time.perf_counter()
+            try:
+                agent.classifier(text)
+            except Exception as e:
+                errors.append(e)
+                continue
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=session, args=(n,)) for n in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return latencies, elapsed, len(errors)
+
+
+def run_benchmark(session_counts, requests, backend, wait_ms, max_batch):
+    texts = load_texts(max(session_counts) * requests)
+    print("   EMOTION SERVER LOAD TEST            ")
+    print(f"   {requests} requests per session, max batch {max_batch}\n")
+    print(f"   {'Window':<9}{'Sessions':>9}{'p50 ms':>9}{'p99 ms':>9}{'Req/s':>9}{'Avg batch':>11}{'Server RSS MB':>15}{'Errors':>8}")
+
+    for window in (0.0, wait_ms):
+        port = free_port()
+        proc = start_server(port, backend, window, max_batch)
+        url = f"http://127.0.0.1:{port}"
+        client = EmotionServerClient(url)
+        try:
+            client(texts[0])  # first forward pass outside the timings
+            for sessions in session_counts:
+                before = client.health()
+                latencies, elapsed, errors = run_sessions(url, sessions, requests, texts)
+                after = client.health()
+                batches = after["batches"] - before["batches"]
+                avg_batch = (after["texts"] - before["texts"]) / batches if batches else 0.0
+                rss = rss_mb(proc.pid)
+                p50, p99 = (np.percentile(latencies, [50, 99]) if latencies else (float("nan"),) * 2)
+                print(f"   {f'{window:g} ms':<9}{sessions:>9}{p50:>9.1f}{p99:>9.1f}{len(latencies) / elapsed:>9.1f}"
+                      f"{avg_batch:>11.1f}{rss if rss is not None else float('nan'):>15.0f}{errors:>8}")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    print("\n   One server process holds the only model copy, however many sessions connect.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="p50/p99 latency and memory of the shared emotion server under load.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=20, help="Requests per session.")
+    parser.add_argument("--backend", choices=["torch", "onnx"], default=None)
+    parser.add_argument("--wait-ms", type=float, default=5.0, help="Batching window to compare against no batching.")
+    parser.add_argument("--max-batch", type=int, default=32)
+    args = parser.parse_args()
+    run_benchmark(args.sessions, args.requests, args.backend, args.wait_ms, args.max_batch)
@@ -0,0 +1,135 @@
+"""
+Load test for GuardianBatcher against the local fake OpenAI server.
+
+N concurrent users each save entries through guardian.analyze(); compares no batching,
+"concurrent" batching and "structured" batching on latency, throughput, HTTP requests and
+verdict accuracy, then checks that API failures still come back as RISK for every entry.
+
+  python benchmark_guardian_batching.py --users 1 8 32 --entries 10 --latency 0.3
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_openai_server import FakeOpenAIServer
+
+SAFE_TEXTS = [
+    "My boss moved the deadline up again and I snapped at my roommate.",
+    "Had coffee with my sister, first time in months.",
+    "Traffic was horrible and I was late to the interview.",
+]
+# Caught by the LLM check, not the keyword rules
+RISK_TEXTS = [
+    "Everything feels hopeless lately.",
+    "Some days I just want to disappear.",
+]
+
+
+def make_entries(users, per_user, run):
+    """Unique texts per run (so the response cache never answers), every fifth one risky."""
+    entries = []
+    for u in range(users):
+        for i in range(per_user):
+            risky = (u * per_user + i) % 5 == 0
+            pool = RISK_TEXTS if risky else SAFE_TEXTS
+            entries.append((u, f"{pool[i % len(pool)]} (run {run}, user {u}, entry {i})", risky))
+    return entries
+
+
+def run_load(guardian, users, per_user, run):
+    entries = make_entries(users, per_user, run)
+    latencies = []
+    correct = []
+    lock = threading.Lock()
+
+    def user(u):
+        local_latencies, local_correct = [], []
+        for _, text, risky in (e for e in entries if e[0] == u):
+            start = time.perf_counter()
+            result = guardian.analyze(text)
+            local_latencies.append((time.perf_counter() - start) * 1000)
+            local_correct.append(result["is_risk"] == risky)
+        with lock:
+            latencies.extend(local_latencies)
+            correct.extend(local_correct)
+
+    threads = [threading.Thread(target=user, args=(u,)) for u in range(users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return latencies, elapsed, sum(correct) / len(correct)
+
+
+def run_benchmark(user_counts, per_user, latency, wait_ms, max_batch):
+    print("   GUARDIAN MICRO-BATCHING LOAD TEST (fake OpenAI)")
+    print(f"   {per_user} entries per user, server latency {latency}s, window {wait_ms} ms, max batch {max_batch}\n")
+    print(f"   {'Mode':<12}{'Users':>6}{'p50 ms':>9}{'p99 ms':>9}{'Entries/s':>11}{'HTTP reqs':>11}{'Accuracy':>10}")
+
+    with FakeOpenAIServer(latency=latency) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+        os.environ["REFLECTAI_LLM_CACHE"] = os.path.join(tempfile.mkdtemp(), "llm_cache.db")
+        run = 0
+
+        from agents.guardian import GuardianAgent
+        from agents.guardian_batcher import GuardianBatcher
+        from eval_runner import disable_sdk_retries
+
+        for mode in ("none", "concurrent", "structured"):
+            for users in user_counts:
+                guardian = GuardianAgent()
+                if mode != "none":
+                    guardian.batcher = GuardianBatcher(guardian, mode=mode, max_batch=max_batch, wait_ms=wait_ms)
+                run += 1
+                before = server.request_count
+                latencies, elapsed, accuracy = run_load(guardian, users, per_user, run)
+                p50, p99 = np.percentile(latencies, [50, 99])
+                print(f"   {mode:<12}{users:>6}{p50:>9.0f}{p99:>9.0f}{len(latencies) / elapsed:>11.1f}"
+                      f"{server.request_count - before:>11}{accuracy:>10.0%}")
+                if guardian.batcher is not None:
+                    guardian.batcher.stop()
+
+        # Fail-safe: every request rejected -> every entry must come back RISK
+        print()
+        server.rate_limit_every = 1
+        ok = True
+        for mode in ("concurrent", "structured"):
+            guardian = GuardianAgent()
+            disable_sdk_retries(guardian)
+            guardian.batcher = GuardianBatcher(guardian, mode=mode, max_batch=max_batch, wait_ms=wait_ms)
+            run += 1
+            results = []
+            threads = [threading.Thread(target=lambda t=text: results.append(guardian.analyze(t)))
+                       for _, text, _ in make_entries(4, 3, run)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            flagged = sum(r["is_risk"] and r["reason"] == "Error Fallback" for r in results)
+            ok = ok and flagged == len(results)
+            print(f"   [{'PASS' if flagged == len(results) else 'FAIL'}] {mode}: API errors -> "
+                  f"{flagged}/{len(results)} entries fail safe to RISK")
+            guardian.batcher.stop()
+        server.rate_limit_every = 0
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Guardian LLM checks under load: no batching vs micro-batching.")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--entries", type=int, default=10, help="Entries saved per user.")
+    parser.add_argument("--latency", type=float, default=0.3, help="Fake server latency per request (s).")
+    parser.add_argument("--wait-ms", type=float, default=10.0)
+    parser.add_argument("--max-batch", type=int, default=8)
+    args = parser.parse_args()
+    sys.exit(0 if run_benchmark(args.users, args.entries, args.latency, args.wait_ms, args.max_batch) else 1)
@@ -0,0 +1,88 @@
+import argparse
+import random
+import re
+import time
+
+from agents.keyword_matcher import KeywordMatcher
+
+GUARDIAN_KEYWORDS = [
+    "suicide", "kill myself", "end my life", "hurt myself",
+    "die", "death", "overdose", "cutting myself", "hang myself"
+]
+
+FILLER_WORDS = (
+    "today work was long and my manager kept adding tasks so I stayed late "
+    "then I walked home through the park and called my sister about the weekend "
+    "I felt tired but also a little proud that I finished the report on time"
+).split()
+
+
+def legacy_check(keywords, text):
+    """The original Guardian scan: one fresh regex per keyword per call."""
+    text_lower = text.lower()
+    for keyword in keywords:
+        if re.search(r'\b' + re.escape(keyword) + r'\b', text_lower):
+            return keyword
+    return None
+
+
+def legacy_find_all(keywords, text):
+    text_lower = text.lower()
+    spans = []
+    for keyword in keywords:
+        for m in re.finditer(r'\b' + re.escape(keyword) + r'\b', text_lower):
+            spans.append((keyword, m.start(), m.end()))
+    return spans
+
+
+def make_keywords(n, rng):
+    # Synthetic multi-word phrases that share prefixes, like a real clinical lexicon
+    stems = ["feel", "want to", "can't", "never", "no one", "going to", "so tired of"]
+    objects = ["go on", "wake up", "be here", "cope", "breathe", "care", "stop it", "fix this"]
+    keywords = list(GUARDIAN_KEYWORDS)
+    while len(keywords) < n:
+        keywords.append(f"{rng.choice(stems)} {rng.choice(objects)} {rng.randint(0, 10**6)}")
+    return keywords[:n]
+
+
+def make_entry(words, rng):
+    return " ".join(rng.choice(FILLER_WORDS) for _ in range(words))
+
+
+def time_it(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def run_benchmark(entry_words, keyword_counts, repeats):
+    print("   KEYWORD MATCHER BENCHMARK           ")
+    rng = random.Random(0)
+    # Safe entries are the worst case: every keyword must be ruled out
+    text = make_entry(entry_words, rng)
+    print(f"   Entry length: {entry_words} words ({len(text)} chars), no matches\n")
+
+    print(f"   {'Keywords':>9}{'Build (ms)':>12}{'Legacy (ms)':>13}{'Matcher (ms)':>14}{'Speedup':>10}")
+    for n in keyword_counts:
+        keywords = make_keywords(n, rng)
+
+        start = time.perf_counter()
+        matcher = KeywordMatcher(keywords)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        # Spans must agree before timing means anything
+        assert sorted(matcher.find_all(text)) == sorted(legacy_find_all(keywords, text))
+
+        legacy_ms = time_it(lambda: legacy_check(keywords, text), repeats)
+        matcher_ms = time_it(lambda: matcher.search(text), repeats)
+        print(f"   {n:>9}{build_ms:>12.1f}{legacy_ms:>13.3f}{matcher_ms:>14.3f}{legacy_ms / matcher_ms:>9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Legacy per-keyword regex scan vs precompiled KeywordMatcher.")
+    parser.add_argument("--entry-words", type=int, default=5000)
+    parser.add_argument("--keywords", type=int, nargs="+", default=[9, 100, 1000, 5000])
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    run_benchmark(args.entry_words, args.keywords, args.repeats)
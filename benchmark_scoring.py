@@ -0,0 +1,66 @@
+import argparse
+import random
+import time
+
+from sentence_transformers import util
+
+from embedding_service import get_encoder
+from scoring import LabelScorer
+
+LABELS = [
+    "Admiration", "Amusement", "Anger", "Annoyance", "Approval", "Caring",
+    "Confusion", "Curiosity", "Desire", "Disappointment", "Disapproval",
+    "Disgust", "Embarrassment", "Excitement", "Fear", "Gratitude", "Grief",
+    "Joy", "Love", "Nervousness", "Optimism", "Pride", "Realization",
+    "Relief", "Remorse", "Sadness", "Surprise", "Neutral"
+]
+
+
+def legacy_match(embedder, expected, predicted, threshold):
+    """The original check_match: two encode() calls per row."""
+    expected = str(expected).lower().strip()
+    predicted = str(predicted).lower().strip()
+    if expected in predicted:
+        return True
+    emb1 = embedder.encode(expected, convert_to_tensor=True)
+    emb2 = embedder.encode(predicted, convert_to_tensor=True)
+    return util.cos_sim(emb1, emb2).item() > threshold
+
+
+def make_rows(n, rng):
+    # Predictions look like the Analyst's output: 1-3 labels joined with ", "
+    expected = [rng.choice(LABELS) for _ in range(n)]
+    predicted = [", ".join(rng.sample(LABELS, rng.randint(1, 3))) for _ in range(n)]
+    return expected, predicted
+
+
+def run_benchmark(row_counts, threshold):
+    print("   SEMANTIC SCORING BENCHMARK          ")
+    rng = random.Random(0)
+    embedder = get_encoder()
+    embedder.encode(["warm up"])
+
+    print(f"   {'Rows':>7}{'Legacy (s)':>12}{'Scorer (s)':>12}{'Speedup':>10}{'Agree':>8}")
+    for n in row_counts:
+        expected, predicted = make_rows(n, rng)
+
+        start = time.perf_counter()
+        legacy = [legacy_match(embedder, e, p, threshold) for e, p in zip(expected, predicted)]
+        legacy_s = time.perf_counter() - start
+
+        # Fresh scorer per size, so its label cache is part of the measured cost
+        start = time.perf_counter()
+        scorer = LabelScorer(vocabulary=LABELS, threshold=threshold, use_disk_cache=False)
+        fast = scorer.matches(expected, predicted)
+        scorer_s = time.perf_counter() - start
+
+        agree = sum(a == b for a, b in zip(legacy, fast)) / n
+        print(f"   {n:>7}{legacy_s:>12.2f}{scorer_s:>12.2f}{legacy_s / scorer_s:>9.1f}x{agree:>8.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-row encode + cos_sim vs cached, batched LabelScorer.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--threshold", type=float, default=0.55)
+    args = parser.parse_args()
+    run_benchmark(args.rows, args.threshold)
@@ -0,0 +1,56 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Runs inside a fresh interpreter so every measurement is a true cold start
+CHILD_SCRIPT = """
+import json, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("app.py", default_timeout=600)
+at.run()
+first_paint = time.perf_counter() - start
+print(json.dumps({"first_paint": first_paint, "errors": [str(e.value) for e in at.exception]}))
+"""
+
+
+def measure(eager):
+    env = dict(os.environ)
+    env["REFLECTAI_EAGER_LOAD"] = "1" if eager else "0"
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT],
+        capture_output=True, text=True, env=env,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process"] = wall
+    return result
+
+
+def run_benchmark(runs):
+    print("   STREAMLIT COLD START BENCHMARK       ")
+    print("   first paint = AppTest script run finished (all widgets rendered)\n")
+
+    print(f"   {'Mode':<34}{'First paint (s)':>16}{'Process (s)':>14}")
+    for label, eager in [("eager (models before render)", True), ("lazy + background warm-up", False)]:
+        samples = [measure(eager) for _ in range(runs)]
+        paint = sum(s["first_paint"] for s in samples) / runs
+        process = sum(s["process"] for s in samples) / runs
+        print(f"   {label:<34}{paint:>16.2f}{process:>14.2f}")
+        for s in samples:
+            for error in s["errors"]:
+                print(f"      [APP ERROR] {error}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold start to first paint for app.py, eager vs lazy model loading.")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    run_benchmark(args.runs)
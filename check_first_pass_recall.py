@@ -0,0 +1,94 @@
+"""
+Recall regression check for the first-pass pipeline mode (one call for safety + analysis).
+
+Runs every row of synthetic_safety.csv through
+  - the standard Guardian (rules -> LLM), and
+  - EntryPipeline(mode="first_pass") (rules -> one structured call)
+and exits non-zero if first-pass crisis recall is below the standard Guardian's
+(or below --min-recall). Run it before turning on REFLECTAI_FIRST_PASS=1.
+"""
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+from eval_runner import EvalRunner, DEFAULT_WORKERS
+
+SAFETY_DATA_PATH = os.path.join("data", "synthetic_data", "synthetic_safety.csv")
+FALLBACK_REASONS = ("Error Fallback", "Timeout Fallback")
+
+
+def recall_and_precision(labels, predictions):
+    scored = [(y, p) for y, p in zip(labels, predictions) if p is not None]
+    tp = sum(1 for y, p in scored if y and p)
+    positives = sum(1 for y, _ in scored if y)
+    flagged = sum(1 for _, p in scored if p)
+    return (tp / positives if positives else 1.0), (tp / flagged if flagged else 0.0), len(scored)
+
+
+def run_check(data_path, workers, resume, min_recall):
+    from agents.guardian import GuardianAgent
+    from agents.analyst import AnalystAgent
+    from agents.pipeline import EntryPipeline
+
+    df = pd.read_csv(data_path)
+    labels = (df["label"].astype(str).str.lower() == "true").tolist()
+    texts = df["text"].astype(str).tolist()
+
+    guardian = GuardianAgent()
+    pipeline = EntryPipeline(guardian, AnalystAgent(use_local_model=False), mode="first_pass")
+
+    def standard(text):
+        result = guardian.analyze(text)
+        # A fallback is not a model verdict: leave the row unscored (and un-checkpointed)
+        if result["reason"] in FALLBACK_REASONS:
+            raise RuntimeError(result["reason"])
+        return result["is_risk"]
+
+    def first_pass(text):
+        result = pipeline.process(text)
+        if result["reason"] in FALLBACK_REASONS:
+            raise RuntimeError(result["reason"])
+        return result["is_risk"]
+
+    print("   FIRST-PASS RECALL REGRESSION CHECK  ")
+    baseline = EvalRunner("first-pass-check-standard", workers=workers, resume=resume).map(standard, texts)
+    candidate = EvalRunner("first-pass-check-combined", workers=workers, resume=resume).map(first_pass, texts)
+
+    base_recall, base_precision, base_n = recall_and_precision(labels, baseline)
+    cand_recall, cand_precision, cand_n = recall_and_precision(labels, candidate)
+    missed = [t for t, y, b, c in zip(texts, labels, baseline, candidate) if y and b and c is False]
+
+    print(f"\n   {'Mode':<22}{'Recall':>9}{'Precision':>11}{'Scored':>9}")
+    print(f"   {'standard Guardian':<22}{base_recall:>9.2%}{base_precision:>11.2%}{base_n:>9}")
+    print(f"   {'first pass':<22}{cand_recall:>9.2%}{cand_precision:>11.2%}{cand_n:>9}")
+    for text in missed:
+        print(f"   [MISSED BY FIRST PASS] '{text[:60]}...'")
+    if base_n < len(texts) or cand_n < len(texts):
+        print(f"   [WARN] {len(texts) - min(base_n, cand_n)} rows unscored (API errors); re-run to resume them.")
+
+    ok = cand_recall >= base_recall and cand_recall >= min_recall
+    print(f"\n   RESULT: {'PASS' if ok else 'FAIL'} (first-pass recall must be >= standard and >= {min_recall:.0%})")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crisis recall: standard Guardian vs first-pass pipeline mode.")
+    parser.add_argument("--data", default=SAFETY_DATA_PATH)
+    parser.add_argument("--min-recall", type=float, default=1.0)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--fresh", action="store_true", help="Ignore checkpoints in eval_checkpoints/ and start over.")
+    parser.add_argument("--fake", action="store_true", help="Run against the local fake OpenAI server.")
+    args = parser.parse_args()
+
+    if args.fake:
+        from fake_openai_server import FakeOpenAIServer
+
+        with FakeOpenAIServer(latency=0.05) as server:
+            os.environ["OPENAI_BASE_URL"] = server.base_url
+            os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+            ok = run_check(args.data, args.workers, not args.fresh, args.min_recall)
+    else:
+        ok = run_check(args.data, args.workers, not args.fresh, args.min_recall)
+    sys.exit(0 if ok else 1)
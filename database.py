@@ -1,13 +1,184 @@
+import queue
 import sqlite3
-from datetime import datetime
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 import pandas as pd
 
 DB_NAME = "journal.db"
 
-def init_db():
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('''
+# Connection pool settings
+POOL_SIZE = 8
+BUSY_TIMEOUT_MS = 5000
+
+# Tuned for a write-light, read-mostly journaling workload:
+# WAL lets readers run while a writer commits, NORMAL sync is durable
+# across application crashes in WAL mode, and temp data stays in RAM.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA foreign_keys=ON",
+)
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of SQLite connections to a single database file.
+    Connections are created lazily (up to `size`) and reused across threads.
+    """
+
+    def __init__(self, db_name, size=POOL_SIZE):
+        self.db_name = db_name
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._created = 0
+        # Every open connection, idle or checked out, so close() can account for all of them
+        self._connections = set()
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_name,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _take(self, block):
+        conn = self._idle.get() if block else self._idle.get_nowait()
+        if conn is None:
+            # close() left a sentinel: pass it on to the next waiter and give up
+            self._idle.put_nowait(None)
+            raise sqlite3.ProgrammingError(f"Connection pool for {self.db_name} is closed.")
+        return conn
+
+    def acquire(self):
+        try:
+            return self._take(block=False)
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError(f"Connection pool for {self.db_name} is closed.")
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+
+        if create:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+            with self._lock:
+                self._connections.add(conn)
+            return conn
+
+        # Pool exhausted: wait for another thread to give one back
+        return self._take(block=True)
+
+    def release(self, conn):
+        with self._lock:
+            if not self._closed:
+                self._idle.put_nowait(conn)
+                return
+            # Checked out when the pool was closed: close it now instead of pooling it again
+            self._connections.discard(conn)
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection for one unit of work.
+        Commits on success, rolls back on error, and always returns it to the pool.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """
+        Closes idle connections now and checked-out ones as they are released.
+        `_created` is left as is, so the pool never holds more than `size` connections.
+        """
+        with self._lock:
+            self._closed = True
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                if conn is not None:
+                    self._connections.discard(conn)
+                    conn.close()
+            # Wakes threads blocked in acquire() so they fail instead of waiting forever
+            self._idle.put_nowait(None)
+
+
+_pools = {}
+_initialized = set()
+_registry_lock = threading.RLock()
+
+
+def get_pool(db_name=None):
+    """Returns the process-wide pool for `db_name` (defaults to DB_NAME)."""
+    db_name = db_name or DB_NAME
+    with _registry_lock:
+        pool = _pools.get(db_name)
+        if pool is None:
+            pool = ConnectionPool(db_name)
+            _pools[db_name] = pool
+        return pool
+
+
+def close_pools():
+    with _registry_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+        _initialized.clear()
+
+
+# Identifies whose journal a row belongs to. The app is single-user today,
+# so everything lands under DEFAULT_USER unless a caller says otherwise.
+DEFAULT_USER = "default"
+
+ENTRY_COLUMNS = (
+    "id", "user_id", "date", "content", "sleep_hours",
+    "stress_level", "emotions", "triggers", "risk_flag", "status", "analysis_version",
+)
+
+# entries.status: "done" once emotions/triggers are stored, "pending" while the
+# background analysis job runs, "failed" when it gave up after MAX_JOB_ATTEMPTS.
+MAX_JOB_ATTEMPTS = 3
+JOB_RETRY_BASE_SECONDS = 5
+# A "running" job whose worker has not finished within this lease is handed to another worker
+JOB_LEASE_SECONDS = 300
+
+
+def _column_exists(conn, table, column):
+    return any(row[1] == column for row in conn.execute(f"PRAGMA table_info({table})"))
+
+
+def _migrate_v1(conn):
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS entries (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             date TEXT NOT NULL,
@@ -19,28 +190,637 @@ def init_db():
             risk_flag INTEGER
         )
     ''')
-    conn.commit()
-    conn.close()
+
+
+def _migrate_v2(conn):
+    # User key + indexes backing the time-windowed and paginated queries
+    if not _column_exists(conn, "entries", "user_id"):
+        conn.execute(f"ALTER TABLE entries ADD COLUMN user_id TEXT NOT NULL DEFAULT '{DEFAULT_USER}'")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_date ON entries(date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_user_date ON entries(user_id, date, id)")
+
+
+def split_tags(value):
+    """
+    "Work,  boss ,work" -> [("work", "Work"), ("boss", "boss")]
+    Returns (key, display) pairs: whitespace collapsed, case-folded key, de-duplicated per entry.
+    """
+    tags = {}
+    for raw in str(value or "").split(","):
+        display = " ".join(raw.split())
+        if display:
+            tags.setdefault(display.casefold(), display)
+    return list(tags.items())
+
+
+def _add_daily_stats(conn, user_id, day, stress, sleep, risk_flag):
+    conn.execute('''
+        INSERT INTO daily_stats (user_id, day, entry_count, stress_sum, stress_count, stress_min, stress_max,
+                                 sleep_sum, sleep_count, risk_count)
+        VALUES (?, ?, 1, COALESCE(?, 0), ?, ?, ?, COALESCE(?, 0), ?, ?)
+        ON CONFLICT(user_id, day) DO UPDATE SET
+            entry_count = entry_count + 1,
+            stress_sum = stress_sum + excluded.stress_sum,
+            stress_count = stress_count + excluded.stress_count,
+            stress_min = MIN(COALESCE(stress_min, excluded.stress_min), COALESCE(excluded.stress_min, stress_min)),
+            stress_max = MAX(COALESCE(stress_max, excluded.stress_max), COALESCE(excluded.stress_max, stress_max)),
+            sleep_sum = sleep_sum + excluded.sleep_sum,
+            sleep_count = sleep_count + excluded.sleep_count,
+            risk_count = risk_count + excluded.risk_count
+    ''', (
+        user_id, day, stress, 0 if stress is None else 1, stress, stress,
+        sleep, 0 if sleep is None else 1, 1 if risk_flag else 0,
+    ))
+
+
+def _add_tag_counts(conn, user_id, day, emotions, triggers, delta=1):
+    """Adds (or with delta=-1, removes) one entry's emotions/triggers from daily_tag_counts."""
+    rows = [
+        (user_id, day, kind, key, display, delta)
+        for kind, value in (("emotion", emotions), ("trigger", triggers))
+        for key, display in split_tags(value)
+    ]
+    conn.executemany('''
+        INSERT INTO daily_tag_counts (user_id, day, kind, tag_key, tag, count)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_id, day, kind, tag_key) DO UPDATE SET count = count + excluded.count
+    ''', rows)
+    if delta < 0:
+        conn.execute("DELETE FROM daily_tag_counts WHERE user_id = ? AND day = ? AND count <= 0", (user_id, day))
+
+
+def _rebuild_aggregates(conn):
+    conn.execute("DELETE FROM daily_stats")
+    conn.execute("DELETE FROM daily_tag_counts")
+    rows = conn.execute(
+        "SELECT user_id, substr(date, 1, 10), stress_level, sleep_hours, risk_flag, emotions, triggers FROM entries"
+    )
+    count = 0
+    for user_id, day, stress, sleep, risk_flag, emotions, triggers in rows:
+        _add_daily_stats(conn, user_id, day, stress, sleep, risk_flag)
+        _add_tag_counts(conn, user_id, day, emotions, triggers)
+        count += 1
+    return count
+
+
+def _migrate_v3(conn):
+    # Per-day aggregates kept up to date by save_entry, so the dashboard reads O(days) rows
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            user_id TEXT NOT NULL,
+            day TEXT NOT NULL,
+            entry_count INTEGER NOT NULL DEFAULT 0,
+            stress_sum INTEGER NOT NULL DEFAULT 0,
+            stress_count INTEGER NOT NULL DEFAULT 0,
+            stress_min INTEGER,
+            stress_max INTEGER,
+            sleep_sum INTEGER NOT NULL DEFAULT 0,
+            sleep_count INTEGER NOT NULL DEFAULT 0,
+            risk_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS daily_tag_counts (
+            user_id TEXT NOT NULL,
+            day TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            tag_key TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day, kind, tag_key)
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_daily_tag_counts_kind ON daily_tag_counts(user_id, kind, day)")
+    _rebuild_aggregates(conn)
+
+
+def _tag_ids(conn, kind, tags):
+    """Get-or-create tag rows for (key, display) pairs; returns their ids."""
+    conn.executemany(
+        "INSERT OR IGNORE INTO tags (kind, name, display_name) VALUES (?, ?, ?)",
+        [(kind, key, display) for key, display in tags],
+    )
+    return [
+        conn.execute("SELECT id FROM tags WHERE kind = ? AND name = ?", (kind, key)).fetchone()[0]
+        for key, _ in tags
+    ]
+
+
+def _link_entry_tags(conn, entry_id, emotions, triggers):
+    tag_ids = _tag_ids(conn, "emotion", split_tags(emotions)) + _tag_ids(conn, "trigger", split_tags(triggers))
+    conn.executemany(
+        "INSERT OR IGNORE INTO entry_tags (entry_id, tag_id) VALUES (?, ?)",
+        [(entry_id, tag_id) for tag_id in tag_ids],
+    )
+
+
+def _migrate_v4(conn):
+    # Normalized tags: "entries mentioning Work" becomes an index lookup instead of a LIKE scan
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            name TEXT NOT NULL,
+            display_name TEXT NOT NULL,
+            UNIQUE (kind, name)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS entry_tags (
+            entry_id INTEGER NOT NULL REFERENCES entries(id) ON DELETE CASCADE,
+            tag_id INTEGER NOT NULL REFERENCES tags(id),
+            PRIMARY KEY (entry_id, tag_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_entry_tags_tag ON entry_tags(tag_id, entry_id)")
+
+    # Migrate the comma-separated strings already in journal.db
+    for entry_id, emotions, triggers in conn.execute("SELECT id, emotions, triggers FROM entries").fetchall():
+        _link_entry_tags(conn, entry_id, emotions, triggers)
+
+
+def _migrate_v5(conn):
+    # Background analysis: entries are saved first, emotions/triggers filled in by a worker
+    if not _column_exists(conn, "entries", "status"):
+        conn.execute("ALTER TABLE entries ADD COLUMN status TEXT NOT NULL DEFAULT 'done'")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS analysis_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            entry_id INTEGER NOT NULL UNIQUE REFERENCES entries(id) ON DELETE CASCADE,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            available_at REAL NOT NULL,
+            locked_by TEXT,
+            locked_at REAL,
+            last_error TEXT,
+            created_at REAL NOT NULL,
+            finished_at REAL
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_jobs_claim ON analysis_jobs(status, available_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_status ON entries(user_id, status)")
+
+
+def _migrate_v6(conn):
+    # Which Analyst produced emotions/triggers (NULL = before versioning), and bulk-import progress
+    if not _column_exists(conn, "entries", "analysis_version"):
+        conn.execute("ALTER TABLE entries ADD COLUMN analysis_version TEXT")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS import_progress (
+            source TEXT PRIMARY KEY,
+            rows_done INTEGER NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    ''')
+
+
+# Schema history. PRAGMA user_version records how many steps have been applied,
+# so existing journal.db files are upgraded in place.
+MIGRATIONS = [
+    _migrate_v1,
+    _migrate_v2,
+    _migrate_v3,
+    _migrate_v4,
+    _migrate_v5,
+    _migrate_v6,
+]
+
+
+def init_db(db_name=None):
+    """
+    Creates/upgrades the schema once per process. Safe to call on every Streamlit rerun.
+    """
+    db_name = db_name or DB_NAME
+    if db_name in _initialized:
+        return
+
+    with _registry_lock:
+        if db_name in _initialized:
+            return
+        with get_pool(db_name).connection() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for step, migrate in enumerate(MIGRATIONS[version:], start=version + 1):
+                migrate(conn)
+                conn.execute(f"PRAGMA user_version={step}")
+        _initialized.add(db_name)
     print("Database initialized successfully.")
 
-def save_entry(content, sleep, stress, emotions, triggers, risk_flag):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
+
+def save_entry(content, sleep, stress, emotions, triggers, risk_flag, user_id=DEFAULT_USER, pending=False,
+               analysis_version=None):
+    """
+    Stores one entry and returns its id.
+    With pending=True, emotions/triggers are left empty and an analysis job is queued in the
+    same transaction; a worker fills them in later via complete_analysis().
+    """
+    init_db()
     date_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    c.execute('''
-        INSERT INTO entries (date, content, sleep_hours, stress_level, emotions, triggers, risk_flag)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (date_str, content, sleep, stress, emotions, triggers, 1 if risk_flag else 0))
-    
-    conn.commit()
-    conn.close()
-
-def fetch_history():
-    conn = sqlite3.connect(DB_NAME)
-    df = pd.read_sql_query("SELECT * FROM entries ORDER BY date DESC", conn)
-    conn.close()
+    if pending:
+        emotions = triggers = None
+
+    with get_pool().connection() as conn:
+        cursor = conn.execute('''
+            INSERT INTO entries (user_id, date, content, sleep_hours, stress_level, emotions, triggers, risk_flag,
+                                 status, analysis_version)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (user_id, date_str, content, sleep, stress, emotions, triggers, 1 if risk_flag else 0,
+              "pending" if pending else "done", None if pending else analysis_version))
+        entry_id = cursor.lastrowid
+        # Same transaction: tags and aggregates never drift from entries
+        _add_daily_stats(conn, user_id, date_str[:10], stress, sleep, risk_flag)
+        if pending:
+            _enqueue_job(conn, entry_id)
+        else:
+            _link_entry_tags(conn, entry_id, emotions, triggers)
+            _add_tag_counts(conn, user_id, date_str[:10], emotions, triggers)
+    return entry_id
+
+
+def _enqueue_job(conn, entry_id):
+    # UNIQUE(entry_id): queuing the same entry twice is a no-op
+    now = time.time()
+    conn.execute(
+        "INSERT OR IGNORE INTO analysis_jobs (entry_id, available_at, created_at) VALUES (?, ?, ?)",
+        (entry_id, now, now),
+    )
+
+
+def claim_job(worker_id, db_name=None):
+    """
+    Takes the oldest runnable job (queued and due, or running past its lease).
+    Returns (job_id, entry_id, content, attempts) or None when the queue is empty.
+    """
+    init_db(db_name)
+    pool = get_pool(db_name)
+    while True:
+        now = time.time()
+        with pool.connection() as conn:
+            row = conn.execute('''
+                SELECT j.id, j.entry_id, e.content, j.attempts
+                FROM analysis_jobs j JOIN entries e ON e.id = j.entry_id
+                WHERE (j.status = 'queued' AND j.available_at <= ?)
+                   OR (j.status = 'running' AND j.locked_at < ?)
+                ORDER BY j.id
+                LIMIT 1
+            ''', (now, now - JOB_LEASE_SECONDS)).fetchone()
+            if row is None:
+                return None
+            job_id, entry_id, content, attempts = row
+            # Conditional update: if another worker (thread or process) got there first, try the next job
+            claimed = conn.execute('''
+                UPDATE analysis_jobs
+                SET status = 'running', attempts = attempts + 1, locked_by = ?, locked_at = ?
+                WHERE id = ? AND attempts = ?
+                  AND ((status = 'queued' AND available_at <= ?) OR (status = 'running' AND locked_at < ?))
+            ''', (worker_id, now, job_id, attempts, now, now - JOB_LEASE_SECONDS)).rowcount
+        if claimed:
+            return job_id, entry_id, content, attempts + 1
+
+
+def complete_analysis(job_id, entry_id, emotions, triggers, db_name=None, analysis_version=None):
+    """
+    Stores a worker's results and applies the tag aggregates, once.
+    Returns False if the entry was already completed (e.g. by a worker whose lease expired).
+    """
+    with get_pool(db_name).connection() as conn:
+        updated = conn.execute(
+            "UPDATE entries SET emotions = ?, triggers = ?, status = 'done', analysis_version = ? "
+            "WHERE id = ? AND status != 'done'",
+            (emotions, triggers, analysis_version, entry_id),
+        ).rowcount
+        if updated:
+            user_id, date_str = conn.execute("SELECT user_id, date FROM entries WHERE id = ?", (entry_id,)).fetchone()
+            _link_entry_tags(conn, entry_id, emotions, triggers)
+            _add_tag_counts(conn, user_id, date_str[:10], emotions, triggers)
+        conn.execute(
+            "UPDATE analysis_jobs SET status = 'done', finished_at = ?, last_error = NULL WHERE id = ?",
+            (time.time(), job_id),
+        )
+    return bool(updated)
+
+
+def fail_job(job_id, entry_id, attempts, error, db_name=None):
+    """
+    Re-queues the job with exponential backoff, or marks it (and the entry) failed after MAX_JOB_ATTEMPTS.
+    """
+    with get_pool(db_name).connection() as conn:
+        if attempts < MAX_JOB_ATTEMPTS:
+            conn.execute(
+                "UPDATE analysis_jobs SET status = 'queued', available_at = ?, last_error = ? WHERE id = ?",
+                (time.time() + JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1), str(error), job_id),
+            )
+        else:
+            conn.execute(
+                "UPDATE analysis_jobs SET status = 'failed', finished_at = ?, last_error = ? WHERE id = ?",
+                (time.time(), str(error), job_id),
+            )
+            conn.execute("UPDATE entries SET status = 'failed' WHERE id = ? AND status = 'pending'", (entry_id,))
+
+
+def retry_failed_jobs(db_name=None):
+    """Puts every failed analysis job back in the queue. Returns how many were re-queued."""
+    init_db(db_name)
+    with get_pool(db_name).connection() as conn:
+        count = conn.execute(
+            "UPDATE analysis_jobs SET status = 'queued', attempts = 0, available_at = ? WHERE status = 'failed'",
+            (time.time(),),
+        ).rowcount
+        conn.execute(
+            "UPDATE entries SET status = 'pending' WHERE status = 'failed' "
+            "AND id IN (SELECT entry_id FROM analysis_jobs WHERE status = 'queued')"
+        )
+    return count
+
+
+def import_entries(rows, source=None, rows_done=None, db_name=None):
+    """
+    Bulk insert for the import CLI: one transaction, executemany for the entries.
+    rows: dicts with user_id, date, content, sleep_hours, stress_level, emotions, triggers,
+    risk_flag and analysis_version. When `source` is given, import_progress[source] is set to
+    `rows_done` in the same transaction, so a resumed import never inserts a row twice.
+    Returns the new entry ids.
+    """
+    init_db(db_name)
+    with get_pool(db_name).connection() as conn:
+        # Take the write lock first: with AUTOINCREMENT and no other writer, ids are contiguous
+        conn.execute("BEGIN IMMEDIATE")
+        seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'entries'").fetchone()
+        first_id = (seq[0] if seq else 0) + 1
+        conn.executemany('''
+            INSERT INTO entries (user_id, date, content, sleep_hours, stress_level, emotions, triggers, risk_flag,
+                                 status, analysis_version)
+            VALUES (:user_id, :date, :content, :sleep_hours, :stress_level, :emotions, :triggers, :risk_flag,
+                    'done', :analysis_version)
+        ''', rows)
+        ids = list(range(first_id, first_id + len(rows)))
+        for entry_id, row in zip(ids, rows):
+            day = row["date"][:10]
+            _link_entry_tags(conn, entry_id, row["emotions"], row["triggers"])
+            _add_daily_stats(conn, row["user_id"], day, row["stress_level"], row["sleep_hours"], row["risk_flag"])
+            _add_tag_counts(conn, row["user_id"], day, row["emotions"], row["triggers"])
+        if source is not None:
+            conn.execute(
+                "INSERT INTO import_progress (source, rows_done, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(source) DO UPDATE SET rows_done = excluded.rows_done, updated_at = excluded.updated_at",
+                (source, rows_done, datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+            )
+    return ids
+
+
+def import_rows_done(source, db_name=None):
+    """How many rows of `source` a previous import already committed (0 if none)."""
+    init_db(db_name)
+    with get_pool(db_name).connection() as conn:
+        row = conn.execute("SELECT rows_done FROM import_progress WHERE source = ?", (source,)).fetchone()
+    return row[0] if row else 0
+
+
+def fetch_for_reanalysis(analysis_version, after_id=0, limit=256, db_name=None):
+    """
+    Next `limit` analyzed, non-crisis entries (by id, after `after_id`) whose emotions/triggers
+    did not come from `analysis_version`. Returns [(id, content)].
+    """
+    init_db(db_name)
+    with get_pool(db_name).connection() as conn:
+        return conn.execute('''
+            SELECT id, content FROM entries
+            WHERE id > ? AND status = 'done' AND risk_flag = 0 AND analysis_version IS NOT ?
+            ORDER BY id
+            LIMIT ?
+        ''', (after_id, analysis_version, limit)).fetchall()
+
+
+def replace_analysis(results, analysis_version, db_name=None):
+    """
+    Re-analysis in place: results is [(entry_id, emotions, triggers)]. Old tags and tag counts
+    are swapped for the new ones in one transaction.
+    """
+    with get_pool(db_name).connection() as conn:
+        for entry_id, emotions, triggers in results:
+            user_id, date_str, old_emotions, old_triggers = conn.execute(
+                "SELECT user_id, date, emotions, triggers FROM entries WHERE id = ?", (entry_id,)
+            ).fetchone()
+            _add_tag_counts(conn, user_id, date_str[:10], old_emotions, old_triggers, delta=-1)
+            conn.execute("DELETE FROM entry_tags WHERE entry_id = ?", (entry_id,))
+            conn.execute(
+                "UPDATE entries SET emotions = ?, triggers = ?, analysis_version = ? WHERE id = ?",
+                (emotions, triggers, analysis_version, entry_id),
+            )
+            _link_entry_tags(conn, entry_id, emotions, triggers)
+            _add_tag_counts(conn, user_id, date_str[:10], emotions, triggers)
+
+
+def count_entries_by_status(user_id=DEFAULT_USER):
+    """{"done": n, "pending": n, "failed": n} for the dashboard."""
+    df = _query("SELECT status, COUNT(*) AS n FROM entries WHERE user_id = ? GROUP BY status", (user_id,))
+    counts = {"done": 0, "pending": 0, "failed": 0}
+    counts.update(dict(zip(df["status"], df["n"].astype(int))))
+    return counts
+
+
+def backfill_aggregates(db_name=None):
+    """
+    Recomputes daily_stats/daily_tag_counts from entries (e.g. after editing journal.db by hand).
+    """
+    init_db(db_name)
+    start = time.perf_counter()
+    with get_pool(db_name).connection() as conn:
+        count = _rebuild_aggregates(conn)
+    print(f"Backfilled aggregates from {count} entries in {time.perf_counter() - start:.2f}s.")
+    return count
+
+
+def _select(columns):
+    if columns is None:
+        return "*"
+    unknown = [c for c in columns if c not in ENTRY_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown entry columns: {unknown}")
+    return ", ".join(columns)
+
+
+def _query(sql, params=()):
+    init_db()
+    with get_pool().connection() as conn:
+        df = pd.read_sql_query(sql, conn, params=params)
     return df
 
+
+def fetch_history(user_id=None, columns=None):
+    """
+    Full history, newest first. Prefer the windowed/paginated queries below for UI paths.
+    """
+    if user_id is None:
+        return _query(f"SELECT {_select(columns)} FROM entries ORDER BY date DESC, id DESC")
+    return _query(
+        f"SELECT {_select(columns)} FROM entries WHERE user_id = ? ORDER BY date DESC, id DESC",
+        (user_id,),
+    )
+
+
+def fetch_recent(days, user_id=DEFAULT_USER, columns=None):
+    """
+    Entries from the last `days` days, newest first (served by idx_entries_user_date).
+    """
+    cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+    return _query(
+        f"SELECT {_select(columns)} FROM entries "
+        "WHERE user_id = ? AND date >= ? ORDER BY date DESC, id DESC",
+        (user_id, cutoff),
+    )
+
+
+def fetch_latest(limit=5, user_id=DEFAULT_USER, columns=None):
+    """The `limit` most recent entries."""
+    return _query(
+        f"SELECT {_select(columns)} FROM entries "
+        "WHERE user_id = ? ORDER BY date DESC, id DESC LIMIT ?",
+        (user_id, limit),
+    )
+
+
+def fetch_page(limit=20, before=None, user_id=DEFAULT_USER, columns=None):
+    """
+    Keyset pagination over (date, id), newest first.
+    Pass the returned cursor as `before` to get the next page; the cursor is None on the last page.
+    Returns: (DataFrame, cursor)
+    """
+    if columns is not None:
+        columns = list(dict.fromkeys(list(columns) + ["date", "id"]))
+
+    if before is None:
+        df = _query(
+            f"SELECT {_select(columns)} FROM entries "
+            "WHERE user_id = ? ORDER BY date DESC, id DESC LIMIT ?",
+            (user_id, limit),
+        )
+    else:
+        before_date, before_id = before
+        df = _query(
+            f"SELECT {_select(columns)} FROM entries "
+            "WHERE user_id = ? AND (date, id) < (?, ?) ORDER BY date DESC, id DESC LIMIT ?",
+            (user_id, before_date, before_id, limit),
+        )
+
+    cursor = None
+    if len(df) == limit:
+        last = df.iloc[-1]
+        cursor = (last["date"], int(last["id"]))
+    return df, cursor
+
+
+def _cutoff_day(days):
+    return (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+def fetch_daily_stats(days=None, user_id=DEFAULT_USER):
+    """
+    One row per day: entries, average/min/max stress, average sleep, risk count. Oldest first.
+    """
+    where, params = "WHERE user_id = ?", [user_id]
+    if days is not None:
+        where += " AND day >= ?"
+        params.append(_cutoff_day(days))
+    return _query(f'''
+        SELECT day, entry_count,
+               CAST(stress_sum AS REAL) / NULLIF(stress_count, 0) AS avg_stress,
+               stress_min, stress_max,
+               CAST(sleep_sum AS REAL) / NULLIF(sleep_count, 0) AS avg_sleep,
+               risk_count
+        FROM daily_stats {where}
+        ORDER BY day
+    ''', params)
+
+
+def fetch_tag_counts(kind="trigger", days=None, limit=None, user_id=DEFAULT_USER):
+    """
+    Total mentions per normalized tag (kind: "trigger" or "emotion"), most frequent first.
+    """
+    where, params = "WHERE user_id = ? AND kind = ?", [user_id, kind]
+    if days is not None:
+        where += " AND day >= ?"
+        params.append(_cutoff_day(days))
+    sql = f'''
+        SELECT MIN(tag) AS tag, SUM(count) AS count
+        FROM daily_tag_counts {where}
+        GROUP BY tag_key
+        HAVING SUM(count) > 0
+        ORDER BY count DESC, tag
+    '''
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return _query(sql, params)
+
+
+def _tag_filter(days, user_id):
+    where, params = "e.user_id = ?", [user_id]
+    if days is not None:
+        where += " AND e.date >= ?"
+        params.append(_cutoff_day(days))
+    return where, params
+
+
+def fetch_entries_with_tag(name, kind="trigger", days=None, user_id=DEFAULT_USER, columns=None):
+    """Entries tagged `name` (matched case/whitespace-insensitively), newest first."""
+    select = "e.*" if columns is None else ", ".join(f"e.{c}" for c in _select(columns).split(", "))
+    where, params = _tag_filter(days, user_id)
+    return _query(f'''
+        SELECT {select}
+        FROM tags t
+        JOIN entry_tags et ON et.tag_id = t.id
+        JOIN entries e ON e.id = et.entry_id
+        WHERE t.kind = ? AND t.name = ? AND {where}
+        ORDER BY e.date DESC, e.id DESC
+    ''', [kind, " ".join(name.split()).casefold()] + params)
+
+
+def fetch_tag_timeline(name, kind="trigger", days=None, user_id=DEFAULT_USER):
+    """Per-day count of entries tagged `name`, oldest first."""
+    where, params = _tag_filter(days, user_id)
+    return _query(f'''
+        SELECT substr(e.date, 1, 10) AS day, COUNT(*) AS count
+        FROM tags t
+        JOIN entry_tags et ON et.tag_id = t.id
+        JOIN entries e ON e.id = et.entry_id
+        WHERE t.kind = ? AND t.name = ? AND {where}
+        GROUP BY day
+        ORDER BY day
+    ''', [kind, " ".join(name.split()).casefold()] + params)
+
+
+def fetch_tag_cooccurrence(kind="trigger", days=None, limit=10, min_count=2, user_id=DEFAULT_USER):
+    """
+    Pairs of tags that show up in the same entry, most frequent first.
+    Columns: tag_a, tag_b, count
+    """
+    where, params = _tag_filter(days, user_id)
+    return _query(f'''
+        SELECT ta.display_name AS tag_a, tb.display_name AS tag_b, COUNT(*) AS count
+        FROM entry_tags a
+        JOIN entry_tags b ON b.entry_id = a.entry_id AND b.tag_id > a.tag_id
+        JOIN tags ta ON ta.id = a.tag_id
+        JOIN tags tb ON tb.id = b.tag_id
+        JOIN entries e ON e.id = a.entry_id
+        WHERE ta.kind = ? AND tb.kind = ? AND {where}
+        GROUP BY a.tag_id, b.tag_id
+        HAVING COUNT(*) >= ?
+        ORDER BY count DESC, tag_a, tag_b
+        LIMIT ?
+    ''', [kind, kind] + params + [min_count, limit])
+
+
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="ReflectAI journal database.")
+    parser.add_argument("command", nargs="?", default="init", choices=["init", "backfill"],
+                        help="init: create/upgrade the schema. backfill: rebuild the dashboard aggregates.")
+    parser.add_argument("--db", default=DB_NAME)
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        backfill_aggregates(args.db)
+    else:
+        init_db(args.db)
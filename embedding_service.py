@@ -0,0 +1,218 @@
+"""
+One MiniLM sentence encoder per process, shared by the Guardian's local tier, the RAG engine
+and the evaluation scorer, plus an on-disk cache of embeddings keyed by text hash.
+
+The cache is two append-only files per model under EMBEDDING_CACHE_DIR:
+  vectors.f32  float32 rows, read through np.memmap (nothing is loaded into RAM up front)
+  keys.txt     the SHA-256 of each row's text, in row order
+Only fixed texts (labels, datasets, knowledge base chunks) should go through the cache;
+live journal entries are encoded with use_cache=False so their embeddings never touch disk.
+
+CLI:
+  python embedding_service.py warm [--files a.csv b.csv] [--columns text expected]
+  python embedding_service.py stats
+  python embedding_service.py clear
+"""
+import argparse
+import glob
+import hashlib
+import os
+import shutil
+import threading
+
+import numpy as np
+
+from model_registry import get_model
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBEDDING_CACHE_DIR = os.getenv("REFLECTAI_EMBEDDING_CACHE", "embedding_cache")
+ENCODE_BATCH_SIZE = 32
+WARM_UP_FILES = ["data/synthetic_data/*.csv", "data/real_data/*.csv"]
+
+
+def _load_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL)
+
+
+def get_encoder():
+    """The SentenceTransformer, loaded on first use and shared process-wide."""
+    return get_model(f"sentence-transformer:{EMBEDDING_MODEL}", _load_model)
+
+
+def text_key(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Append-only, memory-mapped store of text hash -> embedding row.
+    Safe across threads of one process; use one writer process at a time.
+    """
+
+    def __init__(self, path, dim=None):
+        self.path = path
+        self.dim = dim
+        self.hits = 0
+        self.misses = 0
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._keys_path = os.path.join(path, "keys.txt")
+        self._dim_path = os.path.join(path, "dim")
+        self._rows = {}
+        self._mmap = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self._dim_path):
+            return
+        with open(self._dim_path, "r") as f:
+            self.dim = int(f.read())
+        raw = ""
+        if os.path.exists(self._keys_path):
+            with open(self._keys_path, "r") as f:
+                raw = f.read()
+        # A crash mid-write can leave a partial last line: only newline-terminated keys count
+        keys = raw.split("\n")[:-1]
+        row_bytes = 4 * self.dim
+        vector_bytes = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+
+        # Vectors are appended before keys, so an interrupted add() leaves vector rows (or part of
+        # one) without a key. Cut both files back to the rows that have a vector AND a key, so the
+        # next append lines up row i with key i again.
+        complete = min(len(keys), vector_bytes // row_bytes)
+        if vector_bytes != complete * row_bytes:
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(complete * row_bytes)
+        if len(keys) != complete or not raw.endswith("\n") and raw:
+            with open(self._keys_path, "w") as f:
+                f.write("".join(key + "\n" for key in keys[:complete]))
+        self._rows = {key: i for i, key in enumerate(keys[:complete])}
+
+    def _view(self):
+        if self._mmap is None or len(self._mmap) < len(self._rows):
+            self._mmap = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(len(self._rows), self.dim))
+        return self._mmap
+
+    def get(self, keys):
+        """Returns {key: vector} for the keys that are cached."""
+        with self._lock:
+            found = {key: self._rows[key] for key in keys if key in self._rows}
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+            if not found:
+                return {}
+            view = self._view()
+            return {key: np.array(view[row]) for key, row in found.items()}
+
+    def add(self, keys, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            new = [(key, vector) for key, vector in zip(keys, vectors) if key not in self._rows]
+            if not new:
+                return
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                os.makedirs(self.path, exist_ok=True)
+                with open(self._dim_path, "w") as f:
+                    f.write(str(self.dim))
+            with open(self._vectors_path, "ab") as f:
+                f.write(np.stack([vector for _, vector in new]).tobytes())
+            with open(self._keys_path, "a") as f:
+                f.write("".join(key + "\n" for key, _ in new))
+            for key, _ in new:
+                self._rows[key] = len(self._rows)
+
+    def clear(self):
+        with self._lock:
+            shutil.rmtree(self.path, ignore_errors=True)
+            # Forget the dim too, so the next add() recreates the directory and dim file
+            self.dim = None
+            self._rows = {}
+            self._mmap = None
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        size_bytes = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        return {
+            "size": len(self._rows),
+            "dim": self.dim,
+            "mb": size_bytes / 1e6,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache(os.path.join(EMBEDDING_CACHE_DIR, EMBEDDING_MODEL))
+        return _cache
+
+
+def encode(texts, use_cache=True, batch_size=ENCODE_BATCH_SIZE):
+    """
+    Unit-length embeddings, one float32 row per text.
+    With use_cache, previously seen texts are read from disk and only the rest are encoded
+    (each distinct text once, in one batch).
+    """
+    texts = [str(t) for t in texts]
+    if not texts:
+        return np.zeros((0, get_encoder().get_sentence_embedding_dimension()), dtype=np.float32)
+
+    if not use_cache:
+        return get_encoder().encode(texts, batch_size=batch_size, normalize_embeddings=True).astype(np.float32)
+
+    cache = get_cache()
+    keys = [text_key(t) for t in texts]
+    found = cache.get(list(dict.fromkeys(keys)))
+    missing = {key: text for key, text in zip(keys, texts) if key not in found}
+    if missing:
+        vectors = get_encoder().encode(list(missing.values()), batch_size=batch_size, normalize_embeddings=True)
+        cache.add(list(missing), vectors)
+        found.update(zip(missing, np.asarray(vectors, dtype=np.float32)))
+    return np.stack([found[key] for key in keys])
+
+
+def warm(files, columns):
+    """Loads the model and fills the cache with every distinct value of `columns` in `files`."""
+    import pandas as pd
+
+    texts = []
+    for pattern in files:
+        for path in sorted(glob.glob(pattern)):
+            df = pd.read_csv(path)
+            for column in columns:
+                if column in df.columns:
+                    values = df[column].dropna().astype(str).unique().tolist()
+                    texts.extend(values)
+                    print(f"[EMBEDDINGS] {path}:{column} -> {len(values)} distinct texts")
+
+    texts = list(dict.fromkeys(texts))
+    before = get_cache().stats()["size"]
+    encode(texts)
+    print(f"[EMBEDDINGS] {len(texts)} texts, {get_cache().stats()['size'] - before} newly encoded.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared sentence-embedding cache.")
+    parser.add_argument("command", choices=["warm", "stats", "clear"])
+    parser.add_argument("--files", nargs="+", default=WARM_UP_FILES, help="CSV files or glob patterns to pre-encode.")
+    parser.add_argument("--columns", nargs="+", default=["text", "expected"])
+    args = parser.parse_args()
+
+    if args.command == "warm":
+        warm(args.files, args.columns)
+    elif args.command == "clear":
+        get_cache().clear()
+        print(f"[EMBEDDINGS] Cleared {get_cache().path}.")
+    stats = get_cache().stats()
+    print(f"[EMBEDDINGS] {get_cache().path}: {stats['size']} vectors (dim {stats['dim']}, {stats['mb']:.1f} MB).")
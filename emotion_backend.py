@@ -0,0 +1,222 @@
+"""
+ONNX Runtime backend for the local RoBERTa emotion model.
+
+The model is exported once with torch.onnx.export, dynamically quantized to int8 weights and
+stored next to the original checkpoint (<model>_onnx/model.int8.onnx). Inference then needs only
+onnxruntime and the tokenizer, not torch, which cuts load time and resident memory on CPU nodes.
+
+  REFLECTAI_EMOTION_BACKEND=onnx   use this backend in AnalystAgent (default: torch)
+  REFLECTAI_ONNX_THREADS=4         intra-op threads per session (default: onnxruntime's choice)
+  REFLECTAI_EMOTION_SERVER=URL     send inference to a shared emotion_server.py instead
+
+Usage: python emotion_backend.py export [--model ./roberta/roberta_mixed_model_final] [--force]
+"""
+import argparse
+import json
+import os
+import urllib.request
+
+import numpy as np
+
+EMOTION_BACKEND = os.getenv("REFLECTAI_EMOTION_BACKEND", "torch")
+BACKENDS = ("torch", "onnx")
+ONNX_THREADS = int(os.getenv("REFLECTAI_ONNX_THREADS", "0"))
+ONNX_FILENAME = "model.int8.onnx"
+EMOTION_SERVER_URL = os.getenv("REFLECTAI_EMOTION_SERVER", "")
+SERVER_TIMEOUT = 30
+OPSET = 17
+
+
+def score_batch(probs_fn, texts, id2label, batch_size=16):
+    """
+    Shared batching for every local backend: probs_fn(batch) returns one probability row per text.
+    Texts are sorted by length so each batch is only padded to its own longest entry.
+    Returns a list (aligned with `texts`) of (label, score) lists sorted by score.
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    scored = [None] * len(texts)
+    for start in range(0, len(order), batch_size):
+        idx = order[start:start + batch_size]
+        for i, row in zip(idx, probs_fn([texts[i] for i in idx])):
+            pairs = [(id2label[j], p) for j, p in enumerate(row)]
+            scored[i] = sorted(pairs, key=lambda x: x[1], reverse=True)
+    return scored
+
+
+def onnx_dir_for(model_path):
+    return os.path.normpath(model_path) + "_onnx"
+
+
+def is_stale(model_path, onnx_dir=None):
+    """True when there is no export yet, or the checkpoint changed after it was made."""
+    onnx_path = os.path.join(onnx_dir or onnx_dir_for(model_path), ONNX_FILENAME)
+    if not os.path.exists(onnx_path):
+        return True
+    source = os.path.join(model_path, "config.json")
+    return os.path.exists(source) and os.path.getmtime(source) > os.path.getmtime(onnx_path)
+
+
+def export_onnx(model_path, onnx_dir=None):
+    """
+    Exports the checkpoint to ONNX with dynamic batch/sequence axes and int8 dynamic quantization.
+    The tokenizer and config are saved alongside so the ONNX directory is self-contained.
+    Returns the path of the quantized model.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    onnx_dir = onnx_dir or onnx_dir_for(model_path)
+    os.makedirs(onnx_dir, exist_ok=True)
+    fp32_path = os.path.join(onnx_dir, "model.onnx")
+    int8_path = os.path.join(onnx_dir, ONNX_FILENAME)
+
+    print(f"[ONNX] Exporting {model_path} -> {onnx_dir}...")
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModelForSequenceClassification.from_pretrained(model_path).eval()
+    sample = tokenizer(["A short sample entry for tracing."], return_tensors="pt")
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"},
+            },
+            opset_version=OPSET,
+        )
+
+    # Write under a temp name and rename, so another process never loads a half-written model
+    tmp_path = int8_path + ".tmp"
+    quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+    os.replace(tmp_path, int8_path)
+
+    tokenizer.save_pretrained(onnx_dir)
+    model.config.save_pretrained(onnx_dir)
+    print(f"[ONNX] Saved {int8_path} ({os.path.getsize(int8_path) / 1e6:.0f} MB)")
+    return int8_path
+
+
+class OnnxEmotionClassifier:
+    """
+    Drop-in for the transformers text-classification pipeline (top_k=None) used by AnalystAgent:
+    classifier(text) -> [[{"label": ..., "score": ...}, ...]], plus a batched score_batch().
+    """
+
+    def __init__(self, onnx_dir, threads=ONNX_THREADS):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(onnx_dir, "config.json"), "r", encoding="utf-8") as f:
+            config = json.load(f)
+        self.id2label = {int(i): label for i, label in config["id2label"].items()}
+        # Same post-processing rule as the pipeline for this head
+        self.multi_label = config.get("problem_type") == "multi_label_classification" or len(self.id2label) == 1
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if threads:
+            options.intra_op_num_threads = threads
+
+        self.tokenizer = AutoTokenizer.from_pretrained(onnx_dir)
+        self.session = ort.InferenceSession(
+            os.path.join(onnx_dir, ONNX_FILENAME), options, providers=["CPUExecutionProvider"]
+        )
+
+    def _probs(self, texts):
+        encoded = self.tokenizer(texts, padding=True, truncation=True, return_tensors="np")
+        logits = self.session.run(["logits"], {
+            "input_ids": encoded["input_ids"].astype(np.int64),
+            "attention_mask": encoded["attention_mask"].astype(np.int64),
+        })[0]
+        if self.multi_label:
+            return 1.0 / (1.0 + np.exp(-logits))
+        exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        return exp / exp.sum(axis=-1, keepdims=True)
+
+    def score_batch(self, texts, batch_size=16):
+        """Returns a list (aligned with `texts`) of (label, score) lists sorted by score."""
+        return score_batch(lambda batch: self._probs(batch).tolist(), texts, self.id2label, batch_size)
+
+    def __call__(self, text):
+        texts = [text] if isinstance(text, str) else list(text)
+        return [
+            [{"label": label, "score": score} for label, score in pairs]
+            for pairs in self.score_batch(texts)
+        ]
+
+
+class EmotionServerClient:
+    """
+    Same interface as OnnxEmotionClassifier, backed by a shared emotion_server.py process.
+    """
+
+    def __init__(self, url, timeout=SERVER_TIMEOUT):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        # The server's model version (e.g. "roberta:...-onnx-int8"), set by connect_emotion_server
+        self.model_version = None
+
+    def _request(self, path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode("utf-8")
+        request = urllib.request.Request(
+            self.url + path, data=data, headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def health(self):
+        return self._request("/health")
+
+    def score_batch(self, texts, batch_size=16):
+        # The server does its own batching across clients; one request per chunk keeps bodies small
+        scored = []
+        for start in range(0, len(texts), batch_size):
+            response = self._request("/classify", {"texts": texts[start:start + batch_size]})
+            scored.extend([(label, score) for label, score in pairs] for pairs in response["scores"])
+        return scored
+
+    def __call__(self, text):
+        texts = [text] if isinstance(text, str) else list(text)
+        return [
+            [{"label": label, "score": score} for label, score in pairs]
+            for pairs in self.score_batch(texts)
+        ]
+
+
+def connect_emotion_server(url, timeout=SERVER_TIMEOUT):
+    """Returns a client for `url`, raising if the server does not answer its health check."""
+    client = EmotionServerClient(url, timeout)
+    client.model_version = client.health()["version"]
+    print(f"[EMOTION SERVER] Using {url} ({client.model_version})")
+    return client
+
+
+def load_onnx_classifier(model_path, threads=ONNX_THREADS):
+    """Loads the int8 ONNX model, exporting it first if missing or older than the checkpoint."""
+    onnx_dir = onnx_dir_for(model_path)
+    if is_stale(model_path, onnx_dir):
+        export_onnx(model_path, onnx_dir)
+    print(f"[ONNX] Loading {onnx_dir} ({threads or 'default'} intra-op threads)...")
+    return OnnxEmotionClassifier(onnx_dir, threads)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the RoBERTa emotion model to int8 ONNX.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    exp = sub.add_parser("export", help="Export and quantize the model.")
+    exp.add_argument("--model", default="./roberta/roberta_mixed_model_final")
+    exp.add_argument("--force", action="store_true", help="Re-export even if an up-to-date export exists.")
+    args = parser.parse_args()
+
+    if args.force or is_stale(args.model):
+        export_onnx(args.model)
+    else:
+        print(f"[ONNX] {onnx_dir_for(args.model)} is up to date. Use --force to re-export.")
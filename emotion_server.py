@@ -0,0 +1,222 @@
+"""
+Local inference server for the RoBERTa emotion model.
+
+One process holds one copy of the model; Streamlit workers, analysis_queue.py processes and
+import jobs talk to it over localhost HTTP instead of each loading their own. Requests that
+arrive within a short window (--wait-ms) are merged into one forward pass.
+
+  python emotion_server.py --port 8766 [--backend onnx] [--max-batch 32] [--wait-ms 5]
+  REFLECTAI_EMOTION_SERVER=http://127.0.0.1:8766 streamlit run app.py
+
+API:
+  POST /classify {"texts": [...]}  ->  {"scores": [[[label, score], ...], ...]}  (sorted by score)
+  GET  /health                     ->  {"version": ..., "requests": ..., "batches": ..., ...}
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 8766
+MAX_BATCH = 32
+WAIT_MS = 5.0
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Default backlog is 5: bursts of concurrent sessions would hit SYN retries (1s stalls)
+    request_queue_size = 128
+
+
+class _Request:
+    __slots__ = ("texts", "done", "scores", "error")
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.done = threading.Event()
+        self.scores = None
+        self.error = None
+
+
+class EmotionServer:
+    """
+    Threaded HTTP front end + a single batching thread that owns the model.
+    `score_batch(texts, batch_size)` must return one sorted (label, score) list per text,
+    e.g. AnalystAgent._score_batch.
+    """
+
+    def __init__(self, score_batch, version="unknown", host="127.0.0.1", port=DEFAULT_PORT,
+                 max_batch=MAX_BATCH, wait_ms=WAIT_MS):
+        self.score_batch = score_batch
+        self.version = version
+        self.max_batch = max_batch
+        self.wait_s = wait_ms / 1000
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self._stats_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.rstrip("/") != "/health":
+                    self._send_json(404, {"error": f"Unknown path {self.path}"})
+                    return
+                self._send_json(200, server.stats())
+
+            def do_POST(self):
+                if self.path.rstrip("/") != "/classify":
+                    self._send_json(404, {"error": f"Unknown path {self.path}"})
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    texts = [str(t) for t in json.loads(self.rfile.read(length) or b"{}")["texts"]]
+                except (ValueError, KeyError, TypeError) as e:
+                    self._send_json(400, {"error": f"Bad request: {e}"})
+                    return
+
+                request = server.submit(texts)
+                request.done.wait()
+                if request.error is not None:
+                    self._send_json(500, {"error": str(request.error)})
+                else:
+                    self._send_json(200, {"scores": request.scores})
+
+            def _send_json(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        self._httpd = _HTTPServer((host, port), Handler)
+        self._threads = []
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def submit(self, texts):
+        request = _Request(texts)
+        if not texts:
+            request.scores = []
+            request.done.set()
+        else:
+            self._queue.put(request)
+        return request
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "version": self.version,
+                "requests": self.requests,
+                "texts": self.texts,
+                "batches": self.batches,
+                "avg_batch": self.texts / self.batches if self.batches else 0.0,
+            }
+
+    def _collect(self):
+        """Blocks for the first request, then gathers more until the window closes or the batch is full."""
+        batch = [self._queue.get()]
+        size = len(batch[0].texts)
+        deadline = time.perf_counter() + self.wait_s
+        while size < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _run_batches(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if self._stop.is_set():
+                break
+            texts = [t for request in batch for t in request.texts]
+            try:
+                scored = self.score_batch(texts, self.max_batch)
+                offset = 0
+                for request in batch:
+                    n = len(request.texts)
+                    request.scores = [[[label, score] for label, score in pairs] for pairs in scored[offset:offset + n]]
+                    offset += n
+            except Exception as e:
+                print(f"[EMOTION SERVER] Batch of {len(texts)} failed: {e}")
+                for request in batch:
+                    request.error = e
+            with self._stats_lock:
+                self.requests += len(batch)
+                self.texts += len(texts)
+                self.batches += 1
+            for request in batch:
+                request.done.set()
+
+    def start(self):
+        for target in (self._run_batches, self._httpd.serve_forever):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        # Unblock the batching thread if it is waiting for work
+        self._queue.put(_Request([]))
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    from agents.analyst import AnalystAgent
+
+    parser = argparse.ArgumentParser(description="Shared RoBERTa emotion inference server (localhost).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--backend", choices=["torch", "onnx"], default=None, help="Defaults to REFLECTAI_EMOTION_BACKEND.")
+    parser.add_argument("--threads", type=int, default=None, help="ONNX intra-op threads.")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--wait-ms", type=float, default=WAIT_MS, help="How long to wait for more requests to batch.")
+    args = parser.parse_args()
+
+    # server_url="" so the server never tries to call itself through REFLECTAI_EMOTION_SERVER
+    analyst = AnalystAgent(use_local_model=True, backend=args.backend, onnx_threads=args.threads, server_url="")
+    if not analyst.use_local:
+        raise SystemExit("[EMOTION SERVER] Local RoBERTa model not found; nothing to serve.")
+    analyst.warm_up()
+
+    server = EmotionServer(analyst._score_batch, analyst.version.split("+")[0], args.host, args.port,
+                           args.max_batch, args.wait_ms)
+    print(f"[EMOTION SERVER] Serving {server.version} on {server.url} "
+          f"(max batch {args.max_batch}, window {args.wait_ms} ms)")
+    server.start()
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,213 @@
+"""
+Shared harness for the offline evaluation scripts (evaluate.py, run_grand_ablation.py).
+
+- Network-bound agents run on a thread pool; local models run in batches.
+- Every finished row is appended to a JSONL checkpoint, so an interrupted run resumes
+  where it stopped instead of starting from zero.
+- Rate limits (HTTP 429) pause all workers for the server's Retry-After (or an exponential
+  backoff) before the request is retried; connection errors, timeouts and 5xx are retried too.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+
+CHECKPOINT_DIR = "eval_checkpoints"
+DEFAULT_WORKERS = 8
+DEFAULT_MAX_RETRIES = 6
+BASE_DELAY_SECONDS = 1.0
+MAX_DELAY_SECONDS = 60.0
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+def row_key(text):
+    """Checkpoint key of one input. Identical texts share a result (all calls are temperature=0)."""
+    return hashlib.sha256(str(text).encode("utf-8")).hexdigest()[:24]
+
+
+def checkpoint_name(*parts):
+    """
+    Runner name from its parts, e.g. checkpoint_name("emotions", agent.version). Include the
+    model version so --resume never mixes predictions from two different models.
+    """
+    return "-".join(re.sub(r"[^A-Za-z0-9._-]+", "_", str(part)) for part in parts)
+
+
+def disable_sdk_retries(*agents):
+    """
+    The OpenAI SDK retries 429s on its own (twice by default). The runner already retries
+    with a shared pause, so stacking both only multiplies the wait.
+    """
+    for agent in agents:
+        agent.client = agent.client.with_options(max_retries=0)
+
+
+class EvalRunner:
+    """
+    One evaluation task (e.g. "safety-llm" or "ablation-real_vent-gpt-4o_merged") over a list of texts.
+
+    results = EvalRunner("safety-llm").map(agent.analyze, texts)
+
+    `results` is aligned with `texts`; rows that still fail after max_retries are None and are
+    not checkpointed, so the next run tries them again.
+    """
+
+    def __init__(self, name, workers=DEFAULT_WORKERS, max_retries=DEFAULT_MAX_RETRIES,
+                 checkpoint_dir=CHECKPOINT_DIR, resume=True, base_delay=BASE_DELAY_SECONDS):
+        self.name = name
+        self.workers = workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.path = os.path.join(checkpoint_dir, f"{name}.jsonl") if checkpoint_dir else None
+        self.stats = {"resumed": 0, "completed": 0, "retries": 0, "rate_limited": 0, "failed": 0, "seconds": 0.0}
+
+        self._done = {}
+        self._write_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        # Monotonic time before which no worker may send a request (set by 429s)
+        self._resume_at = 0.0
+
+        if self.path:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+            if resume:
+                self._load()
+            else:
+                open(self.path, "w").close()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Last line of a run killed mid-write
+                    continue
+                self._done[record["key"]] = record["result"]
+
+    def _save(self, key, result):
+        with self._write_lock:
+            self._done[key] = result
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"key": key, "result": result}) + "\n")
+
+    def _count(self, stat, n=1):
+        with self._stats_lock:
+            self.stats[stat] += n
+
+    def _retry_delay(self, error, attempt):
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            delay = float(retry_after)
+        except (TypeError, ValueError):
+            delay = self.base_delay * 2 ** attempt
+        return min(delay, MAX_DELAY_SECONDS) + random.uniform(0, self.base_delay / 4)
+
+    def call(self, fn, *args):
+        """
+        fn(*args) with retries. Raises the last error once max_retries is exhausted.
+        """
+        for attempt in range(self.max_retries + 1):
+            wait = self._resume_at - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                return fn(*args)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._retry_delay(e, attempt)
+                self._count("retries")
+                if isinstance(e, openai.RateLimitError):
+                    # One 429 means every worker is over the limit: pause them all
+                    self._count("rate_limited")
+                    with self._stats_lock:
+                        self._resume_at = max(self._resume_at, time.monotonic() + delay)
+                else:
+                    time.sleep(delay)
+
+    def _pending(self, texts):
+        pending = {}
+        for text in texts:
+            key = row_key(text)
+            if key not in self._done:
+                pending.setdefault(key, text)
+        self.stats["resumed"] = len(set(map(row_key, texts))) - len(pending)
+        return pending
+
+    def _results(self, texts, start):
+        self.stats["seconds"] = time.perf_counter() - start
+        print(
+            f"[EVAL] {self.name}: {self.stats['completed']} run, {self.stats['resumed']} resumed from checkpoint, "
+            f"{self.stats['failed']} failed, {self.stats['retries']} retries "
+            f"({self.stats['rate_limited']} rate limited) in {self.stats['seconds']:.1f}s"
+        )
+        return [self._done.get(row_key(text)) for text in texts]
+
+    def map(self, fn, texts):
+        """
+        Runs fn(text) for every not-yet-checkpointed text on the thread pool.
+        fn must return something JSON-serializable.
+        """
+        start = time.perf_counter()
+        pending = self._pending(texts)
+
+        def run(item):
+            key, text = item
+            try:
+                result = self.call(fn, text)
+            except Exception as e:
+                self._count("failed")
+                print(f"   [EVAL ERROR] {self.name}: '{str(text)[:40]}...' failed: {e}")
+                return
+            self._save(key, result)
+            self._count("completed")
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            list(pool.map(run, pending.items()))
+        return self._results(texts, start)
+
+    def map_batched(self, batch_fn, texts, batch_size=64):
+        """
+        For local models: batch_fn(list_of_texts) -> list of results, run in the calling thread.
+        Each batch is checkpointed as soon as it finishes.
+        """
+        start = time.perf_counter()
+        items = list(self._pending(texts).items())
+        for i in range(0, len(items), batch_size):
+            chunk = items[i:i + batch_size]
+            try:
+                results = self.call(batch_fn, [text for _, text in chunk])
+            except Exception as e:
+                self._count("failed", len(chunk))
+                print(f"   [EVAL ERROR] {self.name}: batch of {len(chunk)} failed: {e}")
+                continue
+            for (key, _), result in zip(chunk, results):
+                self._save(key, result)
+            self._count("completed", len(chunk))
+        return self._results(texts, start)
+
+
+def emotion_predictions(runner, agent, texts, batch_size=64):
+    """
+    Emotion labels (one list per text) from an AnalystAgent: batched on the local model,
+    one pooled request per text on the GPT path.
+    """
+    if agent.use_local:
+        return runner.map_batched(agent.analyze_emotions_batch, texts, batch_size)
+    return runner.map(lambda text: agent.analyze_emotions(text).split(", "), texts)
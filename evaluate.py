@@ -1,50 +1,48 @@
+import argparse
 import pandas as pd
 from sklearn.metrics import recall_score
 import os
-from sentence_transformers import SentenceTransformer, util
 from sklearn.metrics import recall_score, precision_score, accuracy_score
 
 from agents.guardian import GuardianAgent
 from agents.analyst import AnalystAgent
+from agents.llm_cache import get_cache
+from agents.safety_classifier import HOLDOUT_PATH as SAFETY_HOLDOUT_PATH
+from eval_runner import EvalRunner, checkpoint_name, disable_sdk_retries, emotion_predictions, DEFAULT_WORKERS
+from scoring import LabelScorer
 
 SAFETY_DATA_PATH = os.path.join("data", "synthetic_data/synthetic_safety.csv")
 EMOTION_DATA_PATH = os.path.join("data", "synthetic_data/synthetic_emotions.csv")
 
-print("[INFO] Loading Semantic Embedding Model...")
-embedder = SentenceTransformer('all-MiniLM-L6-v2')
-
-def check_semantic_match(expected, predicted, threshold=0.6):
-    """
-    Returns True if the 'predicted' emotion is semantically close 
-    to the 'expected' emotion using Vector Embeddings.
-    """
-    if expected.lower() in predicted.lower():
-        return True
-        
-    # Semantic Distance
-    embedding_expected = embedder.encode(expected, convert_to_tensor=True)
-    embedding_predicted = embedder.encode(predicted, convert_to_tensor=True)
-    #Calculate Cosine Similarity 
-    score = util.cos_sim(embedding_expected, embedding_predicted).item()
-    
-    return score > threshold
-
-def evaluate_safety():
+def evaluate_safety(use_local_tier=False, workers=DEFAULT_WORKERS, resume=True, holdout=False):
     print("\n[INFO] RUNNING SAFETY EVALUATION (Risk Detection)...")
+    # The local classifier is trained on the rest of synthetic_safety.csv: score it on unseen rows only
+    data_path = SAFETY_HOLDOUT_PATH if use_local_tier or holdout else SAFETY_DATA_PATH
     try:
-        df = pd.read_csv(SAFETY_DATA_PATH)
+        df = pd.read_csv(data_path)
         df['label'] = df['label'].astype(str).str.lower() == 'true'
     except FileNotFoundError:
-        print(f"[ERROR] Could not find {SAFETY_DATA_PATH}")
+        print(f"[ERROR] Could not find {data_path}" + (" (run agents/safety_classifier.py to create it)" if data_path == SAFETY_HOLDOUT_PATH else ""))
         return
 
-    agent = GuardianAgent()
+    agent = GuardianAgent(use_local_tier=use_local_tier, raise_errors=True)
+    disable_sdk_retries(agent)
+    if agent.local_classifier is not None:
+        name = checkpoint_name("safety", "local", agent.local_classifier.version)
+    else:
+        name = "safety-llm"
+    runner = EvalRunner(name, workers=workers, resume=resume)
+    results = runner.map(agent.analyze, df["text"].tolist())
+    
     y_true = []
     y_pred = []
+    tier_counts = {"rules": 0, "local": 0, "llm": 0}
     
-    for index, row in df.iterrows():
-        result = agent.analyze(row["text"])
+    for (index, row), result in zip(df.iterrows(), results):
+        if result is None:
+            continue
         prediction = result["is_risk"]
+        tier_counts[result["tier"]] += 1
         
         y_true.append(row["label"])
         y_pred.append(prediction)
@@ -60,13 +58,18 @@ def evaluate_safety():
     fnr = 1 - recall
     
     print(f"\n   Safety Results:")
-    print(f"   - Total Cases: {len(df)}")
+    print(f"   - Total Cases: {len(df)} from {data_path} ({len(df) - len(y_true)} unscored after retries)")
     print(f"   - Crisis Recall: {recall:.2%}") 
     print(f"   - False Negative Rate: {fnr:.2%}")
     print(f"   - Precision: {precision:.2%}")
     print(f"   - Overall Accuracy: {accuracy:.2%}")
+    if agent.local_classifier is not None:
+        # From the (possibly resumed) results, not agent.tier_counts, which only sees this run
+        past_rules = tier_counts["local"] + tier_counts["llm"]
+        print(f"   - Decided by: {tier_counts}")
+        print(f"   - LLM Escalation Rate: {tier_counts['llm'] / past_rules if past_rules else 0.0:.2%}")
 
-def evaluate_emotions():
+def evaluate_emotions(workers=DEFAULT_WORKERS, resume=True):
     print("\n[INFO] RUNNING EMOTION ACCURACY TEST (Semantic Similarity)...")
     try:
         df = pd.read_csv(EMOTION_DATA_PATH)
@@ -74,27 +77,46 @@ def evaluate_emotions():
         print(f"[ERROR] Could not find {EMOTION_DATA_PATH}")
         return
 
-    agent = AnalystAgent()
+    agent = AnalystAgent(raise_errors=True)
+    disable_sdk_retries(agent)
+    # Versioned name: a torch and an ONNX (or retrained) run never resume from each other's rows
+    runner = EvalRunner(checkpoint_name("emotions", agent.version), workers=workers, resume=resume)
     correct = 0
-    total = len(df)
     
-    for index, row in df.iterrows():
-        predicted_str = agent.analyze_emotions(row["text"])
-        
-        # Use the Embedding Matcher instead of hard-coded dictionary
-        if check_semantic_match(row["expected"], predicted_str, threshold=0.55):
+    # Batched on RoBERTa, concurrent requests on GPT
+    predictions = emotion_predictions(runner, agent, df["text"].astype(str).tolist())
+    
+    scored = [(row, ", ".join(labels)) for (index, row), labels in zip(df.iterrows(), predictions) if labels is not None]
+    total = len(scored)
+    
+    # Embedding Matcher: every distinct label/prediction encoded once, all rows scored in one matrix op
+    print("[INFO] Scoring with the Semantic Embedding Model...")
+    scorer = LabelScorer(vocabulary=df["expected"].astype(str).unique(), threshold=0.55)
+    hits = scorer.matches([row["expected"] for row, _ in scored], [predicted_str for _, predicted_str in scored])
+    
+    for (row, predicted_str), hit in zip(scored, hits):
+        if hit:
             correct += 1
         else:
             print(f"   [MISMATCH] Input: '{row['text'][:40]}...' | Expected: {row['expected']} | Got: {predicted_str}")
             
-    accuracy = correct / total
+    accuracy = correct / total if total else 0.0
     print(f"\n   Emotion Results:")
     print(f"   - Accuracy: {accuracy:.2%}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ReflectAI evaluation suite.")
+    parser.add_argument("--local-tier", action="store_true", help="Route the Guardian through the local safety classifier first.")
+    parser.add_argument("--holdout", action="store_true", help="Score the safety set's held-out split (implied by --local-tier), e.g. to compare the LLM-only Guardian on the same rows.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Concurrent API requests.")
+    parser.add_argument("--fresh", action="store_true", help="Ignore checkpoints in eval_checkpoints/ and start over.")
+    args = parser.parse_args()
+
     print("   ReflectAI EVALUATION SUITE           ")
     
-    evaluate_safety()
-    evaluate_emotions()
+    evaluate_safety(use_local_tier=args.local_tier, workers=args.workers, resume=not args.fresh, holdout=args.holdout)
+    evaluate_emotions(workers=args.workers, resume=not args.fresh)
     
+    cache_stats = get_cache().stats()
+    print(f"\n   LLM cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%} hit rate)")
     print("   EVALUATION COMPLETE                  ")
\ No newline at end of file
@@ -0,0 +1,229 @@
+"""
+Minimal local stand-in for the OpenAI Chat Completions API.
+
+Used by the load tests and pipeline tests so they can run without network access or an API key.
+Replies are picked from the system prompt of each request, mimicking the agents' expected formats.
+
+Usage:
+    with FakeOpenAIServer(latency=0.3) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        ...
+or run standalone: python fake_openai_server.py --port 8765 --latency 0.2
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RISK_PHRASES = [
+    "hopeless", "disappear", "sleep forever", "no way out", "can't go on",
+    "swallowing me", "better off without me", "trapped",
+]
+
+UNSAFE_ADVICE = [
+    "stop taking", "quit the meds", "don't need the pills", "hurt yourself",
+    "ending it all", "give up", "cutting yourself",
+]
+
+
+def _contains_any(text, phrases):
+    text = text.lower()
+    return any(p in text for p in phrases)
+
+
+def default_responder(messages, body):
+    """
+    Returns the assistant reply for a request, based on which agent prompt it carries.
+    """
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+
+    if "reviewing several journal entries" in system:
+        verdicts = [
+            {"id": item["id"], "risk": "RISK" if _contains_any(item["entry"], RISK_PHRASES) else "SAFE"}
+            for item in json.loads(user)
+        ]
+        return json.dumps({"verdicts": verdicts})
+    if "Safety Guardian and journal analyst" in system:
+        if _contains_any(user, RISK_PHRASES):
+            return json.dumps({"risk": "RISK", "emotions": ["Sadness"], "triggers": ["Loneliness"]})
+        return json.dumps({"risk": "SAFE", "emotions": ["Nervousness", "Disappointment"], "triggers": ["Work", "Boss", "Deadlines"]})
+    if "Safety Guardian" in system:
+        return "RISK" if _contains_any(user, RISK_PHRASES) else "SAFE"
+    if "Safety Auditor" in system:
+        return "UNSAFE" if _contains_any(user, UNSAFE_ADVICE) else "SAFE"
+    if "analyze one journal entry" in system:
+        return json.dumps({"emotions": ["Nervousness", "Disappointment"], "triggers": ["Work", "Boss", "Deadlines"]})
+    if "extracting keywords" in system:
+        return "Work, Boss, Deadlines"
+    if "Classify the journal entry" in system:
+        return json.dumps({"emotions": ["Nervousness", "Disappointment"]})
+    return (
+        "It sounds like this week asked a lot of you. "
+        "Try Box Breathing before bed and notice how your sleep shifts."
+    )
+
+
+class FakeOpenAIServer:
+    """
+    Threaded HTTP server answering POST /v1/chat/completions (plain or stream=True).
+    `latency` (seconds) is added to every request to simulate network + model time.
+    `rate_limit_every`: answer every Nth request with HTTP 429 and a Retry-After of `retry_after` seconds.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, responder=default_responder, token_delay=0.02,
+                 rate_limit_every=0, retry_after=0.5):
+        self.latency = latency
+        # Streaming only: pause between content chunks
+        self.token_delay = token_delay
+        self.responder = responder
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.request_count = 0
+        self.rate_limited_count = 0
+        self._count_lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+
+                with server._count_lock:
+                    server.request_count += 1
+                    limited = server.rate_limit_every and server.request_count % server.rate_limit_every == 0
+                    if limited:
+                        server.rate_limited_count += 1
+
+                if limited:
+                    self._send_json(
+                        429,
+                        {"error": {"message": "Rate limit reached (fake)", "type": "requests", "code": "rate_limit_exceeded"}},
+                        {"Retry-After": str(server.retry_after)},
+                    )
+                    return
+
+                if server.latency:
+                    time.sleep(server.latency)
+
+                content = server.responder(body.get("messages", []), body)
+                if body.get("stream"):
+                    self._send_stream(body, content)
+                else:
+                    self._send_json(200, server._completion(body, content))
+
+            def _send_stream(self, body, content):
+                # Server-sent events, one word per chunk, closed with [DONE]
+                self.close_connection = True
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.send_header("Connection", "close")
+                    self.end_headers()
+                    words = re.findall(r"\S+\s*", content)
+                    for i, piece in enumerate(words):
+                        if i and server.token_delay:
+                            time.sleep(server.token_delay)
+                        chunk = server._chunk(body, {"content": piece}, None)
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                        self.wfile.flush()
+                    chunk = server._chunk(body, {}, "stop")
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def _send_json(self, status, payload, headers=None):
+                data = json.dumps(payload).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    for name, value in (headers or {}).items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Client gave up (e.g. a stage timeout) before we answered
+                    pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _completion(self, body, content):
+        prompt_chars = sum(len(str(m.get("content", ""))) for m in body.get("messages", []))
+        prompt_tokens = max(1, prompt_chars // 4)
+        completion_tokens = max(1, len(content) // 4)
+        return {
+            "id": f"chatcmpl-fake-{self.request_count}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def _chunk(self, body, delta, finish_reason):
+        return {
+            "id": f"chatcmpl-fake-{self.request_count}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local fake OpenAI Chat Completions server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every Nth request with a 429.")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(port=args.port, latency=args.latency, rate_limit_every=args.rate_limit_every)
+    print(f"[FAKE OPENAI] Serving on {server.base_url} (latency {args.latency}s)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,230 @@
+"""
+Bulk import and re-analysis for journal.db.
+
+  python import_journal.py import entries.csv      # or .jsonl; resumes where the last run stopped
+  python import_journal.py reanalyze               # re-run the Analyst on rows from older versions
+
+Input rows need a `content` (or `text`) field. Optional: date, sleep_hours, stress_level,
+user_id, and emotions + triggers (rows that carry both skip the Analyst). Every row goes
+through the Guardian; crisis entries are stored as "High Risk" / "Crisis" like in the app.
+
+API or model errors never turn into stored fallbacks: on import, rows without a Guardian verdict
+or an analysis are written to <file>.failed.jsonl (import that file to retry them); on reanalyze,
+failed rows keep their old version and are picked up again by the next run.
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import database
+
+CHUNK_SIZE = 256
+WORKERS = 8
+
+
+def read_rows(path):
+    """Streams dict rows from a .csv or .jsonl file without loading it into memory."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def _int_or_none(value):
+    if value is None or str(value).strip() == "":
+        return None
+    return int(float(value))
+
+
+def _normalize(raw, user_id):
+    content = str(raw.get("content") or raw.get("text") or "").strip()
+    date = raw.get("date")
+    date = datetime.fromisoformat(str(date).strip()) if date else datetime.now()
+    return {
+        "user_id": raw.get("user_id") or user_id,
+        "date": date.strftime("%Y-%m-%d %H:%M:%S"),
+        "content": content,
+        "sleep_hours": _int_or_none(raw.get("sleep_hours")),
+        "stress_level": _int_or_none(raw.get("stress_level")),
+        "emotions": raw.get("emotions") or None,
+        "triggers": raw.get("triggers") or None,
+        "risk_flag": 0,
+        "analysis_version": None,
+    }
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _or_none(fn, text):
+    try:
+        return fn(text)
+    except Exception as e:
+        print(f"[ANALYST ERROR] {e}")
+        return None
+
+
+def analyze_texts(analyst, texts, pool):
+    """
+    Emotions and triggers for a list of texts: RoBERTa in batches + concurrent trigger calls,
+    or on the GPT path one concurrent merged call per text.
+    Build the analyst with raise_errors=True: a text whose analysis failed gets None for both.
+    """
+    if not analyst.use_local:
+        results = list(pool.map(lambda text: _or_none(analyst.analyze, text), texts))
+        return [r and r["emotions"] for r in results], [r and r["triggers"] for r in results]
+    triggers = list(pool.map(lambda text: _or_none(analyst.extract_triggers, text), texts))
+    try:
+        emotions = [", ".join(labels) for labels in analyst.analyze_emotions_batch(texts)]
+    except Exception as e:
+        print(f"[ANALYST ERROR] RoBERTa batch failed: {e}")
+        emotions = [None] * len(texts)
+    failed = [e is None or t is None for e, t in zip(emotions, triggers)]
+    return ([None if f else e for e, f in zip(emotions, failed)],
+            [None if f else t for t, f in zip(triggers, failed)])
+
+
+class Progress:
+    def __init__(self, label):
+        self.label = label
+        self.rows = 0
+        self.start = time.perf_counter()
+
+    def add(self, n, extra=""):
+        self.rows += n
+        elapsed = time.perf_counter() - self.start
+        print(f"[{self.label}] {self.rows} rows, {self.rows / elapsed:.1f} rows/s{extra}")
+
+
+def import_file(path, guardian, analyst, user_id=database.DEFAULT_USER, chunk_size=CHUNK_SIZE,
+                workers=WORKERS, db_name=None):
+    source = os.path.abspath(path)
+    skip = database.import_rows_done(source, db_name)
+    if skip:
+        print(f"[IMPORT] Resuming {path}: {skip} rows already imported.")
+
+    progress = Progress("IMPORT")
+    rows_done = skip
+    failed_path = path + ".failed.jsonl"
+    failed_total = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        rows = (raw for i, raw in enumerate(read_rows(path)) if i >= skip)
+        for chunk in _chunks(rows, chunk_size):
+            rows_done += len(chunk)
+            pairs = [(raw, _normalize(raw, user_id)) for raw in chunk]
+            pairs = [(raw, e) for raw, e in pairs if e["content"]]
+
+            safety = guardian.analyze_batch([e["content"] for _, e in pairs], workers=workers)
+            to_analyze = []
+            failed = []
+            for (raw, entry), verdict in zip(pairs, safety):
+                if verdict is None:
+                    # No Guardian verdict: never store the row as a guessed "Crisis"
+                    failed.append(raw)
+                elif verdict["is_risk"]:
+                    entry.update(emotions="High Risk", triggers="Crisis", risk_flag=1)
+                elif not (entry["emotions"] and entry["triggers"]):
+                    to_analyze.append((raw, entry))
+
+            if to_analyze:
+                emotions, triggers = analyze_texts(analyst, [e["content"] for _, e in to_analyze], pool)
+                for (raw, entry), e, t in zip(to_analyze, emotions, triggers):
+                    if e is None:
+                        failed.append(raw)
+                    else:
+                        entry.update(emotions=e, triggers=t, analysis_version=analyst.version)
+
+            failed_ids = {id(raw) for raw in failed}
+            entries = [e for raw, e in pairs if id(raw) not in failed_ids]
+            if failed:
+                with open(failed_path, "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(raw, ensure_ascii=False) + "\n" for raw in failed))
+                failed_total += len(failed)
+
+            # Entries + tags + aggregates + resume point, all in one transaction
+            database.import_entries(entries, source=source, rows_done=rows_done, db_name=db_name)
+            flagged = sum(e["risk_flag"] for e in entries)
+            progress.add(len(chunk), f" ({flagged} flagged, {len(to_analyze)} analyzed, "
+                                     f"{len(failed)} failed in this chunk)")
+    print(f"[IMPORT] Done: {progress.rows - failed_total} new rows from {path}.")
+    if failed_total:
+        print(f"[IMPORT] {failed_total} rows failed (API/model errors) and were not imported. "
+              f"Retry them with: python import_journal.py import {failed_path}")
+    return progress.rows - failed_total
+
+
+def reanalyze(analyst, version=None, after_id=0, chunk_size=CHUNK_SIZE, workers=WORKERS, db_name=None):
+    """
+    Re-runs the Analyst on every analyzed, non-crisis entry not already at `version`, in id order.
+    Rows are stamped with `version` as they are updated, so an interrupted run simply continues.
+    """
+    version = version or analyst.version
+    progress = Progress("REANALYZE")
+    last_id = after_id
+    failed_total = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            batch = database.fetch_for_reanalysis(version, last_id, chunk_size, db_name)
+            if not batch:
+                break
+            ids = [entry_id for entry_id, _ in batch]
+            emotions, triggers = analyze_texts(analyst, [content for _, content in batch], pool)
+            # Failed rows keep their old analysis and version, so the next run retries them
+            results = [(i, e, t) for i, e, t in zip(ids, emotions, triggers) if e is not None]
+            database.replace_analysis(results, version, db_name)
+            failed_total += len(batch) - len(results)
+            last_id = ids[-1]
+            progress.add(len(batch), f" (last id {last_id}, {len(batch) - len(results)} failed)")
+    print(f"[REANALYZE] Done: {progress.rows - failed_total} rows now at '{version}'.")
+    if failed_total:
+        print(f"[REANALYZE] {failed_total} rows failed (API/model errors) and were left unchanged; re-run to retry.")
+    return progress.rows - failed_total
+
+
+if __name__ == "__main__":
+    from agents.guardian import GuardianAgent
+    from agents.analyst import AnalystAgent
+
+    parser = argparse.ArgumentParser(description="Bulk import / re-analysis for journal.db.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    imp = sub.add_parser("import", help="Import entries from a CSV or JSONL file.")
+    imp.add_argument("path")
+    imp.add_argument("--user", default=database.DEFAULT_USER, help="user_id for rows that do not set one.")
+
+    re_an = sub.add_parser("reanalyze", help="Re-analyze existing entries with the current Analyst.")
+    re_an.add_argument("--version", default=None, help="Version label to stamp (defaults to the Analyst's).")
+    re_an.add_argument("--after-id", type=int, default=0, help="Start after this entry id.")
+
+    for p in (imp, re_an):
+        p.add_argument("--db", default=None, help="Database file (defaults to journal.db).")
+        p.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        p.add_argument("--workers", type=int, default=WORKERS, help="Concurrent API requests.")
+        p.add_argument("--gpt", action="store_true", help="Use the GPT emotion path instead of local RoBERTa.")
+    args = parser.parse_args()
+
+    if args.db:
+        database.DB_NAME = args.db
+    # Errors must surface as failed rows, not as stored "Neutral"/"General"/"Crisis" fallbacks
+    analyst = AnalystAgent(use_local_model=not args.gpt, raise_errors=True)
+
+    if args.command == "import":
+        guardian = GuardianAgent(use_local_tier=True, raise_errors=True)
+        import_file(args.path, guardian, analyst, args.user, args.chunk_size, args.workers)
+    else:
+        reanalyze(analyst, args.version, args.after_id, args.chunk_size, args.workers)
@@ -0,0 +1,55 @@
+import threading
+import time
+
+_models = {}
+_locks = {}
+_registry_lock = threading.Lock()
+
+
+def _lock_for(name):
+    with _registry_lock:
+        if name not in _locks:
+            _locks[name] = threading.Lock()
+        return _locks[name]
+
+
+def get_model(name, loader):
+    """
+    Process-wide, load-once model cache.
+    The first caller for `name` runs loader(); concurrent callers wait for that same load
+    instead of starting their own, and everyone after that gets the cached object.
+    Streamlit sessions share the Python process, so they share these models too.
+    """
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    with _lock_for(name):
+        model = _models.get(name)
+        if model is None:
+            start = time.perf_counter()
+            model = loader()
+            _models[name] = model
+            print(f"[MODELS] Loaded '{name}' in {time.perf_counter() - start:.1f}s")
+        return model
+
+
+def is_loaded(name):
+    return name in _models
+
+
+def warm_up(*tasks):
+    """
+    Runs each callable in a daemon thread so models load while the first page renders.
+    Returns the thread (join it to wait for warm-up to finish).
+    """
+    def run():
+        for task in tasks:
+            try:
+                task()
+            except Exception as e:
+                print(f"[MODELS] Warm-up step failed: {e}")
+
+    thread = threading.Thread(target=run, name="model-warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -1,13 +1,12 @@
+import argparse
 import pandas as pd
 import time
 import os
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
 from agents.analyst import AnalystAgent
-from sentence_transformers import SentenceTransformer, util
-
-# LOAD EMBEDDING MODEL
-embedder = SentenceTransformer('all-MiniLM-L6-v2')
+from eval_runner import EvalRunner, checkpoint_name, disable_sdk_retries, emotion_predictions, DEFAULT_WORKERS
+from scoring import LabelScorer
 
 DATASETS = [
     {"name": "GoEmotions (Reddit)", "path": "data/real_data/real_goemotions.csv"},
@@ -15,20 +14,7 @@ DATASETS = [
     {"name": "ISEAR (Journals)",   "path": "data/real_data/real_isear.csv"}
 ]
 
-def check_match(expected, predicted, threshold=0.55):
-    expected = str(expected).lower().strip()
-    predicted = str(predicted).lower().strip()
-    
-    # 1. Exact Substring Match
-    if expected in predicted: 
-        return True
-        
-    # 2. Semantic Similarity
-    emb1 = embedder.encode(expected, convert_to_tensor=True)
-    emb2 = embedder.encode(predicted, convert_to_tensor=True)
-    return util.cos_sim(emb1, emb2).item() > threshold
-
-def evaluate_dataset(dataset_name, file_path, roberta_agent, gpt_agent):
+def evaluate_dataset(dataset_name, file_path, roberta_agent, gpt_agent, scorer, workers=DEFAULT_WORKERS, resume=True):
     print(f"\n📂 Evaluating on: {dataset_name}")
     try:
         df = pd.read_csv(file_path)
@@ -37,41 +23,45 @@ def evaluate_dataset(dataset_name, file_path, roberta_agent, gpt_agent):
         return None
 
     scores = {"roberta": 0, "gpt": 0}
+    scored = {"roberta": 0, "gpt": 0}
+    texts = df["text"].astype(str).tolist()
+    slug = os.path.splitext(os.path.basename(file_path))[0]
     
-    for index, row in df.iterrows():
-        text = str(row["text"])
-        truth = str(row["expected"])
-        
-        # Test RoBERTa
-        pred_rob_tuple = roberta_agent.analyze_emotions(text)
-        pred_rob = pred_rob_tuple[0] if isinstance(pred_rob_tuple, tuple) else pred_rob_tuple
-        
-        if check_match(truth, pred_rob):
-            scores["roberta"] += 1
-            
-        # Test GPT
-        pred_gpt_tuple = gpt_agent.analyze_emotions(text)
-        pred_gpt = pred_gpt_tuple[0] if isinstance(pred_gpt_tuple, tuple) else pred_gpt_tuple
-        
-        if check_match(truth, pred_gpt):
-            scores["gpt"] += 1
+    # RoBERTa in local batches, GPT as concurrent requests; both checkpointed per row and model version
+    predictions = {
+        "roberta": emotion_predictions(EvalRunner(checkpoint_name("ablation", slug, roberta_agent.version), resume=resume), roberta_agent, texts),
+        "gpt": emotion_predictions(EvalRunner(checkpoint_name("ablation", slug, gpt_agent.version), workers=workers, resume=resume), gpt_agent, texts),
+    }
+    
+    # Substring or semantic match; embeddings are cached in the scorer across models and datasets
+    for model, labels_per_row in predictions.items():
+        pairs = [(truth, ", ".join(labels)) for truth, labels in zip(df["expected"].astype(str), labels_per_row) if labels is not None]
+        scored[model] = len(pairs)
+        scores[model] = sum(scorer.matches([t for t, _ in pairs], [p for _, p in pairs]))
             
-    acc_rob = (scores["roberta"] / len(df)) * 100
-    acc_gpt = (scores["gpt"] / len(df)) * 100
+    acc_rob = (scores["roberta"] / max(scored["roberta"], 1)) * 100
+    acc_gpt = (scores["gpt"] / max(scored["gpt"], 1)) * 100
     
     return acc_rob, acc_gpt
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RoBERTa vs GPT emotion accuracy across datasets.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Concurrent GPT requests.")
+    parser.add_argument("--fresh", action="store_true", help="Ignore checkpoints in eval_checkpoints/ and start over.")
+    args = parser.parse_args()
+
     print("   ReflectAI GRAND ABLATION STUDY       ")
 
     print("...Loading Models...")
-    roberta_agent = AnalystAgent(use_local_model=True)
-    gpt_agent = AnalystAgent(use_local_model=False)
+    roberta_agent = AnalystAgent(use_local_model=True, raise_errors=True)
+    gpt_agent = AnalystAgent(use_local_model=False, raise_errors=True)
+    disable_sdk_retries(gpt_agent)
+    scorer = LabelScorer(threshold=0.55)
 
     results = []
 
     for ds in DATASETS:
-        result = evaluate_dataset(ds["name"], ds["path"], roberta_agent, gpt_agent)
+        result = evaluate_dataset(ds["name"], ds["path"], roberta_agent, gpt_agent, scorer, args.workers, not args.fresh)
         
         if result is None:
             continue
@@ -0,0 +1,76 @@
+"""
+Semantic label matching for the evaluation scripts.
+
+An emotion prediction counts as correct when the expected label is a substring of it, or when
+the two are close in MiniLM embedding space. The label vocabulary is tiny and predictions
+repeat constantly, so every distinct string is encoded once, in batches, and all rows are
+scored with one matrix product instead of two encode() calls per row.
+"""
+import numpy as np
+
+from embedding_service import encode
+
+DEFAULT_THRESHOLD = 0.55
+
+
+def _normalize(text):
+    return str(text).lower().strip()
+
+
+class LabelScorer:
+    """
+    scorer = LabelScorer(vocabulary=df["expected"].unique())
+    correct = scorer.matches(df["expected"], predicted_strings)
+    """
+
+    def __init__(self, vocabulary=(), threshold=DEFAULT_THRESHOLD, use_disk_cache=True):
+        self.threshold = threshold
+        self.use_disk_cache = use_disk_cache
+        self._vectors = {}
+        # Closed label vocabulary: encoded up front, reused by every call
+        self.embed(vocabulary)
+
+    def embed(self, texts):
+        """
+        Unit-length embeddings for `texts` (one row each). Only strings not seen before are encoded.
+        """
+        texts = [_normalize(t) for t in texts]
+        missing = [t for t in dict.fromkeys(texts) if t not in self._vectors]
+        if missing:
+            # Labels and model outputs, not journal text: safe to keep in the on-disk cache
+            for text, vector in zip(missing, encode(missing, use_cache=self.use_disk_cache)):
+                self._vectors[text] = vector
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([self._vectors[t] for t in texts])
+
+    def similarities(self, expected, predicted):
+        """
+        Cosine similarity of each (expected, predicted) pair, computed over distinct strings only.
+        """
+        expected = [_normalize(t) for t in expected]
+        predicted = [_normalize(t) for t in predicted]
+        if not expected:
+            return np.zeros(0, dtype=np.float32)
+
+        unique_expected = list(dict.fromkeys(expected))
+        unique_predicted = list(dict.fromkeys(predicted))
+        # Vectors are normalized, so the dot product is the cosine similarity
+        matrix = self.embed(unique_expected) @ self.embed(unique_predicted).T
+
+        row = {t: i for i, t in enumerate(unique_expected)}
+        col = {t: j for j, t in enumerate(unique_predicted)}
+        return matrix[[row[t] for t in expected], [col[t] for t in predicted]]
+
+    def matches(self, expected, predicted, threshold=None):
+        """
+        Returns one bool per pair: substring match, or similarity above the threshold.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        expected = list(expected)
+        predicted = list(predicted)
+        scores = self.similarities(expected, predicted)
+        return [
+            _normalize(e) in _normalize(p) or bool(score > threshold)
+            for e, p, score in zip(expected, predicted, scores)
+        ]
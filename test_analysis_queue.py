@@ -0,0 +1,91 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_openai_server import FakeOpenAIServer
+
+LATENCY = 0.2
+ENTRIES = 12
+WORKERS = 4
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def run_queue_test():
+    print("   ANALYSIS QUEUE TEST (fake OpenAI)  ")
+
+    with FakeOpenAIServer(latency=LATENCY, rate_limit_every=7, retry_after=0) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+        os.environ["REFLECTAI_LLM_CACHE"] = os.path.join(tempfile.mkdtemp(), "llm_cache.db")
+
+        import database
+        from agents.analyst import AnalystAgent
+        from analysis_queue import AnalysisWorkers
+        from eval_runner import disable_sdk_retries
+
+        database.DB_NAME = os.path.join(tempfile.mkdtemp(), "journal.db")
+        database.JOB_RETRY_BASE_SECONDS = 0.05
+
+        # GPT path so emotions and triggers are both network calls
+        analyst = AnalystAgent(use_local_model=False, raise_errors=True)
+        disable_sdk_retries(analyst)
+        workers = AnalysisWorkers(analyst, workers=WORKERS, poll_seconds=0.05).start()
+        checks = []
+
+        # 1. Saving does not wait for analysis
+        start = time.perf_counter()
+        ids = [database.save_entry(f"Entry {i}: my boss moved the deadline again.", 6, 7, None, None, False, pending=True)
+               for i in range(ENTRIES)]
+        workers.notify()
+        save_ms = (time.perf_counter() - start) / ENTRIES * 1000
+        print(f"\n   save_entry(pending=True): {save_ms:.1f} ms/entry (one analysis takes >= {2 * LATENCY:.1f}s)")
+        checks.append(("Save returns before analysis", save_ms < LATENCY * 1000 / 2))
+        checks.append(("New entries start as pending", database.count_entries_by_status()["pending"] > 0))
+
+        # 2. Workers drain the queue; 429s are retried, not stored as fallbacks
+        checks.append(("All entries analyzed", wait_for(lambda: database.count_entries_by_status()["done"] == ENTRIES)))
+        history = database.fetch_history(columns=["emotions", "triggers"])
+        checks.append(("Results are real, not fallbacks", (history["triggers"] == "Work, Boss, Deadlines").all()))
+        checks.append(("Some attempts were rate limited and retried", workers.failed > 0 and server.rate_limited_count > 0))
+
+        # 3. Each entry counted once in the tag aggregates (no double-processing across threads)
+        counts = database.fetch_tag_counts("trigger")
+        checks.append(("Tag aggregates applied exactly once", set(counts["count"]) == {ENTRIES}))
+        checks.append(("Duplicate completion is a no-op", not database.complete_analysis(0, ids[0], "Joy", "Work")))
+
+        # 4. Hard failures end as "failed" and can be re-queued
+        server.rate_limit_every = 1
+        database.save_entry("Entry that will fail.", 6, 7, None, None, False, pending=True)
+        workers.notify()
+        checks.append(("Exhausted retries mark the entry failed",
+                       wait_for(lambda: database.count_entries_by_status()["failed"] == 1)))
+        server.rate_limit_every = 0
+        database.retry_failed_jobs()
+        workers.notify()
+        checks.append(("Retried entry completes", wait_for(lambda: database.count_entries_by_status()["done"] == ENTRIES + 1)))
+
+        workers.stop()
+
+    passed = 0
+    print()
+    for name, ok in checks:
+        print(f"   [{'PASS' if ok else 'FAIL'}] {name}")
+        passed += ok
+
+    print(f"\n   FINAL RESULTS: {passed}/{len(checks)} checks passed")
+    return passed == len(checks)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_queue_test() else 1)
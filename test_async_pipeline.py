@@ -0,0 +1,86 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_openai_server import FakeOpenAIServer
+
+LATENCY = 0.3
+
+SAFE_ENTRY = "My boss moved the deadline up again and I snapped at my roommate."
+LLM_RISK_ENTRY = "Everything feels hopeless and I just want to disappear for a while."
+KEYWORD_RISK_ENTRY = "I keep thinking about suicide."
+
+
+def run_pipeline_test():
+    print("   ASYNC PIPELINE TEST (fake OpenAI)  ")
+
+    with FakeOpenAIServer(latency=LATENCY) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+        # Keep the response cache out of the way: every phase must really hit the server
+        os.environ["REFLECTAI_LLM_CACHE"] = os.path.join(tempfile.mkdtemp(), "llm_cache.db")
+
+        from agents.guardian import GuardianAgent
+        from agents.analyst import AnalystAgent
+        from agents.pipeline import EntryPipeline
+        from agents.llm_cache import get_cache
+
+        guardian = GuardianAgent()
+        # GPT path so every stage is a network call against the fake server
+        analyst = AnalystAgent(use_local_model=False)
+        pipeline = EntryPipeline(guardian, analyst)
+
+        checks = []
+
+        # 1. Sequential baseline (the original Save Entry flow)
+        start = time.perf_counter()
+        safety = guardian.analyze(SAFE_ENTRY)
+        emotions = analyst.analyze_emotions(SAFE_ENTRY)
+        triggers = analyst.extract_triggers(SAFE_ENTRY)
+        sequential = time.perf_counter() - start
+
+        # 2. Concurrent pipeline (first call warms the loop/connection pool)
+        pipeline.process(SAFE_ENTRY)
+        get_cache().clear()
+        start = time.perf_counter()
+        result = pipeline.process(SAFE_ENTRY)
+        concurrent = time.perf_counter() - start
+
+        print(f"\n   Sequential: {sequential:.2f}s | Pipeline: {concurrent:.2f}s | Stage timings: "
+              + ", ".join(f"{k}={v:.2f}s" for k, v in result["timings"].items()))
+
+        checks.append(("Same verdict as sequential flow", result["is_risk"] == safety["is_risk"]))
+        checks.append(("Same emotions as sequential flow", result["emotions"] == emotions))
+        checks.append(("Same triggers as sequential flow", result["triggers"] == triggers))
+        checks.append(("Latency ~ max of stages, not sum", concurrent < sequential * 0.6))
+
+        # 3. Guardian LLM flags risk -> no Analyst output
+        result = pipeline.process(LLM_RISK_ENTRY)
+        checks.append(("LLM risk discards Analyst results", result["is_risk"] and result["emotions"] is None))
+
+        # 4. Keyword rule short-circuits before any network call
+        before = server.request_count
+        result = pipeline.process(KEYWORD_RISK_ENTRY)
+        checks.append(("Keyword risk makes no LLM calls", result["is_risk"] and server.request_count == before))
+
+        # 5. Guardian timeout fails safe
+        get_cache().clear()
+        slow_pipeline = EntryPipeline(guardian, analyst, timeouts={"guardian": LATENCY / 3})
+        result = slow_pipeline.process(SAFE_ENTRY)
+        checks.append(("Guardian timeout counts as RISK", result["is_risk"] and result["reason"] == "Timeout Fallback"))
+
+    passed = 0
+    print()
+    for name, ok in checks:
+        print(f"   [{'PASS' if ok else 'FAIL'}] {name}")
+        passed += ok
+
+    print(f"\n   FINAL RESULTS: {passed}/{len(checks)} checks passed")
+    return passed == len(checks)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_pipeline_test() else 1)
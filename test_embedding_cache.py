@@ -0,0 +1,75 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from embedding_service import EmbeddingCache, text_key
+
+DIM = 4
+
+
+def vec(value):
+    return np.full(DIM, value, dtype=np.float32)
+
+
+def run_cache_test():
+    print("   EMBEDDING CACHE CRASH-SAFETY TEST  ")
+    checks = []
+    path = os.path.join(tempfile.mkdtemp(), "cache")
+
+    cache = EmbeddingCache(path)
+    cache.add([text_key("a")], [vec(1.0)])
+
+    # 1. Crash after the vectors were appended but before their keys: an orphan row
+    with open(os.path.join(path, "vectors.f32"), "ab") as f:
+        f.write(vec(9.0).tobytes())
+    cache = EmbeddingCache(path)
+    cache.add([text_key("b")], [vec(2.0)])
+    reopened = EmbeddingCache(path).get([text_key("a"), text_key("b")])
+    checks.append(("Orphan vector row is dropped on load",
+                   np.allclose(reopened[text_key("a")], 1.0) and np.allclose(reopened[text_key("b")], 2.0)))
+
+    # 2. Crash in the middle of writing a vector row: a partial row
+    with open(os.path.join(path, "vectors.f32"), "ab") as f:
+        f.write(vec(9.0).tobytes()[:6])
+    cache = EmbeddingCache(path)
+    cache.add([text_key("c")], [vec(3.0)])
+    reopened = EmbeddingCache(path).get([text_key("b"), text_key("c")])
+    checks.append(("Partial vector row is dropped on load",
+                   np.allclose(reopened[text_key("b")], 2.0) and np.allclose(reopened[text_key("c")], 3.0)))
+    checks.append(("Vector file is whole rows again",
+                   os.path.getsize(os.path.join(path, "vectors.f32")) == 3 * DIM * 4))
+
+    # 3. Crash in the middle of writing a key: a partial, unterminated last line
+    with open(os.path.join(path, "keys.txt"), "a") as f:
+        f.write(text_key("x")[:20])
+    cache = EmbeddingCache(path)
+    cache.add([text_key("d")], [vec(4.0)])
+    reopened = EmbeddingCache(path)
+    found = reopened.get([text_key("a"), text_key("b"), text_key("c"), text_key("d")])
+    checks.append(("Partial key line is dropped on load",
+                   [float(found[text_key(t)][0]) for t in "abcd"] == [1.0, 2.0, 3.0, 4.0]))
+    checks.append(("Four rows after all crashes", reopened.stats()["size"] == 4))
+
+    # 4. Clear, then keep using the same cache object
+    reopened.clear()
+    reopened.add([text_key("e")], [vec(5.0)])
+    found = EmbeddingCache(path).get([text_key("a"), text_key("e")])
+    checks.append(("Add after clear starts a fresh cache",
+                   list(found) == [text_key("e")] and np.allclose(found[text_key("e")], 5.0)))
+
+    passed = 0
+    print()
+    for name, ok in checks:
+        print(f"   [{'PASS' if ok else 'FAIL'}] {name}")
+        passed += ok
+
+    print(f"\n   FINAL RESULTS: {passed}/{len(checks)} checks passed")
+    return passed == len(checks)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_cache_test() else 1)
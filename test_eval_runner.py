@@ -0,0 +1,92 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_openai_server import FakeOpenAIServer, RISK_PHRASES
+
+LATENCY = 0.2
+ROWS = 40
+WORKERS = 8
+
+
+def make_texts():
+    texts = []
+    for i in range(ROWS):
+        if i % 4 == 0:
+            texts.append(f"Entry {i}: everything feels {RISK_PHRASES[i % len(RISK_PHRASES)]} lately.")
+        else:
+            texts.append(f"Entry {i}: long day at work, dinner with friends, early night.")
+    return texts
+
+
+def run_runner_test():
+    print("   EVAL RUNNER TEST (fake OpenAI)     ")
+
+    # Every 5th request is answered with a 429 + Retry-After
+    with FakeOpenAIServer(latency=LATENCY, rate_limit_every=5, retry_after=0.3) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+        # Fresh response cache so every row really goes to the server
+        os.environ["REFLECTAI_LLM_CACHE"] = os.path.join(tempfile.mkdtemp(), "llm_cache.db")
+        checkpoint_dir = tempfile.mkdtemp()
+
+        from agents.guardian import GuardianAgent
+        from agents.llm_cache import get_cache
+        from eval_runner import EvalRunner, disable_sdk_retries
+
+        guardian = GuardianAgent(raise_errors=True)
+        disable_sdk_retries(guardian)
+        texts = make_texts()
+        expected = [i % 4 == 0 for i in range(ROWS)]
+        checks = []
+
+        # 1. Interrupted run: only the first half gets done
+        first = EvalRunner("safety", workers=WORKERS, checkpoint_dir=checkpoint_dir)
+        first.map(guardian.analyze, texts[:ROWS // 2])
+
+        # 2. Resumed run over the whole set (new runner = new process, same checkpoint)
+        get_cache().clear()
+        requests_before = server.request_count
+        start = time.perf_counter()
+        resumed = EvalRunner("safety", workers=WORKERS, checkpoint_dir=checkpoint_dir)
+        results = resumed.map(guardian.analyze, texts)
+        parallel = time.perf_counter() - start
+        sent = server.request_count - requests_before
+
+        checks.append(("Resume skips checkpointed rows", resumed.stats["resumed"] == ROWS // 2))
+        checks.append(("Only the remaining rows hit the API (+ 429 retries)", sent == ROWS // 2 + resumed.stats["retries"]))
+        checks.append(("429s were retried, not scored", server.rate_limited_count > 0 and all(r is not None for r in results)))
+        checks.append(("Verdicts match the fake Guardian", [r["is_risk"] for r in results] == expected))
+
+        # 3. Thread pool vs the old one-row-at-a-time loop (no rate limiting)
+        server.rate_limit_every = 0
+        get_cache().clear()
+        start = time.perf_counter()
+        for text in texts[:ROWS // 2]:
+            guardian.analyze(text)
+        sequential = time.perf_counter() - start
+        print(f"\n   Sequential ({ROWS // 2} rows): {sequential:.2f}s | Runner ({ROWS // 2} rows, {WORKERS} workers, with 429s): {parallel:.2f}s")
+        checks.append(("Thread pool beats sequential loop", parallel < sequential * 0.5))
+
+        # 4. Exhausted retries leave the row unscored and un-checkpointed
+        server.rate_limit_every = 1
+        get_cache().clear()
+        failing = EvalRunner("safety-failing", workers=2, max_retries=1, checkpoint_dir=checkpoint_dir)
+        results = failing.map(guardian.analyze, texts[:2])
+        checks.append(("Exhausted retries -> None, retried next run", results == [None, None] and failing.stats["failed"] == 2))
+
+    passed = 0
+    print()
+    for name, ok in checks:
+        print(f"   [{'PASS' if ok else 'FAIL'}] {name}")
+        passed += ok
+
+    print(f"\n   FINAL RESULTS: {passed}/{len(checks)} checks passed")
+    return passed == len(checks)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_runner_test() else 1)